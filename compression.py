@@ -0,0 +1,167 @@
+import os
+import zlib
+import logging
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # responses are only gzip compressed without the brotli package
+    brotli = None
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Responses smaller than this are sent uncompressed, the savings would not cover the overhead
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Event streams must reach the browser unbuffered, and these formats are compressed already
+EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",
+    "application/gzip",
+    "application/zstd",
+    "application/zip",
+    "application/x-bzip2",
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "font/woff",
+    "video/",
+    "audio/",
+)
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Flushing each chunk of a streamed response lets the client start processing it right away
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        compressed = self._compressor.process(data)
+        return compressed + (self._compressor.finish() if final else self._compressor.flush())
+
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content coding of a response from the Accept-Encoding header of the request.
+
+    Returns:
+        Optional[str]: "br" when accepted and available, else "gzip" when accepted, else None
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    for coding in ("br", "gzip"):
+        if coding in ENCODERS and (coding in accepted or "*" in accepted):
+            return coding
+    return None
+
+
+def _is_compressible(message: Message) -> bool:
+    headers = Headers(raw=message["headers"])
+    if message["status"] in (204, 206, 304) or "content-encoding" in headers or "content-range" in headers:
+        return False
+    return not headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, according to the Accept-Encoding of the request.
+
+    Unlike Starlette's GZipMiddleware, responses that are already compressed (such as the
+    export snapshots), partial responses to Range requests and event streams are left untouched.
+    Streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                if _is_compressible(message):
+                    # Held back until the first body tells whether the response is large enough
+                    start_message = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if not passthrough and encoder is None and start_message is not None:
+                    # e.g. http.response.pathsend, the body never goes through this middleware
+                    passthrough = True
+                    await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # The compressed representation is not byte-identical to the original
+                    headers["ETag"] = f"W/{headers['etag']}"
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                else:
+                    body = encoder.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+                await send(start_message)
+
+            await send(
+                {"type": "http.response.body", "body": encoder.compress(body, final=not more_body), "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel
 
 
@@ -6,3 +8,50 @@ class KGList(BaseModel):
     kg_name: str
     kg_description: str
     kg_url: str
+
+
+class KnowledgeGraph(KGList):
+    """A knowledge graph of /api/v1/kgs; kg_url is its SPARQL endpoint (or dump URL)."""
+
+    about_page: Optional[str] = None
+    domains: List[str] = []
+    is_dump: bool = False
+    n_submissions: int = 0
+    n_queries: int = 0
+
+
+class KGPage(BaseModel):
+    items: List[KnowledgeGraph]
+    next_cursor: Optional[str] = None
+
+
+class Submission(BaseModel):
+    """A submission of /api/v1/kgs/{kg_id}/submissions; only the requested fields are present."""
+
+    id: Optional[int] = None
+    kg_endpoint: Optional[str] = None
+    nl_question: Optional[str] = None
+    sparql_query: Optional[str] = None
+    source: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+class SubmissionPage(BaseModel):
+    items: List[Submission]
+    next_cursor: Optional[str] = None
+
+
+class KGStats(BaseModel):
+    n_submissions: int
+    n_queries: int
+    n_questions: int
+
+
+class Stats(BaseModel):
+    n_kgs: int
+    n_submissions: int
+    n_queries: int
+    n_questions: int
+    n_contributors: int
+    by_kg: Dict[str, KGStats]
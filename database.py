@@ -1,33 +1,220 @@
 import os
+import sys
+import time
+import fcntl
+import contextlib
 import logging
 import sqlite3
-import mysql.connector
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 
 from dotenv import load_dotenv
 
+import metrics
+import tracing
+
 load_dotenv()
 logging.getLogger().setLevel(logging.INFO)
 run_mode = os.getenv("RUN_MODE")
 
+SQLITE_DB_PATH = "/var/tmp/app_database.db"
+
+# Bump whenever the schema created by _migrate_schema changes, so that init_db runs it again
+SCHEMA_VERSION = 3
+# Seconds a process waits for another one to finish migrating the schema
+SCHEMA_LOCK_TIMEOUT = 300
+
+# Statements taking longer than this (including fetching their rows) are logged; negative disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+
+class _TimedCursor:
+    """
+    Cursor proxy logging the statements slower than SLOW_QUERY_MS.
+
+    A statement is timed from its execution until the next statement or the closing of the
+    cursor, so that the time spent fetching its rows counts. Parameters are never logged,
+    only their types, as they hold e-mail addresses and user submissions.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _start(self, statement: str, params, many: bool):
+        self._finish()
+        caller = sys._getframe(2).f_code.co_name
+        self._statement = {"sql": statement, "params": params, "many": many, "caller": caller, "elapsed": 0.0, "rows": None}
+
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            if self._statement is not None:
+                self._statement["elapsed"] += time.perf_counter() - started
+
+    def _count(self, rows: int):
+        if self._statement is not None:
+            self._statement["rows"] = (self._statement["rows"] or 0) + rows
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement is None or SLOW_QUERY_MS < 0 or statement["elapsed"] * 1000 < SLOW_QUERY_MS:
+            return
+        rows = statement["rows"] if statement["rows"] is not None else getattr(self._cursor, "rowcount", -1)
+        params = statement["params"]
+        if statement["many"]:
+            redacted = f"{len(params)} parameter sets"
+        else:
+            redacted = "(" + ", ".join(type(param).__name__ for param in params or ()) + ")"
+        sql = " ".join(statement["sql"].split())
+        logging.warning(
+            f"Slow query in {statement['caller']}: {statement['elapsed'] * 1000:.0f} ms, {rows} rows, "
+            f"params {redacted}: {sql[:1000]}"
+        )
+
+    def execute(self, statement: str, params=None):
+        self._start(statement, params, many=False)
+        if params is None:
+            return self._timed(self._cursor.execute, statement)
+        return self._timed(self._cursor.execute, statement, params)
+
+    def executemany(self, statement: str, params):
+        self._start(statement, params, many=True)
+        return self._timed(self._cursor.executemany, statement, params)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        self._count(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size: int):
+        rows = self._timed(self._cursor.fetchmany, size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._count(len(rows))
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class _TimedConnection:
+    """Connection proxy whose cursors are _TimedCursor."""
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # e.g. row_factory of the SQLite connections
+        setattr(self._conn, name, value)
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs))
+
 
 def connect_db():
     """Gets a database connection."""
     if run_mode == "RENDER":
-        db_path = "/var/tmp/app_database.db"
-        conn = sqlite3.connect(db_path, timeout=10.0)
-        return conn
+        conn = sqlite3.connect(SQLITE_DB_PATH, timeout=10.0)
+        return _TimedConnection(conn)
     else:
+        # Only imported in MySQL mode, it takes a noticeable share of the startup time
+        import mysql.connector
+
         conn = mysql.connector.connect(
             host=os.getenv("DB_HOST"),
             user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASSWORD"),
             database=os.getenv("DB_NAME"),
         )
-        return conn
+        return _TimedConnection(conn)
+
+
+def get_schema_version() -> int:
+    """Returns the version of the schema of the database, 0 if it was never recorded."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+        except Exception:
+            # Table does not exist yet
+            return 0
+        row = cursor.fetchone()
+        return row[0] or 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@contextlib.contextmanager
+def _schema_lock():
+    """Holds a lock shared by every process, in every pod, that could migrate the schema."""
+    if run_mode == "RENDER":
+        with open(f"{SQLITE_DB_PATH}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT GET_LOCK('quagga_schema', %s)", (SCHEMA_LOCK_TIMEOUT,))
+        if cursor.fetchone()[0] != 1:
+            raise TimeoutError(f"Could not acquire the schema lock within {SCHEMA_LOCK_TIMEOUT} seconds")
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('quagga_schema')")
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
 
 
 def init_db():
+    """
+    Brings the schema of the database to SCHEMA_VERSION.
+
+    The version check is a single query, so the workers starting after the migration (or
+    after the pre-start `python database.py`) do not run any DDL. Processes starting
+    together wait for the one holding the schema lock instead of migrating concurrently.
+    """
+    if get_schema_version() >= SCHEMA_VERSION:
+        logging.info(f"Database schema is up to date (version {SCHEMA_VERSION}).")
+        return
+    with _schema_lock():
+        if get_schema_version() >= SCHEMA_VERSION:
+            return
+        _migrate_schema()
+        conn = connect_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+            placeholder = "%s" if run_mode != "RENDER" else "?"
+            cursor.execute(f"INSERT INTO schema_version (version) VALUES ({placeholder})", (SCHEMA_VERSION,))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        logging.info(f"Database schema migrated to version {SCHEMA_VERSION}.")
+
+
+def _migrate_schema():
     """Initializes the database by creating the table if it doesn't exist."""
     default_endpoints = [
         (
@@ -68,7 +255,22 @@ def init_db():
                 kg_endpoint TEXT NOT NULL,
                 nl_question TEXT NOT NULL,
                 sparql_query TEXT,
-                username TEXT
+                username TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        conn.commit()
+
+        # Deleted submissions leave a tombstone so that incremental exports can report them
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS submission_tombstones (
+                id {auto_increment},
+                submission_id INT NOT NULL,
+                kg_endpoint TEXT NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """
         )
@@ -84,7 +286,9 @@ def init_db():
                 about_page TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 domains TEXT,
-                is_dump {'BOOLEAN DEFAULT FALSE' if run_mode != 'RENDER' else 'INTEGER DEFAULT 0'}
+                is_dump {'BOOLEAN DEFAULT FALSE' if run_mode != 'RENDER' else 'INTEGER DEFAULT 0'},
+                cost_warn_threshold INT,
+                cost_reject_threshold INT
             )
         """
         )
@@ -100,7 +304,70 @@ def init_db():
                 validation_message TEXT,
                 username TEXT,
                 sparql_query TEXT,
-                query_result TEXT
+                query_result TEXT,
+                submission_id INT,
+                duration_ms INT,
+                result_fingerprint VARCHAR(64),
+                row_count INT,
+                truncated {'BOOLEAN DEFAULT FALSE' if run_mode != 'RENDER' else 'INTEGER DEFAULT 0'}
+            )
+        """
+        )
+        conn.commit()
+
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS validation_jobs (
+                id {auto_increment},
+                endpoint TEXT NOT NULL,
+                sparql_query TEXT NOT NULL,
+                username TEXT,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                progress TEXT,
+                result TEXT,
+                queue VARCHAR(20) NOT NULL DEFAULT 'default',
+                is_dump {'BOOLEAN DEFAULT FALSE' if run_mode != 'RENDER' else 'INTEGER DEFAULT 0'},
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+        conn.commit()
+
+        # Workers claim the oldest queued job, so index the lookup they run while polling
+        try:
+            cursor.execute("CREATE INDEX idx_validation_jobs_status ON validation_jobs (status, id)")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
+        # Server-side sessions, keyed by the hash of the id in the session cookie
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_key CHAR(64) NOT NULL PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at DOUBLE NOT NULL
+            )
+        """
+        )
+        conn.commit()
+
+        try:
+            cursor.execute("CREATE INDEX idx_sessions_expires ON sessions (expires_at)")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
+        # Token buckets of the rate limits, shared by the workers of every pod
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                bucket_key VARCHAR(255) NOT NULL PRIMARY KEY,
+                tokens DOUBLE NOT NULL,
+                updated_at DOUBLE NOT NULL
             )
         """
         )
@@ -122,6 +389,46 @@ def init_db():
             # Column already exists
             pass
 
+        # Ensure the modification timestamps exist in submissions table for previous deployments.
+        # SQLite cannot add a column with a non-constant default, so existing rows are backfilled
+        # and insert_submission/modify_submission always set the timestamps explicitly.
+        for column in ("created_at", "updated_at"):
+            try:
+                cursor.execute(f"ALTER TABLE submissions ADD COLUMN {column} TIMESTAMP")
+                conn.commit()
+            except Exception:
+                # Column already exists
+                pass
+            cursor.execute(f"UPDATE submissions SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL")
+            conn.commit()
+
+        try:
+            cursor.execute("CREATE INDEX idx_submissions_updated ON submissions (updated_at, id)")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
+        # Pages of submissions per KG endpoint are read in ID order; MySQL can only index a TEXT prefix
+        try:
+            kg_column = "kg_endpoint(255)" if run_mode != "RENDER" else "kg_endpoint"
+            cursor.execute(f"CREATE INDEX idx_submissions_kg ON submissions ({kg_column}, id)")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
+        # The "my submissions" filter of the submissions page, and the "KGs I contributed to" filter
+        try:
+            user_columns = (
+                "kg_endpoint(255), username(255), id" if run_mode != "RENDER" else "kg_endpoint, username, id"
+            )
+            cursor.execute(f"CREATE INDEX idx_submissions_kg_user ON submissions ({user_columns})")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
         # Ensure the `about_page` column exists in kg_endpoints table for previous deployments
         try:
             cursor.execute("ALTER TABLE kg_endpoints ADD COLUMN about_page TEXT")
@@ -141,6 +448,65 @@ def init_db():
             # Column already exists
             pass
 
+        # Ensure the per-endpoint query cost thresholds exist for previous deployments (NULL = default)
+        for column in ("cost_warn_threshold INT", "cost_reject_threshold INT"):
+            try:
+                cursor.execute(f"ALTER TABLE kg_endpoints ADD COLUMN {column}")
+                conn.commit()
+            except Exception:
+                # Column already exists
+                pass
+
+        # Ensure the `queue` column exists in validation_jobs table for previous deployments
+        try:
+            cursor.execute("ALTER TABLE validation_jobs ADD COLUMN queue VARCHAR(20) NOT NULL DEFAULT 'default'")
+            conn.commit()
+        except Exception:
+            # Column already exists
+            pass
+
+        # Ensure the `is_dump` column exists in validation_jobs table for previous deployments
+        try:
+            if run_mode != "RENDER":
+                cursor.execute("ALTER TABLE validation_jobs ADD COLUMN is_dump BOOLEAN DEFAULT FALSE")
+            else:
+                cursor.execute("ALTER TABLE validation_jobs ADD COLUMN is_dump INTEGER DEFAULT 0")
+            conn.commit()
+        except Exception:
+            # Column already exists
+            pass
+
+        try:
+            cursor.execute("CREATE INDEX idx_validation_jobs_queue ON validation_jobs (queue, status, id)")
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
+        # Ensure the columns linking validation results to submissions exist for previous deployments
+        for column in (
+            "submission_id INT",
+            "duration_ms INT",
+            "result_fingerprint VARCHAR(64)",
+            "row_count INT",
+            "truncated BOOLEAN DEFAULT FALSE" if run_mode != "RENDER" else "truncated INTEGER DEFAULT 0",
+        ):
+            try:
+                cursor.execute(f"ALTER TABLE validation_results ADD COLUMN {column}")
+                conn.commit()
+            except Exception:
+                # Column already exists
+                pass
+
+        try:
+            cursor.execute(
+                "CREATE INDEX idx_validation_results_submission ON validation_results (submission_id, id)"
+            )
+            conn.commit()
+        except Exception:
+            # Index already exists
+            pass
+
         mid_str = "%s" if run_mode != "RENDER" else "?"
         for name, description, endpoint, about_page, domains_str in default_endpoints:
             cursor.execute(
@@ -173,8 +539,9 @@ def insert_submission(
     try:
         cursor = conn.cursor()
         suffix = "(%s, %s, %s, %s, %s)" if run_mode != "RENDER" else "(?, ?, ?, ?, ?)"
+        suffix = suffix[:-1] + ", CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
         cursor.execute(
-            f"INSERT INTO submissions (kg_endpoint, nl_question, username, sparql_query, source) VALUES {suffix}",
+            f"INSERT INTO submissions (kg_endpoint, nl_question, username, sparql_query, source, created_at, updated_at) VALUES {suffix}",
             (kg_endpoint, nl_question, email, sparql_query, source),
         )
         conn.commit()
@@ -205,6 +572,81 @@ def insert_kg_endpoint(
         conn.close()
 
 
+def insert_kg_endpoints(endpoints: List[Dict]):
+    """Inserts a batch of KG endpoints into the database, in one transaction."""
+    if not endpoints:
+        return
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        suffix = "(%s, %s, %s, %s, %s, %s, %s)" if run_mode != "RENDER" else "(?, ?, ?, ?, ?, ?, ?)"
+        cursor.executemany(
+            f"INSERT INTO kg_endpoints (name, description, endpoint, about_page, domains, is_dump, created_at) VALUES {suffix}",
+            [
+                (
+                    endpoint["name"],
+                    endpoint["description"],
+                    endpoint["endpoint"],
+                    endpoint["about_page"],
+                    ",".join(endpoint["domains"]),
+                    endpoint.get("is_dump", False),
+                    endpoint["created_at"],
+                )
+                for endpoint in endpoints
+            ],
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def insert_submissions(submissions: List[Dict]):
+    """
+    Inserts a batch of submissions with their timestamps into the database, in one transaction.
+
+    The MySQL connector sends the batch as one multi-row INSERT, so loading many
+    submissions takes one round trip per batch rather than per row.
+    """
+    if not submissions:
+        return
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        suffix = "(%s, %s, %s, %s, %s, %s, %s)" if run_mode != "RENDER" else "(?, ?, ?, ?, ?, ?, ?)"
+        cursor.executemany(
+            f"INSERT INTO submissions (kg_endpoint, nl_question, username, sparql_query, source, created_at, updated_at) VALUES {suffix}",
+            [
+                (
+                    submission["kg_endpoint"],
+                    submission["nl_question"],
+                    submission["username"],
+                    submission["sparql_query"],
+                    submission.get("source"),
+                    submission["created_at"],
+                    submission["updated_at"],
+                )
+                for submission in submissions
+            ],
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_max_submission_id() -> int:
+    """Retrieves the highest submission ID, 0 if there are no submissions."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM submissions")
+        return cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def insert_validation_result(
     endpoint: str,
     validation_status: str,
@@ -212,16 +654,21 @@ def insert_validation_result(
     username: str,
     sparql_query: str,
     query_result: str,
+    result_fingerprint: Optional[str] = None,
+    row_count: Optional[int] = None,
+    truncated: bool = False,
 ):
     """Inserts a new validation result into the database."""
     conn = connect_db()
     try:
         cursor = conn.cursor()
         suffix = (
-            "(%s, %s, %s, %s, %s, %s)" if run_mode != "RENDER" else "(?, ?, ?, ?, ?, ?)"
+            "(%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+            if run_mode != "RENDER"
+            else "(?, ?, ?, ?, ?, ?, ?, ?, ?)"
         )
         cursor.execute(
-            f"INSERT INTO validation_results (endpoint, validation_status, validation_message, username, sparql_query, query_result) VALUES {suffix}",
+            f"INSERT INTO validation_results (endpoint, validation_status, validation_message, username, sparql_query, query_result, result_fingerprint, row_count, truncated) VALUES {suffix}",
             (
                 endpoint,
                 validation_status,
@@ -229,6 +676,9 @@ def insert_validation_result(
                 username,
                 sparql_query,
                 query_result,
+                result_fingerprint,
+                row_count,
+                truncated,
             ),
         )
         conn.commit()
@@ -237,6 +687,74 @@ def insert_validation_result(
         conn.close()
 
 
+def insert_validation_results(results: List[Dict]):
+    """Inserts a batch of validation results of stored submissions into the database."""
+    if not results:
+        return
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        suffix = (
+            "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+            if run_mode != "RENDER"
+            else "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        cursor.executemany(
+            f"INSERT INTO validation_results (endpoint, validation_status, validation_message, username, sparql_query, query_result, submission_id, duration_ms, result_fingerprint, row_count, truncated) VALUES {suffix}",
+            [
+                (
+                    result["endpoint"],
+                    result["validation_status"],
+                    result["validation_message"],
+                    result["username"],
+                    result["sparql_query"],
+                    result["query_result"],
+                    result["submission_id"],
+                    result["duration_ms"],
+                    result.get("result_fingerprint"),
+                    result.get("row_count"),
+                    result.get("truncated", False),
+                )
+                for result in results
+            ],
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_latest_validation_results(submission_ids: List[int]) -> Dict[int, Dict]:
+    """Retrieves the most recent validation result of each of the given submissions."""
+    if not submission_ids:
+        return {}
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        placeholders = ", ".join([placeholder] * len(submission_ids))
+        cursor.execute(
+            f"""
+            SELECT v.submission_id, v.validation_status, v.query_result, v.duration_ms,
+                v.result_fingerprint, v.row_count, v.truncated
+            FROM validation_results v
+            WHERE v.id IN (
+                SELECT MAX(id) FROM validation_results
+                WHERE submission_id IN ({placeholders})
+                GROUP BY submission_id
+            )
+        """,
+            tuple(submission_ids),
+        )
+        return {row["submission_id"]: dict(row) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def get_if_endpoint_exists(endpoint: str) -> bool:
     """Checks if a KG endpoint exists in the database."""
     conn = connect_db()
@@ -271,53 +789,393 @@ def get_all_submissions() -> List[Dict]:
         conn.close()
 
 
-def get_all_kg_metadata(for_one: bool = False, endpoint: str = None) -> List[Dict]:
-    """Retrieves all KG endpoints from the database."""
+def iter_submissions(batch_size: int = 1000, kg_endpoints: Optional[List[str]] = None) -> Iterator[Dict]:
+    """
+    Streams all submissions ordered by ID, fetching them from the cursor in batches.
+
+    Args:
+        batch_size (int): Number of rows fetched from the database at once
+        kg_endpoints (Optional[List[str]]): Only stream the submissions of these endpoints
+
+    Yields:
+        Dict: One submission at a time
+    """
+    if kg_endpoints is not None and not kg_endpoints:
+        return
     conn = connect_db()
     try:
         if run_mode == "RENDER":
             conn.row_factory = sqlite3.Row
 
         cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
-        if not for_one:
-            cursor.execute(
-                "SELECT id, name, description, endpoint, about_page, domains FROM kg_endpoints ORDER BY name"
-            )
-            return (
-                cursor.fetchall()
-                if run_mode != "RENDER"
-                else [dict(row) for row in cursor.fetchall()]
-            )
-        else:
-            suffix = (
-                "WHERE endpoint = %s" if run_mode != "RENDER" else "WHERE endpoint = ?"
-            )
-            cursor.execute(
-                f"SELECT name, description, endpoint, about_page, domains, is_dump FROM kg_endpoints {suffix}",
-                (endpoint,),
-            )
-            return (
-                cursor.fetchone() if run_mode != "RENDER" else dict(cursor.fetchone())
-            )
+        where, params = "", ()
+        if kg_endpoints is not None:
+            placeholder = "%s" if run_mode != "RENDER" else "?"
+            where = f"WHERE kg_endpoint IN ({', '.join([placeholder] * len(kg_endpoints))})"
+            params = tuple(kg_endpoints)
+        cursor.execute(
+            f"SELECT id, kg_endpoint, nl_question, sparql_query, username, source FROM submissions {where} ORDER BY id",
+            params,
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
     finally:
         cursor.close()
         conn.close()
 
 
-def get_kg_metadata_with_user_contributions(user_email: str) -> List[Dict]:
-    """Retrieves KG metadata for endpoints where the user has made submissions."""
+def get_submission_counts_by_endpoint() -> Dict[str, int]:
+    """Retrieves the number of submissions per KG endpoint."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT kg_endpoint, COUNT(*) FROM submissions GROUP BY kg_endpoint")
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_kg_page(after_id: int, limit: int) -> List[Dict]:
+    """
+    Retrieves the next page, ordered by ID, of KG endpoints with their submission and query counts.
+
+    The page of KGs is selected first, so only the submissions of its KGs are counted.
+    """
     conn = connect_db()
     try:
         if run_mode == "RENDER":
             conn.row_factory = sqlite3.Row
 
         cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            SELECT k.id, k.name, k.description, k.endpoint, k.about_page, k.domains, k.is_dump,
+                COUNT(s.id) AS n_submissions,
+                COALESCE(SUM(CASE WHEN s.sparql_query IS NOT NULL AND TRIM(s.sparql_query) <> '' THEN 1 ELSE 0 END), 0) AS n_queries
+            FROM (
+                SELECT id, name, description, endpoint, about_page, domains, is_dump
+                FROM kg_endpoints
+                WHERE id > {placeholder}
+                ORDER BY id
+                LIMIT {placeholder}
+            ) k
+            LEFT JOIN submissions s ON s.kg_endpoint = k.endpoint
+            GROUP BY k.id, k.name, k.description, k.endpoint, k.about_page, k.domains, k.is_dump
+            ORDER BY k.id
+        """,
+            (after_id, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
 
-        # Get KG endpoints where user has submissions, then join with kg_endpoints table
-        suffix = (
-            """
-        SELECT DISTINCT k.id, k.name, k.description, k.endpoint, k.about_page, k.domains 
-        FROM kg_endpoints k 
+
+def get_kg_by_id(kg_id: int) -> Optional[Dict]:
+    """Retrieves a KG endpoint by its ID."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        suffix = "WHERE id = %s" if run_mode != "RENDER" else "WHERE id = ?"
+        cursor.execute(
+            f"SELECT id, name, description, endpoint, about_page, domains, is_dump FROM kg_endpoints {suffix}",
+            (kg_id,),
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Columns of the submissions that the JSON API may return (usernames are e-mail addresses)
+SUBMISSION_API_FIELDS = ("id", "kg_endpoint", "nl_question", "sparql_query", "source", "created_at", "updated_at")
+
+
+def get_submissions_page(kg_endpoint: str, after_id: int, limit: int, fields: List[str]) -> List[Dict]:
+    """
+    Retrieves the next page, ordered by ID, of the submissions of a KG endpoint.
+
+    Args:
+        kg_endpoint (str): The KG endpoint of the submissions
+        after_id (int): Only submissions with a greater ID are returned
+        limit (int): Maximum number of submissions returned
+        fields (List[str]): Columns to select, among SUBMISSION_API_FIELDS
+
+    Returns:
+        List[Dict]: The submissions, always including their ID
+    """
+    unknown = set(fields) - set(SUBMISSION_API_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown submission fields: {', '.join(sorted(unknown))}")
+    columns = ["id"] + [field for field in fields if field != "id"]
+
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            SELECT {', '.join(columns)} FROM submissions
+            WHERE kg_endpoint = {placeholder} AND id > {placeholder}
+            ORDER BY id
+            LIMIT {placeholder}
+        """,
+            (kg_endpoint, after_id, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# SQL condition of a submission having a SPARQL query, shared by the filters and the counts
+HAS_QUERY = "(sparql_query IS NOT NULL AND TRIM(sparql_query) <> '')"
+
+
+def _submission_filters(kg_endpoint: str, username: Optional[str], search: Optional[str]) -> tuple[str, list]:
+    """Build the WHERE clause and parameters of the submissions page filters."""
+    placeholder = "%s" if run_mode != "RENDER" else "?"
+    conditions, params = [f"kg_endpoint = {placeholder}"], [kg_endpoint]
+    if username:
+        conditions.append(f"username = {placeholder}")
+        params.append(username)
+    if search:
+        escaped = search.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        conditions.append(f"nl_question LIKE {placeholder} ESCAPE '!'")
+        params.append(f"%{escaped}%")
+    return " AND ".join(conditions), params
+
+
+def get_filtered_submission_counts(kg_endpoint: str, username: Optional[str] = None, search: Optional[str] = None) -> Dict:
+    """
+    Counts the submissions of a KG endpoint matching the filters, with and without a SPARQL query.
+
+    Returns:
+        Dict: The total, with_sparql and questions_only counts
+    """
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        where, params = _submission_filters(kg_endpoint, username, search)
+        cursor.execute(
+            f"SELECT COUNT(*), SUM(CASE WHEN {HAS_QUERY} THEN 1 ELSE 0 END) FROM submissions WHERE {where}",
+            params,
+        )
+        total, with_sparql = cursor.fetchone()
+        with_sparql = int(with_sparql or 0)
+        return {"total": total, "with_sparql": with_sparql, "questions_only": total - with_sparql}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_filtered_submissions(
+    kg_endpoint: str,
+    submission_type: str = "all",
+    username: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict]:
+    """
+    Retrieves one page, ordered by ID, of the submissions of a KG endpoint matching the filters.
+
+    Args:
+        kg_endpoint (str): The KG endpoint of the submissions
+        submission_type (str): "all", "with-sparql" or "questions-only"
+        username (Optional[str]): Only the submissions of this user
+        search (Optional[str]): Only the submissions whose question contains this text
+        limit (int): Number of submissions of the page
+        offset (int): Number of matching submissions before the page
+
+    Returns:
+        List[Dict]: The submissions of the page
+    """
+    where, params = _submission_filters(kg_endpoint, username, search)
+    if submission_type == "with-sparql":
+        where += f" AND {HAS_QUERY}"
+    elif submission_type == "questions-only":
+        where += f" AND NOT {HAS_QUERY}"
+
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            SELECT id, kg_endpoint, nl_question, sparql_query, username, source FROM submissions
+            WHERE {where}
+            ORDER BY id
+            LIMIT {placeholder} OFFSET {placeholder}
+        """,
+            params + [limit, offset],
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _domain_condition(column: str) -> str:
+    """SQL condition of a comma-separated domains column matching the _domain_pattern bound to the placeholder."""
+    placeholder = "%s" if run_mode != "RENDER" else "?"
+    padded = (
+        f"CONCAT(',', REPLACE({column}, ' ', ''), ',')"
+        if run_mode != "RENDER"
+        else f"(',' || REPLACE({column}, ' ', '') || ',')"
+    )
+    return f"{padded} LIKE {placeholder}"
+
+
+def _domain_pattern(domain_code: str) -> str:
+    return f"%,{domain_code},%"
+
+
+def _kg_contribution_filter(user_email: Optional[str]) -> tuple[str, list]:
+    placeholder = "%s" if run_mode != "RENDER" else "?"
+    if not user_email:
+        return "1 = 1", []
+    return (
+        f"EXISTS (SELECT 1 FROM submissions s WHERE s.kg_endpoint = k.endpoint AND s.username = {placeholder})",
+        [user_email],
+    )
+
+
+def get_filtered_kg_metadata(domains: Optional[List[str]] = None, user_email: Optional[str] = None) -> List[Dict]:
+    """
+    Retrieves the KG endpoints in any of the given domains, optionally only those the user contributed to.
+
+    Args:
+        domains (Optional[List[str]]): Domain codes; all KG endpoints if empty
+        user_email (Optional[str]): Only the KG endpoints with submissions of this user
+
+    Returns:
+        List[Dict]: The KG endpoints ordered by name
+    """
+    where, params = _kg_contribution_filter(user_email)
+    if domains:
+        where += " AND (" + " OR ".join([_domain_condition("k.domains")] * len(domains)) + ")"
+        params += [_domain_pattern(code) for code in domains]
+
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        cursor.execute(
+            f"SELECT k.id, k.name, k.description, k.endpoint, k.about_page, k.domains FROM kg_endpoints k WHERE {where} ORDER BY k.name",
+            params,
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_domain_kg_counts(domain_codes: List[str], user_email: Optional[str] = None) -> Dict[str, int]:
+    """Counts the KG endpoints of each domain, optionally only those the user contributed to."""
+    if not domain_codes:
+        return {}
+    where, params = _kg_contribution_filter(user_email)
+    sums = ", ".join(f"SUM(CASE WHEN {_domain_condition('k.domains')} THEN 1 ELSE 0 END)" for _ in domain_codes)
+
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {sums} FROM kg_endpoints k WHERE {where}", [_domain_pattern(code) for code in domain_codes] + params)
+        row = cursor.fetchone()
+        return {code: int(count or 0) for code, count in zip(domain_codes, row)}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_submission_stats() -> Dict:
+    """Retrieves the number of submissions, queries and contributors, overall and per KG endpoint."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT kg_endpoint, COUNT(*),
+                SUM(CASE WHEN sparql_query IS NOT NULL AND TRIM(sparql_query) <> '' THEN 1 ELSE 0 END)
+            FROM submissions GROUP BY kg_endpoint
+        """
+        )
+        by_kg = {row[0]: {"n_submissions": row[1], "n_queries": int(row[2] or 0)} for row in cursor.fetchall()}
+        cursor.execute("SELECT COUNT(DISTINCT username) FROM submissions WHERE username IS NOT NULL AND username <> ''")
+        n_contributors = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(DISTINCT endpoint) FROM kg_endpoints")
+        n_kgs = cursor.fetchone()[0]
+        return {"n_kgs": n_kgs, "n_contributors": n_contributors, "by_kg": by_kg}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_all_kg_metadata(for_one: bool = False, endpoint: str = None) -> List[Dict]:
+    """Retrieves all KG endpoints from the database."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        if not for_one:
+            cursor.execute(
+                "SELECT id, name, description, endpoint, about_page, domains FROM kg_endpoints ORDER BY name"
+            )
+            return (
+                cursor.fetchall()
+                if run_mode != "RENDER"
+                else [dict(row) for row in cursor.fetchall()]
+            )
+        else:
+            suffix = (
+                "WHERE endpoint = %s" if run_mode != "RENDER" else "WHERE endpoint = ?"
+            )
+            cursor.execute(
+                f"SELECT name, description, endpoint, about_page, domains, is_dump, cost_warn_threshold, cost_reject_threshold FROM kg_endpoints {suffix}",
+                (endpoint,),
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_kg_metadata_with_user_contributions(user_email: str) -> List[Dict]:
+    """Retrieves KG metadata for endpoints where the user has made submissions."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+
+        # Get KG endpoints where user has submissions, then join with kg_endpoints table
+        suffix = (
+            """
+        SELECT DISTINCT k.id, k.name, k.description, k.endpoint, k.about_page, k.domains 
+        FROM kg_endpoints k 
         INNER JOIN submissions s ON k.endpoint = s.kg_endpoint 
         WHERE s.username = %s
         ORDER BY k.name
@@ -427,6 +1285,7 @@ def modify_submission(
         params.extend([id_submission, email, kg_endpoint])
         
         if update_fields:
+            update_fields.append("updated_at = CURRENT_TIMESTAMP")
             query = f"""
                 UPDATE submissions
                 SET {', '.join(update_fields)}
@@ -438,3 +1297,528 @@ def modify_submission(
     finally:
         cursor.close()
         conn.close()
+
+
+def delete_submission(kg_endpoint: str, id_submission: str, email: str) -> bool:
+    """Deletes a submission of the user and records its tombstone, returning whether it existed."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            DELETE FROM submissions
+            WHERE id = {placeholder} AND username = {placeholder} AND kg_endpoint = {placeholder}
+        """,
+            (id_submission, email, kg_endpoint),
+        )
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return False
+        cursor.execute(
+            f"INSERT INTO submission_tombstones (submission_id, kg_endpoint) VALUES ({placeholder}, {placeholder})",
+            (id_submission, kg_endpoint),
+        )
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _settled_before(lag_seconds: int) -> tuple[str, tuple]:
+    """SQL expression (and its parameters) of the time before which changes are considered settled."""
+    if run_mode != "RENDER":
+        return "NOW() - INTERVAL %s SECOND", (lag_seconds,)
+    return "datetime('now', ?)", (f"-{lag_seconds} seconds",)
+
+
+def get_export_watermark(lag_seconds: int) -> Dict:
+    """Retrieves the position of an export taken now: the settled time and the last tombstone ID."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        settled, params = _settled_before(lag_seconds)
+        cursor.execute(f"SELECT {settled}", params)
+        settled_at = cursor.fetchone()[0]
+        cursor.execute("SELECT MAX(id) FROM submission_tombstones")
+        tombstone_id = cursor.fetchone()[0]
+        return {"updated_at": str(settled_at), "tombstone_id": tombstone_id or 0}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_data_version() -> str:
+    """Retrieves a value that changes whenever a submission is inserted, modified or deleted."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id), MAX(updated_at) FROM submissions")
+        max_id, max_updated_at = cursor.fetchone()
+        cursor.execute("SELECT MAX(id) FROM submission_tombstones")
+        tombstone_id = cursor.fetchone()[0]
+        return f"{max_id or 0}:{max_updated_at}:{tombstone_id or 0}"
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_changed_submissions(updated_at: str, after_id: int, limit: int, lag_seconds: int) -> List[Dict]:
+    """
+    Retrieves the submissions created or modified after a (updated_at, id) position.
+
+    Only changes older than lag_seconds are returned, so that a transaction committing
+    late with an earlier timestamp cannot slip behind the position handed to clients.
+    """
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        settled, settled_params = _settled_before(lag_seconds)
+        cursor.execute(
+            f"""
+            SELECT id, kg_endpoint, nl_question, sparql_query, username, source, created_at, updated_at
+            FROM submissions
+            WHERE (updated_at > {placeholder} OR (updated_at = {placeholder} AND id > {placeholder}))
+                AND updated_at <= {settled}
+            ORDER BY updated_at, id
+            LIMIT {placeholder}
+        """,
+            (updated_at, updated_at, after_id, *settled_params, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_submission_tombstones(after_id: int, limit: int, lag_seconds: int) -> List[Dict]:
+    """Retrieves the tombstones of deleted submissions recorded after a tombstone ID."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        settled, settled_params = _settled_before(lag_seconds)
+        cursor.execute(
+            f"""
+            SELECT id, submission_id, kg_endpoint, deleted_at FROM submission_tombstones
+            WHERE id > {placeholder} AND deleted_at <= {settled}
+            ORDER BY id
+            LIMIT {placeholder}
+        """,
+            (after_id, *settled_params, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def insert_validation_job(
+    endpoint: str, sparql_query: str, username: str, queue: str = "default", is_dump: bool = False
+) -> int:
+    """Queues a SPARQL validation job and returns its ID."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        suffix = "(%s, %s, %s, %s, %s, %s, %s)" if run_mode != "RENDER" else "(?, ?, ?, ?, ?, ?, ?)"
+        cursor.execute(
+            f"INSERT INTO validation_jobs (endpoint, sparql_query, username, status, progress, queue, is_dump) VALUES {suffix}",
+            (endpoint, sparql_query, username, "queued", "Waiting for a worker", queue, is_dump),
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def claim_next_validation_job(queue: str = "default") -> Optional[Dict]:
+    """Marks the oldest queued validation job of the queue as running and returns it, if any."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        while True:
+            cursor.execute(
+                "SELECT id, endpoint, sparql_query, username, is_dump FROM validation_jobs "
+                f"WHERE queue = {placeholder} AND status = 'queued' ORDER BY id LIMIT 1",
+                (queue,),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            job = dict(rows[0])
+
+            # Another worker (possibly in another pod) may claim the same job concurrently
+            cursor.execute(
+                f"""
+                UPDATE validation_jobs
+                SET status = 'running', progress = 'Executing query against the endpoint',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = {placeholder} AND status = 'queued'
+            """,
+                (job["id"],),
+            )
+            conn.commit()
+            if cursor.rowcount == 1:
+                return job
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def update_validation_job(
+    job_id: int, status: str, progress: Optional[str] = None, result: Optional[str] = None
+):
+    """Updates the status, progress message and result of a validation job."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            UPDATE validation_jobs
+            SET status = {placeholder}, progress = {placeholder}, result = {placeholder},
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = {placeholder}
+        """,
+            (status, progress, result, job_id),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def requeue_stale_validation_jobs(stale_after_seconds: int) -> int:
+    """Puts running jobs whose worker stopped reporting back in the queue."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        if run_mode != "RENDER":
+            cutoff = "NOW() - INTERVAL %s SECOND"
+            params = (stale_after_seconds,)
+        else:
+            cutoff = "datetime('now', ?)"
+            params = (f"-{stale_after_seconds} seconds",)
+        cursor.execute(
+            f"""
+            UPDATE validation_jobs
+            SET status = 'queued', progress = 'Re-queued after the worker stopped responding'
+            WHERE status = 'running' AND updated_at < {cutoff}
+        """,
+            params,
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def count_queued_validation_jobs() -> Dict[str, int]:
+    """Returns the number of queued validation jobs per queue."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT queue, COUNT(*) FROM validation_jobs WHERE status = 'queued' GROUP BY queue")
+        return {queue: count for queue, count in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_validation_job(job_id: int) -> Optional[Dict]:
+    """Retrieves a validation job by its ID."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        suffix = "WHERE id = %s" if run_mode != "RENDER" else "WHERE id = ?"
+        cursor.execute(
+            f"SELECT id, endpoint, username, status, progress, result, created_at, updated_at FROM validation_jobs {suffix}",
+            (job_id,),
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_endpoints_with_queries() -> Dict[str, int]:
+    """Retrieves the number of submissions with a SPARQL query per KG endpoint."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT kg_endpoint, COUNT(*) FROM submissions
+            WHERE sparql_query IS NOT NULL AND sparql_query <> ''
+            GROUP BY kg_endpoint
+        """
+        )
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_submission_queries_page(kg_endpoint: str, after_id: int, limit: int) -> List[Dict]:
+    """Retrieves the next page, ordered by ID, of submissions with a SPARQL query for an endpoint."""
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            SELECT id, kg_endpoint, sparql_query FROM submissions
+            WHERE kg_endpoint = {placeholder} AND id > {placeholder}
+                AND sparql_query IS NOT NULL AND sparql_query <> ''
+            ORDER BY id
+            LIMIT {placeholder}
+        """,
+            (kg_endpoint, after_id, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_submissions_with_answer_drift(
+    kg_endpoint: Optional[str] = None, after_id: int = 0, limit: int = 100
+) -> List[Dict]:
+    """
+    Retrieves submissions whose last two fingerprinted validation runs returned different answers.
+
+    Truncated runs are stored without a fingerprint, so they never count as drift.
+    """
+    conn = connect_db()
+    try:
+        if run_mode == "RENDER":
+            conn.row_factory = sqlite3.Row
+
+        cursor = conn.cursor(dictionary=True) if run_mode != "RENDER" else conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        endpoint_filter = f"AND s.kg_endpoint = {placeholder}" if kg_endpoint else ""
+        params = [after_id] + ([kg_endpoint] if kg_endpoint else []) + [limit]
+
+        # Both correlated lookups are answered by the (submission_id, id) index
+        cursor.execute(
+            f"""
+            SELECT cur.submission_id, s.kg_endpoint, s.nl_question,
+                prev.result_fingerprint AS previous_fingerprint, prev.row_count AS previous_row_count,
+                prev.created_at AS previous_run_at,
+                cur.result_fingerprint, cur.row_count, cur.created_at AS run_at
+            FROM validation_results cur
+            JOIN validation_results prev ON prev.id = (
+                SELECT MAX(p.id) FROM validation_results p
+                WHERE p.submission_id = cur.submission_id AND p.id < cur.id
+                    AND p.result_fingerprint IS NOT NULL
+            )
+            JOIN submissions s ON s.id = cur.submission_id
+            WHERE cur.id = (
+                SELECT MAX(c.id) FROM validation_results c
+                WHERE c.submission_id = cur.submission_id AND c.result_fingerprint IS NOT NULL
+            )
+                AND cur.result_fingerprint <> prev.result_fingerprint
+                AND cur.submission_id > {placeholder} {endpoint_filter}
+            ORDER BY cur.submission_id
+            LIMIT {placeholder}
+        """,
+            params,
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def take_rate_limit_token(bucket_key: str, capacity: float, refill_per_second: float) -> float:
+    """
+    Take a token from a token bucket, refilling it for the time elapsed since its last use.
+
+    The refill and the take happen in a single conditional UPDATE, so concurrent workers
+    and pods cannot both take the last token.
+
+    Args:
+        bucket_key (str): The bucket, e.g. "user:<email>"
+        capacity (float): The maximum number of tokens, i.e. the allowed burst
+        refill_per_second (float): The number of tokens added back per second
+
+    Returns:
+        float: 0 if a token was taken, else the number of seconds until one is available
+    """
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        least = "LEAST" if run_mode != "RENDER" else "MIN"
+        now = time.time()
+        available = f"{least}({placeholder}, tokens + ({placeholder} - updated_at) * {placeholder})"
+        # MySQL assigns the columns from left to right, so tokens is computed with the old updated_at
+        cursor.execute(
+            f"""
+            UPDATE rate_limits
+            SET tokens = {available} - 1, updated_at = {placeholder}
+            WHERE bucket_key = {placeholder} AND {available} >= 1
+        """,
+            (capacity, now, refill_per_second, now, bucket_key, capacity, now, refill_per_second),
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            return 0.0
+
+        insert = "INSERT IGNORE" if run_mode != "RENDER" else "INSERT OR IGNORE"
+        cursor.execute(
+            f"{insert} INTO rate_limits (bucket_key, tokens, updated_at) VALUES ({placeholder}, {placeholder}, {placeholder})",
+            (bucket_key, capacity - 1, now),
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            return 0.0
+
+        cursor.execute(f"SELECT tokens, updated_at FROM rate_limits WHERE bucket_key = {placeholder}", (bucket_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return 0.0
+        tokens = min(capacity, row[0] + (now - row[1]) * refill_per_second)
+        return max((1 - tokens) / refill_per_second, 0.0) if refill_per_second > 0 else float("inf")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def refund_rate_limit_token(bucket_key: str, capacity: float):
+    """Give back a token taken from a bucket by a request that was then refused elsewhere."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        least = "LEAST" if run_mode != "RENDER" else "MIN"
+        cursor.execute(
+            f"UPDATE rate_limits SET tokens = {least}({placeholder}, tokens + 1) WHERE bucket_key = {placeholder}",
+            (capacity, bucket_key),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def delete_full_rate_limits(bucket_prefix: str, capacity: float, refill_per_second: float, now: float) -> int:
+    """
+    Deletes the buckets that refilled completely, which behave like missing ones.
+
+    Args:
+        bucket_prefix (str): The kind of the buckets, e.g. "user:"
+        capacity (float): The maximum number of tokens of these buckets
+        refill_per_second (float): The number of tokens added back per second
+        now (float): The current time, as a UNIX timestamp
+
+    Returns:
+        int: The number of buckets deleted
+    """
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"""
+            DELETE FROM rate_limits
+            WHERE bucket_key LIKE {placeholder} AND tokens + ({placeholder} - updated_at) * {placeholder} >= {placeholder}
+        """,
+            (f"{bucket_prefix}%", now, refill_per_second, capacity),
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_session(session_key: str, now: float) -> Optional[Dict]:
+    """Returns the data (as JSON) and expiry of a session that has not expired, if any."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"SELECT data, expires_at FROM sessions WHERE session_key = {placeholder} AND expires_at > {placeholder}",
+            (session_key, now),
+        )
+        row = cursor.fetchone()
+        return {"data": row[0], "expires_at": row[1]} if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def save_session(session_key: str, data: str, expires_at: float):
+    """Creates or replaces a session."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(
+            f"REPLACE INTO sessions (session_key, data, expires_at) VALUES ({placeholder}, {placeholder}, {placeholder})",
+            (session_key, data, expires_at),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def delete_session(session_key: str):
+    """Deletes a session, e.g. on logout."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(f"DELETE FROM sessions WHERE session_key = {placeholder}", (session_key,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def delete_expired_sessions(now: float) -> int:
+    """Deletes the expired sessions and returns how many there were."""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        placeholder = "%s" if run_mode != "RENDER" else "?"
+        cursor.execute(f"DELETE FROM sessions WHERE expires_at <= {placeholder}", (now,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Time every query function of this module for the /metrics endpoint, and trace it
+metrics.instrument_module(globals())
+tracing.instrument_module(globals(), {"db.system": "sqlite" if run_mode == "RENDER" else "mysql"})
+
+
+if __name__ == "__main__":
+    # Pre-start command: migrate the schema once, before the workers start
+    init_db()
@@ -0,0 +1,869 @@
+import io
+import os
+import bz2
+import gzip
+import json
+import time
+import zlib
+import fcntl
+import shutil
+import struct
+import zipfile
+import hashlib
+import logging
+import sqlite3
+import resource
+import contextlib
+import multiprocessing
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+from rdflib import Graph
+from rdflib.store import Store
+from rdflib.term import BNode, Literal, URIRef
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser, ParseError
+
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Local directory holding one sub-directory (download + triple store) per dump URL
+DUMP_DIR = os.getenv("DUMP_DIR", "/var/tmp/quagga_dumps")
+DUMP_MAX_BYTES = int(os.getenv("DUMP_MAX_BYTES", str(5 * 1024**3)))
+# Disk space all the dumps of DUMP_DIR may take, the least recently queried are removed beyond it
+DUMP_DISK_BUDGET_BYTES = int(os.getenv("DUMP_DISK_BUDGET_BYTES", str(20 * 1024**3)))
+# Address space available to the process evaluating a query against a dump
+DUMP_QUERY_MEMORY_MB = int(os.getenv("DUMP_QUERY_MEMORY_MB", "1024"))
+# Address space available to the process loading a dump into its triple store
+DUMP_INGEST_MEMORY_MB = int(os.getenv("DUMP_INGEST_MEMORY_MB", "2048"))
+# rdflib reads Turtle, RDF/XML and JSON-LD documents whole, so only N-Triples dumps may be larger
+DUMP_MAX_DOCUMENT_BYTES = int(os.getenv("DUMP_MAX_DOCUMENT_BYTES", str(256 * 1024**2)))
+KEEP_DOWNLOADS = os.getenv("DUMP_KEEP_DOWNLOADS", "false").lower() == "true"
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 10000
+# Bounds of the content sniffing done when a dump URL is validated
+SNIFF_BYTES = int(os.getenv("DUMP_SNIFF_BYTES", str(64 * 1024)))
+SNIFF_MAX_DOWNLOAD = int(os.getenv("DUMP_SNIFF_MAX_DOWNLOAD", str(2 * 1024 * 1024)))
+SNIFF_SAMPLE_TRIPLES = 100
+
+ProgressCallback = Optional[Callable[[str], None]]
+
+
+class DumpQueryError(Exception):
+    """Raised when a query against a local dump cannot be evaluated."""
+
+
+def _encode_term(term) -> str:
+    """Encode an RDF term as the compact string stored in the terms table."""
+    if isinstance(term, Literal):
+        return f"L{term.language or ''}\x1f{term.datatype or ''}\x1f{term}"
+    if isinstance(term, BNode):
+        return f"B{term}"
+    return f"U{term}"
+
+
+@lru_cache(maxsize=100000)
+def _decode_term(encoded: str):
+    kind, value = encoded[0], encoded[1:]
+    if kind == "L":
+        language, datatype, lexical = value.split("\x1f", 2)
+        return Literal(lexical, lang=language or None, datatype=datatype or None)
+    if kind == "B":
+        return BNode(value)
+    return URIRef(value)
+
+
+class SQLiteTripleStore(Store):
+    """
+    Read-only rdflib store over an SQLite file with SPO, POS and OSP indexes.
+
+    Terms are interned in a `terms` table and triples are stored as integer IDs, so
+    rdflib's SPARQL engine can evaluate queries with indexed lookups without loading
+    the dump in memory.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._namespaces = {}
+
+    def _term_id(self, term) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT id FROM terms WHERE value = ?", (_encode_term(term),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def triples(self, triple_pattern, context=None) -> Iterator:
+        clauses, params = [], []
+        for column, term in zip(("s", "p", "o"), triple_pattern):
+            if term is None:
+                continue
+            term_id = self._term_id(term)
+            if term_id is None:
+                return
+            clauses.append(f"t.{column} = ?")
+            params.append(term_id)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            f"""
+            SELECT ts.value, tp.value, tobj.value FROM triples t
+            JOIN terms ts ON ts.id = t.s
+            JOIN terms tp ON tp.id = t.p
+            JOIN terms tobj ON tobj.id = t.o
+            {where}
+        """,
+            params,
+        )
+        for s, p, o in cursor:
+            yield (_decode_term(s), _decode_term(p), _decode_term(o)), iter([None])
+
+    def __len__(self, context=None) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def bind(self, prefix, namespace, override=True):
+        self._namespaces[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        for prefix, bound in self._namespaces.items():
+            if bound == namespace:
+                return prefix
+        return None
+
+    def namespaces(self):
+        yield from self._namespaces.items()
+
+    def close(self, commit_pending_transaction=False):
+        self.conn.close()
+
+
+class _TripleWriter:
+    """Buffers parsed triples and bulk-inserts them into a new SQLite triple store."""
+
+    def __init__(self, path: str, progress: ProgressCallback = None):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE terms (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+        self.conn.execute(
+            "CREATE TABLE triples (s INTEGER, p INTEGER, o INTEGER, PRIMARY KEY (s, p, o)) WITHOUT ROWID"
+        )
+        self.buffer = []
+        self.count = 0
+        self.progress = progress
+        self.last_report = time.monotonic()
+
+    def add(self, triple):
+        self.buffer.append(tuple(_encode_term(term) for term in triple))
+        if len(self.buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        values = {value for triple in self.buffer for value in triple}
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO terms (value) VALUES (?)", ((v,) for v in values)
+        )
+        ids = {}
+        values = list(values)
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            ids.update(
+                self.conn.execute(
+                    f"SELECT value, id FROM terms WHERE value IN ({placeholders})", chunk
+                ).fetchall()
+            )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)",
+            ((ids[s], ids[p], ids[o]) for s, p, o in self.buffer),
+        )
+        self.conn.commit()
+        self.count += len(self.buffer)
+        self.buffer = []
+        if self.progress and time.monotonic() - self.last_report > 5:
+            self.last_report = time.monotonic()
+            self.progress(f"Loading data dump: {self.count} triples parsed")
+
+    def finish(self) -> int:
+        self.flush()
+        if self.progress:
+            self.progress(f"Indexing {self.count} triples")
+        self.conn.execute("CREATE INDEX idx_triples_pos ON triples (p, o, s)")
+        self.conn.execute("CREATE INDEX idx_triples_osp ON triples (o, s, p)")
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+        n_triples = self.conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+        self.conn.close()
+        return n_triples
+
+
+class _WriterSink:
+    """Sink receiving the triples of the N-Triples parser."""
+
+    def __init__(self, writer: _TripleWriter):
+        self.writer = writer
+
+    def triple(self, s, p, o):
+        self.writer.add((s, p, o))
+
+
+class _LenientNTriplesParser(W3CNTriplesParser):
+    """N-Triples parser that skips invalid lines instead of aborting the whole dump."""
+
+    def parse(self, f, bnode_context=None, skolemize=False):
+        self.skolemize = skolemize
+        self.file = f
+        self.buffer = ""
+        self.skipped = 0
+        while True:
+            self.line = self.readline()
+            if self.line is None:
+                break
+            try:
+                self.parseline(bnode_context=bnode_context)
+            except ParseError:
+                self.skipped += 1
+        return self.sink
+
+
+class _GraphSink(Store):
+    """Write-only store handing the triples of non-streaming rdflib parsers (Turtle) to the writer."""
+
+    def __init__(self, writer: _TripleWriter):
+        super().__init__()
+        self.writer = writer
+
+    def add(self, triple, context=None, quoted=False):
+        self.writer.add(triple)
+
+
+def _paths(url: str) -> Dict[str, str]:
+    directory = os.path.join(DUMP_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest()[:16])
+    return {
+        "dir": directory,
+        "download": os.path.join(directory, "dump.download"),
+        "store": os.path.join(directory, "store.sqlite"),
+        "meta": os.path.join(directory, "meta.json"),
+        "lock": os.path.join(directory, "lock"),
+    }
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """Detect the compression of a file from its first bytes."""
+    if head.startswith(b"\x1f\x8b"):
+        return "gzip"
+    if head.startswith(b"BZh"):
+        return "bz2"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    return None
+
+
+FORMAT_EXTENSIONS = {
+    ".nt": "nt",
+    ".ntriples": "nt",
+    ".ttl": "turtle",
+    ".rdf": "xml",
+    ".owl": "xml",
+    ".xml": "xml",
+    ".jsonld": "json-ld",
+}
+
+
+def _looks_like_html(sample: str) -> bool:
+    return sample.lstrip()[:15].lower().startswith(("<!doctype html", "<html"))
+
+
+def detect_format(url: str, sample: str) -> Optional[str]:
+    """
+    Detect the RDF serialisation of a dump from its URL and a decompressed sample.
+
+    Args:
+        url (str): The URL (or archive member name) of the dump, whose extension is used when present
+        sample (str): The beginning of the decompressed content
+
+    Returns:
+        Optional[str]: The rdflib format name ("nt", "turtle", "xml" or "json-ld"),
+            or None if the content is an HTML page
+    """
+    if _looks_like_html(sample):
+        return None
+    path = url.lower().split("?", 1)[0]
+    for suffix in (".gz", ".bz2", ".zip"):
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+    for extension, rdf_format in FORMAT_EXTENSIONS.items():
+        if path.endswith(extension):
+            return rdf_format
+
+    start = sample.lstrip()
+    if start.startswith("<?xml") or start.startswith("<rdf:RDF"):
+        return "xml"
+    if start.startswith(("{", "[")):
+        return "json-ld"
+    lines = [line.strip() for line in sample.splitlines()[:-1] if line.strip() and not line.startswith("#")]
+    if lines and all(line.startswith(("<", "_:")) and line.endswith(".") for line in lines):
+        return "nt"
+    return "turtle"
+
+
+def _open_decompressed(path: str, compression: Optional[str]):
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "zip":
+        archive = zipfile.ZipFile(path)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if not members:
+            raise DumpQueryError("The zip archive of the data dump is empty")
+        return archive.open(members[0])
+    return open(path, "rb")
+
+
+class _StreamDecompressor:
+    """Incrementally decompresses the beginning of a gzip, bz2 or zip stream."""
+
+    def __init__(self, compression: Optional[str]):
+        self.compression = compression
+        self.member = None
+        self.header = b"" if compression == "zip" else None
+        # bytes left in a stored zip member whose size is known from its header
+        self.remaining = None
+        if compression == "gzip":
+            self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        elif compression == "bz2":
+            self.decompressor = bz2.BZ2Decompressor()
+        else:
+            self.decompressor = None
+
+    def _read_zip_header(self, data: bytes) -> bytes:
+        """Consume the local header of the first zip member, returning the member data received so far."""
+        self.header += data
+        if len(self.header) < 30:
+            return b""
+        (_, _, flags, method, _, _, _, compressed_size, _, name_length, extra_length) = struct.unpack(
+            "<4s5H3I2H", self.header[:30]
+        )
+        data_start = 30 + name_length + extra_length
+        if len(self.header) < data_start:
+            return b""
+        self.member = self.header[30 : 30 + name_length].decode("utf-8", errors="replace")
+        if method == zipfile.ZIP_DEFLATED:
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method != zipfile.ZIP_STORED:
+            raise DumpQueryError(f"Unsupported zip compression method {method}")
+        elif not flags & 0x08:
+            self.remaining = compressed_size
+        data, self.header = self.header[data_start:], None
+        return data
+
+    @property
+    def eof(self) -> bool:
+        """Whether the end of the (first member of the) compressed stream was reached."""
+        if self.remaining is not None:
+            return self.remaining == 0
+        return bool(getattr(self.decompressor, "eof", False))
+
+    def feed(self, data: bytes) -> bytes:
+        if self.header is not None:
+            data = self._read_zip_header(data)
+        if self.remaining is not None:
+            data = data[: self.remaining]
+            self.remaining -= len(data)
+        if self.decompressor is None or not data:
+            return data
+        try:
+            return self.decompressor.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise DumpQueryError(f"The data dump is not valid {self.compression} data: {e}")
+
+
+def _total_size(response) -> Optional[int]:
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    if response.status_code == 200 and not response.headers.get("Content-Encoding"):
+        length = response.headers.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+    return None
+
+
+def _read_head(url: str) -> tuple[bytes, bool, Optional[str], Dict]:
+    """
+    Read and decompress the beginning of a dump, without downloading the rest of it.
+
+    A range request bounds what the server sends, and the streamed body is closed as
+    soon as enough decompressed content has been seen.
+
+    Returns:
+        tuple: (decompressed head, whether it is the whole content, member name of a
+            zip archive, response metadata)
+    """
+    headers = {"Range": f"bytes=0-{SNIFF_MAX_DOWNLOAD - 1}", "Accept-Encoding": "identity"}
+    with requests.get(url, headers=headers, stream=True, timeout=10, allow_redirects=True) as response:
+        if response.status_code not in (200, 206):
+            raise DumpQueryError(f"URL is not accessible (HTTP {response.status_code})")
+        metadata = {
+            "size": _total_size(response),
+            "compression": None,
+            "content_type": response.headers.get("Content-Type", "").split(";")[0].strip() or None,
+            "range_supported": response.status_code == 206,
+        }
+
+        decompressor = None
+        head = b""
+        received = 0
+        truncated = False
+        for chunk in response.raw.stream(16 * 1024, decode_content=False):
+            received += len(chunk)
+            if decompressor is None:
+                decompressor = _StreamDecompressor(detect_compression(chunk[:4]))
+                metadata["compression"] = decompressor.compression
+            head += decompressor.feed(chunk)
+            if decompressor.eof:
+                break
+            if len(head) > SNIFF_BYTES or received >= SNIFF_MAX_DOWNLOAD:
+                truncated = True
+                break
+
+    # a range response only holds the whole dump if it covers the announced size
+    complete = not truncated and (
+        response.status_code == 200
+        or (metadata["size"] is not None and received >= metadata["size"])
+        or (decompressor is not None and decompressor.eof)
+    )
+    member = decompressor.member if decompressor else None
+    return head[:SNIFF_BYTES], complete, member, metadata
+
+
+class _CountingSink:
+    def __init__(self):
+        self.count = 0
+
+    def triple(self, s, p, o):
+        self.count += 1
+
+
+def _parse_sample(sample: str, rdf_format: str, complete: bool) -> tuple[Optional[int], int]:
+    """
+    Parse the triples of a sample of the dump.
+
+    Line-based N-Triples are cut after the last complete line and Turtle after the
+    last statement ending a line; XML and JSON-LD can only be parsed when complete.
+
+    Returns:
+        tuple[Optional[int], int]: (number of triples parsed, or None when the sample
+            could not be parsed, number of invalid N-Triples lines)
+    """
+    if rdf_format == "nt":
+        lines = sample.splitlines()
+        if not complete:
+            lines = lines[:-1]
+        lines = [line for line in lines if line.strip() and not line.lstrip().startswith("#")]
+        parser = _LenientNTriplesParser(sink=_CountingSink())
+        parser.parse(io.StringIO("\n".join(lines[:SNIFF_SAMPLE_TRIPLES]) + "\n"))
+        return parser.sink.count, parser.skipped
+
+    if rdf_format == "turtle" and not complete:
+        end = max(sample.rfind(".\n"), sample.rfind(".\r\n"))
+        sample = sample[: end + 1] if end >= 0 else ""
+    elif not complete:
+        return None, 0
+    graph = Graph()
+    graph.parse(data=sample, format=rdf_format)
+    return len(graph), 0
+
+
+def sniff_dump(url: str) -> Dict:
+    """
+    Inspect a data dump URL from the first bytes of its content.
+
+    Detects the compression (gzip, bz2 or zip) and RDF serialisation, reports the size
+    announced by the server and parses a bounded sample of triples.
+
+    Args:
+        url (str): The URL of the dump
+
+    Returns:
+        Dict: size, compression, format, archive member, content type and the number
+            of triples parsed from the sample
+
+    Raises:
+        DumpQueryError: If the URL does not serve an RDF dump that can be read
+    """
+    head, complete, member, metadata = _read_head(url)
+    if not head.strip():
+        raise DumpQueryError("The data dump is empty or its beginning could not be decompressed")
+    sample = head.decode("utf-8", errors="replace")
+
+    rdf_format = detect_format(member or url, sample)
+    if rdf_format is None:
+        raise DumpQueryError("URL returns an HTML page, not an RDF data dump")
+    try:
+        sample_triples, skipped = _parse_sample(sample, rdf_format, complete)
+    except Exception as e:
+        raise DumpQueryError(f"The beginning of the data dump is not valid {rdf_format}: {e}")
+    if sample_triples == 0:
+        raise DumpQueryError(f"No valid triples found in the first {len(head)} bytes of the data dump")
+
+    metadata.update(
+        {
+            "format": rdf_format,
+            "archive_member": member,
+            "sample_bytes": len(head),
+            "sample_triples": sample_triples,
+            "sample_invalid_lines": skipped,
+            "queryable": metadata["size"] is None
+            or metadata["size"] <= (DUMP_MAX_BYTES if rdf_format == "nt" else DUMP_MAX_DOCUMENT_BYTES),
+        }
+    )
+    return metadata
+
+
+def download_dump(url: str, path: str, progress: ProgressCallback = None) -> int:
+    """
+    Download a dump to disk in chunks, resuming a previous partial download if any.
+
+    Args:
+        url (str): The URL of the dump
+        path (str): Destination file, `<path>.part` holds the partial download
+        progress (ProgressCallback): Called with human readable progress messages
+
+    Returns:
+        int: The size of the downloaded file in bytes
+    """
+    if os.path.exists(path):
+        return os.path.getsize(path)
+
+    part = f"{path}.part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=30, allow_redirects=True) as response:
+        if response.status_code == 416:
+            # The partial file is already complete
+            os.replace(part, path)
+            return offset
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            logging.info(f"Server ignored the range request for {url}, restarting the download")
+            offset = 0
+
+        size = offset
+        last_report = time.monotonic()
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+                if size > DUMP_MAX_BYTES:
+                    raise DumpQueryError(f"Data dump is larger than {DUMP_MAX_BYTES} bytes")
+                if progress and time.monotonic() - last_report > 5:
+                    last_report = time.monotonic()
+                    progress(f"Downloading data dump: {size // (1024 * 1024)} MB")
+
+    os.replace(part, path)
+    return size
+
+
+def ingest_dump(source_path: str, store_path: str, url: str, progress: ProgressCallback = None) -> Dict:
+    """
+    Stream-parse a downloaded dump into a new indexed SQLite triple store.
+
+    N-Triples are parsed line by line; Turtle, RDF/XML and JSON-LD go through rdflib's
+    parsers, which read the whole document, so they are refused above DUMP_MAX_DOCUMENT_BYTES.
+    Run it through _ingest_in_subprocess, whose memory is capped.
+
+    Returns:
+        Dict: The detected format and compression, and the number of triples stored
+    """
+    with open(source_path, "rb") as f:
+        compression = detect_compression(f.read(4))
+    with _open_decompressed(source_path, compression) as f:
+        sample = f.read(64 * 1024).decode("utf-8", errors="replace")
+    rdf_format = detect_format(url, sample)
+    if rdf_format is None:
+        raise DumpQueryError("The data dump is an HTML page, not RDF")
+    if rdf_format != "nt" and os.path.getsize(source_path) > DUMP_MAX_DOCUMENT_BYTES:
+        raise DumpQueryError(
+            f"The data dump is in the {rdf_format} format and larger than {DUMP_MAX_DOCUMENT_BYTES // (1024 * 1024)} MB, "
+            "which cannot be loaded without reading it whole: only N-Triples dumps can be larger"
+        )
+
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    writer = _TripleWriter(store_path, progress)
+    skipped = 0
+    with _open_decompressed(source_path, compression) as f:
+        if rdf_format == "nt":
+            parser = _LenientNTriplesParser(sink=_WriterSink(writer))
+            parser.parse(io.TextIOWrapper(f, encoding="utf-8", errors="replace"))
+            skipped = parser.skipped
+        else:
+            graph = Graph(store=_GraphSink(writer))
+            graph.parse(f, format=rdf_format)
+    n_triples = writer.finish()
+    if skipped:
+        logging.warning(f"Skipped {skipped} invalid lines while loading {url}")
+    return {"format": rdf_format, "compression": compression, "triples": n_triples, "skipped_lines": skipped}
+
+
+def _ingest_worker(source_path: str, store_path: str, url: str, memory_bytes: int, connection):
+    """Load the dump in a separate process whose address space is capped, sending its progress."""
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        info = ingest_dump(source_path, store_path, url, lambda message: connection.send(("progress", message)))
+        connection.send(("ok", info))
+    except MemoryError:
+        connection.send(("error", f"Loading the data dump exceeded the memory limit of {memory_bytes // (1024 * 1024)} MB"))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+def _ingest_in_subprocess(source_path: str, store_path: str, url: str, progress: ProgressCallback = None) -> Dict:
+    """Run ingest_dump out of the web process, so that a large dump cannot exhaust its memory."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_ingest_worker,
+        args=(source_path, store_path, url, DUMP_INGEST_MEMORY_MB * 1024 * 1024, sender),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        while True:
+            status, payload = receiver.recv()
+            if status != "progress":
+                break
+            if progress:
+                progress(payload)
+    except EOFError:
+        raise DumpQueryError("Loading process exited unexpectedly, possibly out of memory")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if status != "ok":
+        raise DumpQueryError(payload)
+    return payload
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    with open(path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _directory_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(OSError):
+                size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def evict_dumps(reserve: int = 0, keep: Optional[str] = None) -> int:
+    """
+    Remove the least recently queried dumps until DUMP_DIR fits in DUMP_DISK_BUDGET_BYTES.
+
+    The modification time of meta.json records the last use of a dump. Dumps being loaded by
+    another worker hold their lock and are skipped; a query still reading a removed store keeps
+    its open file until it finishes.
+
+    Args:
+        reserve (int): Bytes to free on top of the budget, for a dump about to be downloaded
+        keep (Optional[str]): Directory of the dump being loaded, never removed
+
+    Returns:
+        int: The number of dumps removed
+    """
+    if not os.path.isdir(DUMP_DIR):
+        return 0
+    directories = []
+    for name in os.listdir(DUMP_DIR):
+        directory = os.path.join(DUMP_DIR, name)
+        if os.path.isdir(directory):
+            meta = os.path.join(directory, "meta.json")
+            last_used = os.path.getmtime(meta) if os.path.exists(meta) else os.path.getmtime(directory)
+            directories.append((last_used, directory, _directory_size(directory)))
+    used = sum(size for _, _, size in directories)
+
+    removed = 0
+    for _, directory, size in sorted(directories):
+        if used + reserve <= DUMP_DISK_BUDGET_BYTES:
+            break
+        if directory == keep:
+            continue
+        try:
+            lock_file = open(os.path.join(directory, "lock"), "w")
+        except OSError:
+            # Removed by another worker in the meantime
+            continue
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+        used -= size
+        removed += 1
+        logging.info(f"Removed the data dump stored in {directory} to stay within the disk budget")
+    return removed
+
+
+def get_dump_info(url: str) -> Optional[Dict]:
+    """Return the metadata of the local store of a dump, or None if it is not loaded yet."""
+    paths = _paths(url)
+    if not os.path.exists(paths["meta"]):
+        return None
+    with open(paths["meta"]) as f:
+        return json.load(f)
+
+
+def ensure_ingested(url: str, progress: ProgressCallback = None) -> str:
+    """
+    Make sure the dump is downloaded and loaded into its local store, doing it only once.
+
+    Args:
+        url (str): The URL of the dump
+        progress (ProgressCallback): Called with human readable progress messages
+
+    Returns:
+        str: The path of the SQLite triple store
+    """
+    paths = _paths(url)
+    if get_dump_info(url):
+        metrics.record_cache("dump_store", hit=True)
+        # Mark the dump as recently used, for evict_dumps
+        with contextlib.suppress(OSError):
+            os.utime(paths["meta"])
+        return paths["store"]
+    metrics.record_cache("dump_store", hit=False)
+
+    os.makedirs(paths["dir"], exist_ok=True)
+    # Serialise concurrent loads of the same dump by the workers sharing this disk
+    with _locked(paths["lock"]):
+        if get_dump_info(url):
+            return paths["store"]
+
+        # Make room for the largest download allowed before starting it
+        evict_dumps(reserve=DUMP_MAX_BYTES, keep=paths["dir"])
+        if progress:
+            progress("Downloading data dump")
+        size = download_dump(url, paths["download"], progress)
+        tmp_store = f"{paths['store']}.tmp"
+        info = _ingest_in_subprocess(paths["download"], tmp_store, url, progress)
+        os.replace(tmp_store, paths["store"])
+        info.update({"url": url, "size": size, "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        with open(paths["meta"], "w") as f:
+            json.dump(info, f)
+        if not KEEP_DOWNLOADS:
+            os.remove(paths["download"])
+        logging.info(f"Loaded {info['triples']} triples from data dump {url}")
+    # The triple store can take more space than the download it was reserved for
+    evict_dumps(keep=paths["dir"])
+    return paths["store"]
+
+
+def _format_row(row, variables: List) -> Dict:
+    return {str(var): str(row[var]) for var in variables if row[var] is not None}
+
+
+def _query_worker(store_path: str, query: str, limit: int, memory_bytes: int, connection):
+    """Evaluate the query in a separate process whose address space is capped."""
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        graph = Graph(store=SQLiteTripleStore(store_path))
+        result = graph.query(query)
+        if result.type == "ASK":
+            rows = [{"result": str(result.askAnswer)}]
+        elif result.type == "SELECT":
+            rows = []
+            for row in result:
+                if len(rows) >= limit:
+                    break
+                rows.append(_format_row(row, result.vars))
+        else:
+            rows = []
+            for s, p, o in result:
+                if len(rows) >= limit:
+                    break
+                rows.append({"s": str(s), "p": str(p), "o": str(o)})
+        connection.send(("ok", rows))
+    except MemoryError:
+        connection.send(("error", f"Query exceeded the memory limit of {memory_bytes // (1024 * 1024)} MB"))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+def query_dump(query: str, url: str, limit: int = 20, timeout: int = 120, progress: ProgressCallback = None) -> List[Dict]:
+    """
+    Run a SPARQL query against the local store of a dump, loading the dump first if needed.
+
+    Args:
+        query (str): SPARQL query to execute
+        url (str): The URL of the dump
+        limit (int): Maximum number of results to return
+        timeout (int): Timeout in seconds for the query evaluation
+        progress (ProgressCallback): Called with progress messages while the dump loads
+
+    Returns:
+        List[dict]: Query results where each dict maps variable names to their string values
+
+    Raises:
+        TimeoutError: If the evaluation takes longer than the timeout
+        DumpQueryError: If the evaluation fails or exceeds the memory limit
+    """
+    store_path = ensure_ingested(url, progress)
+    if progress:
+        progress("Executing query against the local copy of the data dump")
+
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_query_worker,
+        args=(store_path, query, limit, DUMP_QUERY_MEMORY_MB * 1024 * 1024, sender),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"SPARQL query execution timed out after {timeout} seconds")
+        status, payload = receiver.recv()
+    except EOFError:
+        raise DumpQueryError("Query process exited unexpectedly, possibly out of memory")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if status != "ok":
+        raise DumpQueryError(payload)
+    return payload
@@ -0,0 +1,236 @@
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Size of the rolling window of observations kept per endpoint and operation
+WINDOW_SIZE = int(os.getenv("ENDPOINT_HEALTH_WINDOW", "50"))
+# Number of successful observations required before timeouts become adaptive
+MIN_SAMPLES = int(os.getenv("ENDPOINT_TIMEOUT_MIN_SAMPLES", "5"))
+# Adaptive timeout = p95 * multiplier, clamped to [minimum, default timeout]
+TIMEOUT_P95_MULTIPLIER = float(os.getenv("ENDPOINT_TIMEOUT_P95_MULTIPLIER", "3"))
+MIN_TIMEOUT = float(os.getenv("ENDPOINT_TIMEOUT_MIN", "5"))
+# Consecutive failures after which the circuit opens, and how long it stays open
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "60"))
+PROBE_TIMEOUT = float(os.getenv("CIRCUIT_PROBE_TIMEOUT", "10"))
+# Endpoints tracked per process; any URL can be validated, so the least recently used are dropped
+MAX_ENDPOINTS = int(os.getenv("ENDPOINT_HEALTH_MAX_ENDPOINTS", "1000"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit of the endpoint is open."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(
+            f"SPARQL endpoint {endpoint} is temporarily unavailable after repeated failures, "
+            f"retry in {math.ceil(retry_after)} seconds"
+        )
+
+
+class _EndpointHealth:
+    """Rolling latency/error observations and circuit state for one endpoint."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.outcomes = deque(maxlen=WINDOW_SIZE)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.last_error = None
+
+    def window(self, operation: str) -> deque:
+        if operation not in self.latencies:
+            self.latencies[operation] = deque(maxlen=WINDOW_SIZE)
+        return self.latencies[operation]
+
+
+# The registry lives in process memory, so each uvicorn worker keeps its own view
+_registry: "OrderedDict[str, _EndpointHealth]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get(endpoint: str) -> _EndpointHealth:
+    with _lock:
+        if endpoint in _registry:
+            _registry.move_to_end(endpoint)
+        else:
+            _registry[endpoint] = _EndpointHealth()
+            while len(_registry) > MAX_ENDPOINTS:
+                _registry.popitem(last=False)
+        return _registry[endpoint]
+
+
+def percentile(values, q: float) -> Optional[float]:
+    """
+    Compute the q-th percentile (0-100) of the given values using nearest-rank.
+
+    Args:
+        values: The observed values
+        q (float): The percentile to compute
+
+    Returns:
+        Optional[float]: The percentile, or None if there are no values
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(math.ceil(q / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def record_success(endpoint: str, latency: float, operation: str = "check"):
+    """Record a successful call to the endpoint and close its circuit."""
+    health = _get(endpoint)
+    with _lock:
+        health.window(operation).append(latency)
+        health.outcomes.append(True)
+        health.consecutive_failures = 0
+        if health.state != CLOSED:
+            logging.info(f"Circuit for SPARQL endpoint {endpoint} closed")
+        health.state = CLOSED
+        health.opened_at = None
+
+
+def record_failure(endpoint: str, error: str = ""):
+    """Record a failed call to the endpoint, opening its circuit past the threshold."""
+    health = _get(endpoint)
+    with _lock:
+        health.outcomes.append(False)
+        health.consecutive_failures += 1
+        health.last_error = error
+        if health.state == HALF_OPEN or (
+            health.state == CLOSED and health.consecutive_failures >= FAILURE_THRESHOLD
+        ):
+            logging.warning(
+                f"Circuit for SPARQL endpoint {endpoint} opened after "
+                f"{health.consecutive_failures} consecutive failures"
+            )
+            health.state = OPEN
+            health.opened_at = time.monotonic()
+
+
+def get_timeout(endpoint: str, operation: str, default: float) -> float:
+    """
+    Derive a timeout for the endpoint from the observed p95 latency of the operation.
+
+    Args:
+        endpoint (str): The URI of the SPARQL endpoint
+        operation (str): The kind of call, e.g. "check" or "query"
+        default (float): The timeout used without enough history, also the upper bound
+
+    Returns:
+        float: The timeout in seconds
+    """
+    health = _get(endpoint)
+    with _lock:
+        samples = list(health.window(operation))
+    if len(samples) < MIN_SAMPLES:
+        return default
+    adaptive = percentile(samples, 95) * TIMEOUT_P95_MULTIPLIER
+    return max(min(adaptive, default), min(MIN_TIMEOUT, default))
+
+
+def _run_probe(endpoint: str, probe: Callable[[float], bool]):
+    """Probe a half-open endpoint and close or re-open its circuit accordingly."""
+    started = time.monotonic()
+    try:
+        healthy = probe(PROBE_TIMEOUT)
+    except Exception as e:
+        logging.error(f"Probe of SPARQL endpoint {endpoint} failed: {e}")
+        healthy = False
+
+    if healthy:
+        record_success(endpoint, time.monotonic() - started)
+    else:
+        record_failure(endpoint, "half-open probe failed")
+
+
+def allow_request(endpoint: str, probe: Callable[[float], bool]) -> bool:
+    """
+    Check whether a call to the endpoint may go ahead.
+
+    Once an open circuit has cooled down it moves to half-open and the probe is run
+    in a background thread; calls keep failing fast until the probe succeeds.
+
+    Args:
+        endpoint (str): The URI of the SPARQL endpoint
+        probe (Callable[[float], bool]): Liveness check called with a timeout in seconds
+
+    Returns:
+        bool: True if the circuit is closed, False if the call should fail fast
+    """
+    health = _get(endpoint)
+    with _lock:
+        if health.state == CLOSED:
+            return True
+        if health.state == HALF_OPEN:
+            return False
+        if time.monotonic() - health.opened_at < OPEN_SECONDS:
+            return False
+        health.state = HALF_OPEN
+
+    logging.info(f"Circuit for SPARQL endpoint {endpoint} half-open, probing in background")
+    thread = threading.Thread(target=_run_probe, args=(endpoint, probe))
+    thread.daemon = True
+    thread.start()
+    return False
+
+
+def retry_after(endpoint: str) -> float:
+    """
+    Seconds after which calls to the endpoint may be let through again, 0 if its circuit is closed.
+
+    A half-open circuit waits for its probe, so at least PROBE_TIMEOUT; an open one that has
+    cooled down is probed on the next call, so at least a second.
+    """
+    health = _get(endpoint)
+    with _lock:
+        if health.state == CLOSED:
+            return 0.0
+        if health.state == HALF_OPEN or health.opened_at is None:
+            return PROBE_TIMEOUT
+        return max(OPEN_SECONDS - (time.monotonic() - health.opened_at), 1.0)
+
+
+def get_health(endpoint: str, default_timeout: float = 15) -> Dict:
+    """
+    Summarise the observed health of the endpoint.
+
+    Args:
+        endpoint (str): The URI of the SPARQL endpoint
+        default_timeout (float): Timeout reported when there is not enough history
+
+    Returns:
+        Dict: Circuit state, latency percentiles, error rate and the current timeout
+    """
+    health = _get(endpoint)
+    with _lock:
+        latencies = list(health.window("check"))
+        outcomes = list(health.outcomes)
+        state = health.state
+        last_error = health.last_error
+
+    p50 = percentile(latencies, 50)
+    p95 = percentile(latencies, 95)
+    return {
+        "circuit_state": state,
+        "samples": len(outcomes),
+        "error_rate": round(outcomes.count(False) / len(outcomes), 3) if outcomes else 0.0,
+        "latency_p50": round(p50, 3) if p50 is not None else None,
+        "latency_p95": round(p95, 3) if p95 is not None else None,
+        "timeout": round(get_timeout(endpoint, "check", default_timeout), 3),
+        "retry_after": math.ceil(retry_after(endpoint)) or None,
+        "last_error": last_error,
+    }
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List
+
+import const
+import database
+import exporters
+
+logging.getLogger().setLevel(logging.INFO)
+
+SPLITS = ("train", "dev", "test")
+
+
+def assign_split(submission_id: int, train: float, dev: float, seed: str = "quagga") -> str:
+    """
+    Deterministically assign a submission to the train, dev or test split.
+
+    The split only depends on the hash of the seed and the submission ID, so a
+    submission keeps its split across exports and shards as the dataset grows.
+
+    Args:
+        submission_id (int): The ID of the submission
+        train (float): Fraction of the submissions in the train split
+        dev (float): Fraction of the submissions in the dev split, the rest is test
+        seed (str): Changes the assignment when a different split is wanted
+
+    Returns:
+        str: "train", "dev" or "test"
+    """
+    digest = hashlib.sha256(f"{seed}:{submission_id}".encode("utf-8")).digest()
+    position = int.from_bytes(digest[:8], "big") / 2**64
+    if position < train:
+        return "train"
+    if position < train + dev:
+        return "dev"
+    return "test"
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "kg"
+
+
+class _Counter:
+    """Counts the submissions flowing through it."""
+
+    def __init__(self, submissions: Iterable[Dict]):
+        self.submissions = submissions
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        for submission in self.submissions:
+            self.count += 1
+            yield submission
+
+
+def write_shard(shard: Dict, output_dir: str, export_format: str, train: float, dev: float, seed: str) -> Dict:
+    """
+    Write the train/dev/test files of one shard, streaming its submissions from the database.
+
+    Each split streams the submissions of the shard's endpoints again, so that memory
+    stays constant whatever the size of the shard.
+
+    Args:
+        shard (Dict): The shard with its kind, key, directory and endpoints
+
+    Returns:
+        Dict: The manifest entry of the shard with the count, size and sha256 of each file
+    """
+    extension = exporters.EXPORT_FORMATS[export_format][2]
+    directory = os.path.join(output_dir, shard["directory"])
+    os.makedirs(directory, exist_ok=True)
+
+    files = {}
+    for split in SPLITS:
+        submissions = _Counter(
+            sub
+            for sub in database.iter_submissions(kg_endpoints=shard["endpoints"])
+            if assign_split(sub["id"], train, dev, seed) == split
+        )
+        path = os.path.join(directory, f"{split}.{extension}")
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in exporters.export_submissions(submissions, export_format):
+                data = chunk.encode("utf-8")
+                f.write(data)
+                digest.update(data)
+                size += len(data)
+        files[split] = {
+            "path": os.path.relpath(path, output_dir),
+            "count": submissions.count,
+            "bytes": size,
+            "sha256": digest.hexdigest(),
+        }
+
+    return {
+        "kind": shard["kind"],
+        "key": shard["key"],
+        "name": shard["name"],
+        "endpoints": shard["endpoints"],
+        "count": sum(entry["count"] for entry in files.values()),
+        "files": files,
+    }
+
+
+def plan_shards() -> List[Dict]:
+    """List one shard per KG endpoint with submissions, and one per domain of those KGs."""
+    counts = database.get_submission_counts_by_endpoint()
+    kg_metadata = {kg["endpoint"]: kg for kg in database.get_all_kg_metadata()}
+
+    shards = []
+    domains = {}
+    for endpoint in sorted(counts):
+        kg = kg_metadata.get(endpoint)
+        name = kg["name"] if kg else endpoint
+        prefix = kg["id"] if kg else hashlib.sha256(endpoint.encode("utf-8")).hexdigest()[:8]
+        shards.append({
+            "kind": "kg",
+            "key": endpoint,
+            "name": name,
+            "directory": os.path.join("by_kg", f"{prefix}-{_slug(name)}"),
+            "endpoints": [endpoint],
+        })
+        for domain in (kg.get("domains") or "").split(",") if kg else []:
+            domain = domain.strip()
+            if domain in const.DISCIPLINE_DOMAINS:
+                domains.setdefault(domain, []).append(endpoint)
+
+    for domain, endpoints in sorted(domains.items()):
+        shards.append({
+            "kind": "domain",
+            "key": domain,
+            "name": const.DISCIPLINE_DOMAINS[domain],
+            "directory": os.path.join("by_domain", domain),
+            "endpoints": endpoints,
+        })
+    return shards
+
+
+def export_shards(
+    output_dir: str,
+    export_format: str = "jsonl",
+    workers: int = 4,
+    train: float = 0.8,
+    dev: float = 0.1,
+    seed: str = "quagga",
+) -> Dict:
+    """
+    Write the sharded export, with train/dev/test splits, in parallel worker processes.
+
+    Returns:
+        Dict: The manifest, also written to manifest.json in the output directory
+    """
+    if export_format not in exporters.EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{export_format}'")
+    if not (0 <= train and 0 <= dev and train + dev <= 1):
+        raise ValueError("train and dev must be fractions whose sum is at most 1")
+
+    started = time.monotonic()
+    shards = plan_shards()
+    os.makedirs(output_dir, exist_ok=True)
+    logging.info(f"Exporting {len(shards)} shards to {output_dir} with {workers} worker processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(write_shard, shard, output_dir, export_format, train, dev, seed)
+            for shard in shards
+        ]
+        entries = [future.result() for future in futures]
+
+    manifest = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "format": export_format,
+        "split": {"seed": seed, "train": train, "dev": dev, "test": round(1 - train - dev, 6)},
+        "shards": entries,
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(f"Exported {len(entries)} shards in {time.monotonic() - started:.1f}s")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the submissions as one shard per KG endpoint and per domain, split into train/dev/test."
+    )
+    parser.add_argument("--output-dir", default="export_shards", help="Directory the shards and manifest.json are written to")
+    parser.add_argument("--format", default="jsonl", choices=list(exporters.EXPORT_FORMATS), help="Format of the shard files")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes writing shards")
+    parser.add_argument("--train", type=float, default=0.8, help="Fraction of the submissions in the train split")
+    parser.add_argument("--dev", type=float, default=0.1, help="Fraction of the submissions in the dev split, the rest is test")
+    parser.add_argument("--seed", default="quagga", help="Seed of the split assignment")
+    args = parser.parse_args()
+
+    export_shards(args.output_dir, args.format, args.workers, args.train, args.dev, args.seed)
+
+
+if __name__ == "__main__":
+    main()
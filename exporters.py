@@ -0,0 +1,220 @@
+import io
+import os
+import re
+import csv
+import json
+from typing import Dict, Iterable, Iterator, Optional
+
+import helper_methods
+from helper_methods import escape_string
+
+# Serializers writing the submissions dataset record by record, without building an
+# rdflib Graph, so that exports stream in constant memory whatever the dataset size.
+# The RDF layout follows https://github.com/sib-swiss/sparql-examples
+
+SH = "http://www.w3.org/ns/shacl#"
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+SCHEMA = "http://schema.org/"
+QKL = "http://example.org/question-kg-linker/"
+
+PREFIXES = {"sh": SH, "rdfs": RDFS, "schema": SCHEMA, "qkl": QKL}
+PREFIXES_NODE = "sparql_examples_prefixes"
+
+# Fields of the tabular exports; usernames are personal data and never exported
+FIELDS = ["id", "kg_endpoint", "nl_question", "sparql_query", "source"]
+
+# Number of records joined into each chunk handed to the response
+CHUNK_RECORDS = 500
+
+# Incremental exports only return changes older than this, see database.get_changed_submissions
+CURSOR_LAG_SECONDS = int(os.getenv("EXPORT_CURSOR_LAG_SECONDS", "5"))
+
+# Characters not allowed in an IRIREF of Turtle and N-Triples
+_IRI_ESCAPE = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+def _escape_iri(value: str) -> str:
+    if not _IRI_ESCAPE.search(value):
+        return value
+    return _IRI_ESCAPE.sub(lambda m: f"\\u{ord(m.group()):04X}", value)
+
+
+def _timestamp(tombstone: Dict) -> str:
+    return str(tombstone["deleted_at"]).replace(" ", "T")
+
+
+def _comment(sub: Dict) -> str:
+    return (
+        "SPARQL - Natural language question pair"
+        if sub["sparql_query"]
+        else "Natural Language Question"
+    )
+
+
+def encode_cursor(updated_at: str, submission_id: int, tombstone_id: int) -> str:
+    """Encode an export position as an opaque URL-safe cursor."""
+    return helper_methods.encode_cursor({"u": updated_at, "i": submission_id, "d": tombstone_id})
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """
+    Decode a cursor returned by a previous export.
+
+    Returns:
+        Dict: The position with its updated_at, submission_id and tombstone_id
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        payload = helper_methods.decode_cursor(cursor)
+        return {
+            "updated_at": str(payload["u"]),
+            "submission_id": int(payload["i"]),
+            "tombstone_id": int(payload["d"]),
+        }
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid export cursor: {e}")
+
+
+def _chunked(records: Iterable[str]) -> Iterator[str]:
+    """Join serialized records into larger chunks to limit per-chunk overhead."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= CHUNK_RECORDS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _turtle_records(submissions: Iterable[Dict], tombstones: Optional[Iterable[Dict]]) -> Iterator[str]:
+    yield "".join(f"@prefix {prefix}: <{iri}> .\n" for prefix, iri in PREFIXES.items()) + "\n"
+    for sub in submissions:
+        record = (
+            f"qkl:{sub['id']}\n"
+            f"\ta sh:SPARQLExecutable, sh:SPARQLSelectExecutable ;\n"
+            f'\trdfs:comment "{_comment(sub)}" ;\n'
+            f"\tsh:prefixes _:{PREFIXES_NODE} ;\n"
+        )
+        if sub["sparql_query"]:
+            record += f'\tsh:select "{escape_string(sub["sparql_query"])}" ;\n'
+        record += (
+            f"\tschema:target <{_escape_iri(sub['kg_endpoint'])}> ;\n"
+            f'\tqkl:nlQuestion "{escape_string(sub["nl_question"])}" .\n\n'
+        )
+        yield record
+    for tombstone in tombstones or []:
+        yield f'qkl:{tombstone["submission_id"]} qkl:deletedAt "{_timestamp(tombstone)}"^^<{XSD}dateTime> .\n'
+
+
+def _ntriples_records(submissions: Iterable[Dict], tombstones: Optional[Iterable[Dict]]) -> Iterator[str]:
+    rdf_type = f"<{RDF}type>"
+    for sub in submissions:
+        subject = f"<{QKL}{sub['id']}>"
+        record = (
+            f"{subject} {rdf_type} <{SH}SPARQLExecutable> .\n"
+            f"{subject} {rdf_type} <{SH}SPARQLSelectExecutable> .\n"
+            f'{subject} <{RDFS}comment> "{_comment(sub)}" .\n'
+            f"{subject} <{SH}prefixes> _:{PREFIXES_NODE} .\n"
+        )
+        if sub["sparql_query"]:
+            record += f'{subject} <{SH}select> "{escape_string(sub["sparql_query"])}" .\n'
+        record += (
+            f"{subject} <{SCHEMA}target> <{_escape_iri(sub['kg_endpoint'])}> .\n"
+            f'{subject} <{QKL}nlQuestion> "{escape_string(sub["nl_question"])}" .\n'
+        )
+        yield record
+    for tombstone in tombstones or []:
+        yield (
+            f'<{QKL}{tombstone["submission_id"]}> <{QKL}deletedAt> '
+            f'"{_timestamp(tombstone)}"^^<{XSD}dateTime> .\n'
+        )
+
+
+def _jsonld_records(submissions: Iterable[Dict], tombstones: Optional[Iterable[Dict]]) -> Iterator[str]:
+    yield '{"@context": ' + json.dumps(PREFIXES) + ', "@graph": [\n'
+    separator = ""
+    for sub in submissions:
+        node = {
+            "@id": f"qkl:{sub['id']}",
+            "@type": ["sh:SPARQLExecutable", "sh:SPARQLSelectExecutable"],
+            "rdfs:comment": _comment(sub),
+            "sh:prefixes": {"@id": f"_:{PREFIXES_NODE}"},
+            "schema:target": {"@id": sub["kg_endpoint"]},
+            "qkl:nlQuestion": sub["nl_question"],
+        }
+        if sub["sparql_query"]:
+            node["sh:select"] = sub["sparql_query"]
+        yield separator + json.dumps(node, ensure_ascii=False)
+        separator = ",\n"
+    for tombstone in tombstones or []:
+        node = {
+            "@id": f"qkl:{tombstone['submission_id']}",
+            "qkl:deletedAt": {"@value": _timestamp(tombstone), "@type": f"{XSD}dateTime"},
+        }
+        yield separator + json.dumps(node)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+def _jsonl_records(submissions: Iterable[Dict], tombstones: Optional[Iterable[Dict]]) -> Iterator[str]:
+    for sub in submissions:
+        yield json.dumps({field: sub[field] for field in FIELDS}, ensure_ascii=False) + "\n"
+    for tombstone in tombstones or []:
+        yield json.dumps({"id": tombstone["submission_id"], "deleted_at": _timestamp(tombstone)}) + "\n"
+
+
+def _csv_records(submissions: Iterable[Dict], tombstones: Optional[Iterable[Dict]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # incremental exports mark deleted submissions in an extra column
+    writer.writerow(FIELDS if tombstones is None else FIELDS + ["deleted_at"])
+    for sub in submissions:
+        writer.writerow([sub[field] for field in FIELDS])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    for tombstone in tombstones or []:
+        writer.writerow([tombstone["submission_id"]] + [None] * (len(FIELDS) - 1) + [_timestamp(tombstone)])
+    yield buffer.getvalue()
+
+
+# format name -> (serializer, media type, file extension)
+EXPORT_FORMATS = {
+    "turtle": (_turtle_records, "text/turtle", "ttl"),
+    "ntriples": (_ntriples_records, "application/n-triples", "nt"),
+    "jsonld": (_jsonld_records, "application/ld+json", "jsonld"),
+    "jsonl": (_jsonl_records, "application/jsonl", "jsonl"),
+    "csv": (_csv_records, "text/csv", "csv"),
+}
+
+
+def export_submissions(
+    submissions: Iterable[Dict], export_format: str, tombstones: Optional[Iterable[Dict]] = None
+) -> Iterator[str]:
+    """
+    Serialize submissions in the given format, one chunk at a time.
+
+    Args:
+        submissions (Iterable[Dict]): The submissions, e.g. from database.iter_submissions()
+        export_format (str): One of the keys of EXPORT_FORMATS
+        tombstones (Optional[Iterable[Dict]]): Deleted submissions to report after the
+            others, for incremental exports
+
+    Returns:
+        Iterator[str]: The serialized dataset, in chunks of CHUNK_RECORDS records
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unsupported export format '{export_format}'. Supported formats: {', '.join(EXPORT_FORMATS)}"
+        )
+    serializer = EXPORT_FORMATS[export_format][0]
+    return _chunked(serializer(submissions, tombstones))
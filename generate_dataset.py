@@ -0,0 +1,285 @@
+import json
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+import const
+import database
+import helper_methods
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Questions and queries are filled in from these, so that their lengths and shapes vary like real ones
+QUESTION_TEMPLATES = (
+    "Which {things} were created by {person} before {year}?",
+    "How many {things} are held by the {place} collection?",
+    "What is the birth place of {person}?",
+    "List the {things} related to {topic}, ordered by date.",
+    "Which {things} mention {topic} in their title?",
+    "Who are the authors of {things} published in {year} about {topic}?",
+    "Is {person} associated with the {place} collection?",
+    "What are the most common subjects of the {things} from {place}?",
+)
+QUERY_TEMPLATES = (
+    """PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+SELECT ?item ?title WHERE {{
+  ?item dct:creator ?creator ; dct:title ?title ; dct:issued ?issued .
+  ?creator foaf:name "{person}" .
+  FILTER (YEAR(?issued) < {year})
+}} LIMIT {limit}""",
+    """PREFIX schema: <http://schema.org/>
+SELECT (COUNT(?item) AS ?count) WHERE {{
+  ?item a schema:CreativeWork ; schema:holdingArchive <{base}/place/{place_id}> .
+}}""",
+    """PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+SELECT ?place ?label WHERE {{
+  <{base}/person/{person_id}> wdt:P19 ?place .
+  OPTIONAL {{ ?place rdfs:label ?label . FILTER (LANG(?label) = "en") }}
+}}""",
+    """PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+SELECT ?item ?date WHERE {{
+  ?item dct:subject/skos:broader* <{base}/topic/{topic_id}> ; dct:date ?date .
+}} ORDER BY ?date LIMIT {limit}""",
+    """PREFIX dct: <http://purl.org/dc/terms/>
+SELECT ?item ?title WHERE {{
+  ?item dct:title ?title .
+  FILTER (CONTAINS(LCASE(STR(?title)), "{topic}"))
+}} LIMIT {limit}""",
+    """PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+SELECT DISTINCT ?author ?name WHERE {{
+  ?item dct:creator ?author ; dct:subject <{base}/topic/{topic_id}> ; dct:issued ?issued .
+  ?author foaf:name ?name .
+  FILTER (YEAR(?issued) = {year})
+}}""",
+    """PREFIX schema: <http://schema.org/>
+ASK {{ <{base}/person/{person_id}> schema:affiliation <{base}/place/{place_id}> }}""",
+    """PREFIX dct: <http://purl.org/dc/terms/>
+SELECT ?subject (COUNT(?item) AS ?n) WHERE {{
+  ?item dct:subject ?subject ; dct:spatial <{base}/place/{place_id}> .
+}} GROUP BY ?subject ORDER BY DESC(?n) LIMIT {limit}""",
+)
+THINGS = ("paintings", "manuscripts", "datasets", "articles", "photographs", "letters", "maps", "surveys")
+PEOPLE = ("Ada Lovelace", "Jean Piaget", "Hannah Arendt", "Max Weber", "Rosa Bonheur", "Ibn Khaldun", "Émilie du Châtelet")
+PLACES = ("Geneva", "Basel", "Bern", "Zurich", "Lausanne", "Lugano", "Neuchâtel")
+TOPICS = ("migration", "urbanism", "railways", "suffrage", "watchmaking", "epidemics", "alpine tourism")
+VALIDATION_STATUSES = (("success", 0.85), ("error", 0.1), ("timeout", 0.05))
+
+
+def timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def generate_kg_endpoints(n_kgs: int, rng: random.Random, started: datetime) -> List[Dict]:
+    """
+    Generate KG endpoints with one to three domains each, one in twenty of them data dumps.
+
+    The URL of the k-th KG does not depend on the seed, so that runs adding to the same
+    database share their KGs.
+    """
+    domain_codes = list(const.DISCIPLINE_DOMAINS)
+    endpoints = []
+    for k in range(n_kgs):
+        is_dump = k % 20 == 19
+        base = f"https://kg{k}.synthetic.example.org"
+        endpoints.append(
+            {
+                "name": f"Synthetic KG {k}",
+                "description": f"Synthetic knowledge graph {k} for scale testing",
+                "endpoint": f"{base}/dump.nt.gz" if is_dump else f"{base}/sparql",
+                "about_page": f"{base}/",
+                "domains": rng.sample(domain_codes, rng.randint(1, 3)),
+                "is_dump": is_dump,
+                "created_at": timestamp(started + timedelta(seconds=rng.uniform(0, 86400 * 30))),
+            }
+        )
+    return endpoints
+
+
+def generate_submissions(
+    n_submissions: int,
+    kg_endpoints: List[str],
+    n_contributors: int,
+    query_ratio: float,
+    rng: random.Random,
+    started: datetime,
+    days: int,
+) -> Iterator[Dict]:
+    """
+    Generate submissions spread over the given days.
+
+    A few KGs and contributors gather most of the submissions, as in production: both are
+    drawn from a Zipf-like distribution.
+    """
+    kg_weights = [1 / (rank + 1) for rank in range(len(kg_endpoints))]
+    contributor_weights = [1 / (rank + 1) ** 1.1 for rank in range(n_contributors)]
+    contributors = [f"contributor{c}@synthetic.example.org" for c in range(n_contributors)]
+    batch = 10000
+    for offset in range(0, n_submissions, batch):
+        size = min(batch, n_submissions - offset)
+        for kg_endpoint, username in zip(
+            rng.choices(kg_endpoints, kg_weights, k=size), rng.choices(contributors, contributor_weights, k=size)
+        ):
+            base = kg_endpoint.rsplit("/", 1)[0]
+            values = {
+                "things": rng.choice(THINGS),
+                "person": rng.choice(PEOPLE),
+                "place": rng.choice(PLACES),
+                "topic": rng.choice(TOPICS),
+                "year": rng.randint(1700, 2020),
+                "limit": rng.choice((10, 20, 50, 100)),
+                "base": base,
+                "person_id": rng.randint(1, 100000),
+                "place_id": rng.randint(1, 5000),
+                "topic_id": rng.randint(1, 2000),
+            }
+            template = rng.randrange(len(QUESTION_TEMPLATES))
+            created_at = started + timedelta(seconds=rng.uniform(0, days * 86400))
+            # One submission in ten was edited after it was submitted
+            updated_at = created_at + timedelta(seconds=rng.uniform(60, 86400 * 14)) if rng.random() < 0.1 else created_at
+            yield {
+                "kg_endpoint": kg_endpoint,
+                "nl_question": QUESTION_TEMPLATES[template].format(**values),
+                "username": username,
+                "sparql_query": QUERY_TEMPLATES[template].format(**values) if rng.random() < query_ratio else None,
+                "source": f"{base}/source/{rng.randint(1, 10**6)}" if rng.random() < 0.2 else None,
+                "created_at": timestamp(created_at),
+                "updated_at": timestamp(updated_at),
+            }
+
+
+def generate_validation_result(submission: Dict, username: str, rng: random.Random) -> Dict:
+    """Generate a validation result of a submission, most of them successful."""
+    status = rng.choices([s for s, _ in VALIDATION_STATUSES], [w for _, w in VALIDATION_STATUSES])[0]
+    duration_ms = int(rng.lognormvariate(6, 1))
+    if status == "success":
+        rows = [{"item": f"{submission['kg_endpoint']}/item/{i}"} for i in range(rng.randint(0, 5))]
+        query_result = json.dumps(rows)
+        fingerprint, row_count = helper_methods.fingerprint_results(rows)
+        message = "Query executed successfully"
+    else:
+        query_result, fingerprint, row_count = None, None, None
+        message = "Query timed out" if status == "timeout" else "Failed to query SPARQL endpoint"
+        duration_ms = 120000 if status == "timeout" else duration_ms
+    return {
+        "endpoint": submission["kg_endpoint"],
+        "validation_status": status,
+        "validation_message": message,
+        "username": username,
+        "sparql_query": submission["sparql_query"],
+        "query_result": query_result,
+        "submission_id": submission["id"],
+        "duration_ms": duration_ms,
+        "result_fingerprint": fingerprint,
+        "row_count": row_count,
+    }
+
+
+def generate_dataset(
+    n_kgs: int = 50,
+    n_contributors: int = 1000,
+    n_submissions: int = 100000,
+    query_ratio: float = 0.7,
+    validated_ratio: float = 0.5,
+    days: int = 365,
+    batch_size: int = 5000,
+    seed: int = 42,
+) -> Dict[str, int]:
+    """
+    Populate the configured database with synthetic KGs, submissions and validation results.
+
+    Rows are inserted in batches of batch_size, one transaction per batch. The data is
+    added to what the database already holds, KGs inserted by a previous run are reused.
+
+    Args:
+        n_kgs (int): Number of KG endpoints
+        n_contributors (int): Number of distinct users submitting
+        n_submissions (int): Number of submissions
+        query_ratio (float): Fraction of the submissions with a SPARQL query
+        validated_ratio (float): Fraction of the submissions with a query that have validation results
+        days (int): The submissions are spread over this many days until now
+        batch_size (int): Number of rows per INSERT
+        seed (int): Seed of the random generator, the same seed generates the same data
+
+    Returns:
+        Dict[str, int]: The number of rows inserted per table
+    """
+    rng = random.Random(seed)
+    started = datetime.now() - timedelta(days=days)
+    database.init_db()
+
+    kg_endpoints = generate_kg_endpoints(n_kgs, rng, started - timedelta(days=30))
+    endpoints = [endpoint["endpoint"] for endpoint in kg_endpoints]
+    # The KGs of a previous run are reused, their submissions are added to
+    new_kg_endpoints = [endpoint for endpoint in kg_endpoints if not database.get_if_endpoint_exists(endpoint["endpoint"])]
+    database.insert_kg_endpoints(new_kg_endpoints)
+    logging.info(f"Inserted {len(new_kg_endpoints)} KG endpoints, {n_kgs - len(new_kg_endpoints)} already existed")
+
+    # Only the submissions of this run get validation results, not those of previous runs
+    first_new_id = database.get_max_submission_id()
+    loading_started = time.monotonic()
+    batch = []
+    for count, submission in enumerate(
+        generate_submissions(n_submissions, endpoints, n_contributors, query_ratio, rng, started, days), 1
+    ):
+        batch.append(submission)
+        if len(batch) == batch_size:
+            database.insert_submissions(batch)
+            batch = []
+        if count % 100000 == 0:
+            logging.info(f"Inserted {count} submissions ({count / (time.monotonic() - loading_started):,.0f}/s)")
+    database.insert_submissions(batch)
+    logging.info(f"Inserted {n_submissions} submissions in {time.monotonic() - loading_started:.1f}s")
+
+    # The IDs of the submissions are only known once inserted, so the results are generated
+    # from the stored submissions, a page at a time
+    n_results = 0
+    contributors = [f"contributor{c}@synthetic.example.org" for c in range(n_contributors)]
+    for endpoint in endpoints:
+        after_id = first_new_id
+        while True:
+            page = database.get_submission_queries_page(endpoint, after_id, batch_size)
+            if not page:
+                break
+            results = [
+                generate_validation_result(submission, rng.choice(contributors), rng)
+                for submission in page
+                if rng.random() < validated_ratio
+                # Revalidated submissions have several results
+                for _ in range(rng.choice((1, 1, 1, 2, 3)))
+            ]
+            database.insert_validation_results(results)
+            n_results += len(results)
+            after_id = page[-1]["id"]
+    logging.info(f"Inserted {n_results} validation results in {time.monotonic() - loading_started:.1f}s overall")
+
+    return {"kg_endpoints": len(new_kg_endpoints), "submissions": n_submissions, "validation_results": n_results}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Populate the configured database (MySQL, or SQLite with RUN_MODE=RENDER) with synthetic data for scale testing."
+    )
+    parser.add_argument("--kgs", type=int, default=50, help="Number of KG endpoints")
+    parser.add_argument("--contributors", type=int, default=1000, help="Number of distinct contributors")
+    parser.add_argument("--submissions", type=int, default=100000, help="Number of submissions")
+    parser.add_argument("--query-ratio", type=float, default=0.7, help="Fraction of the submissions with a SPARQL query")
+    parser.add_argument("--validated-ratio", type=float, default=0.5, help="Fraction of the submissions with a query that have validation results")
+    parser.add_argument("--days", type=int, default=365, help="Number of days the submissions are spread over")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows per INSERT")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator")
+    args = parser.parse_args()
+
+    generate_dataset(
+        args.kgs, args.contributors, args.submissions, args.query_ratio, args.validated_ratio, args.days, args.batch_size, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
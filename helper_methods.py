@@ -1,27 +1,138 @@
+import os
+import json
+import math
+import base64
+import binascii
+import hashlib
 import logging
 import warnings
-import requests
 import threading
 import time
-from rdflib import Graph
+import functools
+import contextlib
+import contextvars
+from typing import Optional
 from urllib.parse import urlparse
-from rdflib.plugins.sparql import prepareQuery
-from rdflib.plugins.stores.sparqlstore import SPARQLStore
-from SPARQLWrapper import SPARQLWrapper, JSON, XML, CSV, JSONLD
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+# rdflib, SPARQLWrapper, requests and dump_store (which needs rdflib) take a large share of the
+# startup time of a worker, so they are imported by the functions that use them
+import endpoint_health
+import metrics
+import tracing
 
 logging.getLogger().setLevel(logging.INFO)
 
+# At most this many outbound calls (SPARQL requests, URL and data dump validations) run at
+# once in each worker process, the others wait for a slot
+OUTBOUND_MAX_IN_FLIGHT = int(os.getenv("OUTBOUND_MAX_IN_FLIGHT", "8"))
+# Calls made while serving a request are shed rather than waiting longer than this for a slot
+OUTBOUND_QUEUE_DEADLINE = float(os.getenv("OUTBOUND_QUEUE_DEADLINE", "10"))
+# Validation runs fetch up to this many answers to fingerprint them; runs with more are
+# stored as truncated, without a fingerprint
+FINGERPRINT_MAX_ROWS = int(os.getenv("FINGERPRINT_MAX_ROWS", "1000"))
+# Number of answers returned to the user and stored in query_result
+RESULT_PREVIEW_ROWS = 20
 
-def validate_url(url: str) -> tuple[bool, str]:
+
+class OutboundOverloadedError(Exception):
+    """Raised when an outbound call would wait longer than OUTBOUND_QUEUE_DEADLINE for a slot."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many outbound calls in progress, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class OutboundLimiter:
     """
-    Validate if the URL is valid and return detailed error message.
+    Bounds the number of outbound calls running at once in this process.
+
+    The expected wait for a slot is estimated from the number of calls waiting and the
+    average duration of the recent calls, so that a call that would miss its deadline is
+    shed right away instead of holding the request until it times out.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiting = 0
+        self.average_duration = 1.0
+        self._condition = threading.Condition()
+        metrics.OUTBOUND_CAPACITY.set(max_in_flight)
+
+    def expected_wait(self) -> float:
+        """Seconds a new call is expected to wait for a slot."""
+        if self.in_flight < self.max_in_flight:
+            return 0.0
+        return (self.waiting + 1) * self.average_duration / self.max_in_flight
+
+    def _shed(self, expected_wait: float):
+        metrics.LOAD_SHED.inc()
+        raise OutboundOverloadedError(max(1, math.ceil(expected_wait)))
+
+    @contextlib.contextmanager
+    def slot(self, deadline: Optional[float]):
+        """Hold a slot for the duration of an outbound call, waiting at most deadline seconds (None waits forever)."""
+        with self._condition:
+            if self.in_flight >= self.max_in_flight:
+                if deadline is not None and self.expected_wait() > deadline:
+                    self._shed(self.expected_wait())
+                self.waiting += 1
+                metrics.OUTBOUND_WAITING.inc()
+                try:
+                    acquired = self._condition.wait_for(lambda: self.in_flight < self.max_in_flight, timeout=deadline)
+                finally:
+                    self.waiting -= 1
+                    metrics.OUTBOUND_WAITING.dec()
+                if not acquired:
+                    self._shed(self.expected_wait())
+            self.in_flight += 1
+        metrics.OUTBOUND_IN_FLIGHT.inc()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self.average_duration = 0.8 * self.average_duration + 0.2 * (time.monotonic() - started)
+                self._condition.notify()
+            metrics.OUTBOUND_IN_FLIGHT.dec()
+
+
+outbound_limiter = OutboundLimiter(OUTBOUND_MAX_IN_FLIGHT)
+_holds_outbound_slot = contextvars.ContextVar("holds_outbound_slot", default=False)
+
+
+def limit_outbound(shed: bool = True):
+    """
+    Run a function that calls other services in a slot of the outbound limiter.
+
+    Nested outbound calls run in the slot of the outermost one.
 
     Args:
-        url (str): The URL to validate
-        
-    Returns:
-        tuple[bool, str]: (is_valid, error_message)
+        shed (bool): Raise OutboundOverloadedError instead of waiting past OUTBOUND_QUEUE_DEADLINE;
+            background work that is already queued waits for a slot instead
     """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _holds_outbound_slot.get():
+                return function(*args, **kwargs)
+            with outbound_limiter.slot(OUTBOUND_QUEUE_DEADLINE if shed else None):
+                token = _holds_outbound_slot.set(True)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    _holds_outbound_slot.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _validate_url_format(url: str) -> tuple[bool, str]:
+    """Check that the URL is a complete HTTP(S) URL, without contacting it."""
     if not url or not url.strip():
         return False, "URL cannot be empty"
     
@@ -41,7 +152,28 @@ def validate_url(url: str) -> tuple[bool, str]:
         error_msg = f"Error parsing URL: {str(e)}"
         logging.error(f"Error parsing URL {url}: {e}")
         return False, error_msg
-    
+    return True, ""
+
+
+@tracing.traced(kind=SpanKind.CLIENT)
+@limit_outbound()
+def validate_url(url: str) -> tuple[bool, str]:
+    """
+    Validate if the URL is valid and return detailed error message.
+
+    Args:
+        url (str): The URL to validate
+        
+    Returns:
+        tuple[bool, str]: (is_valid, error_message)
+    """
+    is_valid, error_msg = _validate_url_format(url)
+    if not is_valid:
+        return False, error_msg
+
+    import requests
+
+    url = url.strip()
     try:
         response = requests.head(url, timeout=10, allow_redirects=True)
         if response.status_code == 405:
@@ -59,6 +191,40 @@ def validate_url(url: str) -> tuple[bool, str]:
         return False, error_msg
 
 
+@tracing.traced(kind=SpanKind.CLIENT)
+@limit_outbound()
+def validate_dump_url(url: str) -> tuple[bool, str, Optional[dict]]:
+    """
+    Validate a data dump URL by sniffing the beginning of its content.
+
+    Only the first bytes are read, to detect the compression and RDF serialisation
+    and to parse a bounded sample of triples.
+
+    Args:
+        url (str): The URL of the data dump
+
+    Returns:
+        tuple[bool, str, Optional[dict]]: (is_valid, error_message, dump_info) where
+            dump_info holds the size, compression, format and sample size
+    """
+    is_valid, error_msg = _validate_url_format(url)
+    if not is_valid:
+        return False, error_msg, None
+
+    import dump_store
+
+    url = url.strip()
+    try:
+        return True, "", dump_store.sniff_dump(url)
+    except dump_store.DumpQueryError as e:
+        logging.error(f"Invalid data dump {url}: {e}")
+        return False, str(e), None
+    except Exception as e:
+        error_msg = f"Unexpected error while reading the data dump: {str(e)}"
+        logging.error(f"Unexpected error sniffing data dump {url}: {e}")
+        return False, error_msg, None
+
+
 def validate_sparql_query(query: str) -> bool:
     """
     Validate a SPARQL query if it is syntactically correct
@@ -69,6 +235,8 @@ def validate_sparql_query(query: str) -> bool:
     Returns:
         bool: True if the query is syntactically correct, False otherwise
     """
+    from rdflib.plugins.sparql import prepareQuery
+
     try:
         prepareQuery(query)
         return True
@@ -87,6 +255,9 @@ def check_sparql_endpoint_deprecated(endpoint_uri: str) -> bool:
     Returns:
         bool: True if the endpoint is accessible and responds correctly, False otherwise.
     """
+    from rdflib import Graph
+    from rdflib.plugins.stores.sparqlstore import SPARQLStore
+
     try:
         store = SPARQLStore(endpoint_uri)
         graph = Graph(store=store)
@@ -107,70 +278,274 @@ def check_sparql_endpoint_deprecated(endpoint_uri: str) -> bool:
         return False
 
 
-def check_sparql_endpoint(endpoint_uri: str, query: str = "SELECT * WHERE { ?s ?p ?o } LIMIT 1", return_result: bool = False, set_timeout: bool = False, timeout: int = 15) -> bool|tuple[bool, any]:
+def _query_sparql_endpoint(endpoint_uri: str, query: str, return_result: bool, timeout: Optional[float]) -> bool|tuple[bool, any]:
     """
-    Check if the SPARQL endpoint is accessible using SPARQLWrapper with a return format of JSON, XML, CSV, JSON-LD.
+    Query the SPARQL endpoint using SPARQLWrapper with a return format of JSON, XML, CSV, JSON-LD.
 
     Args:
         endpoint_uri (str): The URI of the SPARQL endpoint.
+        query (str): The SPARQL query to run.
+        return_result (bool): Whether to return the converted response along with the status.
+        timeout (Optional[float]): Timeout in seconds, or None for no timeout.
 
     Returns:
-        str: The name of the return format that works, or False if no return format works.
+        bool|tuple[bool, any]: True (and the response) if a return format works, False otherwise.
     """
+    from SPARQLWrapper import SPARQLWrapper, JSON, XML, CSV, JSONLD
+
     return_formats = [("JSON", JSON), ("XML", XML), ("CSV", CSV), ("JSON-LD", JSONLD)]
     for return_format_name, return_format in return_formats:
-        try:
-            sparql = SPARQLWrapper(endpoint_uri)
-            # set timeout to 15 seconds for each validation of sparql endpoint
-            if set_timeout:
-                sparql.setTimeout(timeout)
-            sparql.setReturnFormat(return_format)
-            sparql.setQuery(query)
-
-            with warnings.catch_warnings(record=True) as w:
-                warnings.simplefilter("always")
-                response = sparql.query().convert()
+        with tracing.tracer.start_as_current_span(
+            "sparql.query",
+            kind=SpanKind.CLIENT,
+            attributes={"server.address": metrics.endpoint_label(endpoint_uri), "sparql.format": return_format_name},
+        ) as span:
+            started = time.perf_counter()
+            try:
+                sparql = SPARQLWrapper(endpoint_uri)
+                if timeout:
+                    sparql.setTimeout(int(math.ceil(timeout)))
+                sparql.setReturnFormat(return_format)
+                sparql.setQuery(query)
+
+                with warnings.catch_warnings(record=True) as w:
+                    warnings.simplefilter("always")
+                    response = sparql.query().convert()
                 
-                for warning in w:
-                    if "unknown response content type 'text/html'" in str(warning.message):
-                        raise Exception(f"SPARQL endpoint {endpoint_uri} returned HTML instead of {return_format_name}")
-
-            logging.info(f"SPARQL endpoint {endpoint_uri} is accessible and working with {return_format_name} return format")
-            return (True, response) if return_result else True
-
-        except TimeoutError as e:
-            logging.warning(f"SPARQL endpoint {endpoint_uri} is timing out")
-            return (True, "") if return_result else True
-        except Exception as e:
-            logging.error(f"Cannot access SPARQL endpoint {endpoint_uri} with {return_format_name} return format: {e}")
-            continue
+                    for warning in w:
+                        if "unknown response content type 'text/html'" in str(warning.message):
+                            raise Exception(f"SPARQL endpoint {endpoint_uri} returned HTML instead of {return_format_name}")
+
+                metrics.record_sparql(endpoint_uri, return_format_name, time.perf_counter() - started, "success")
+                logging.info(f"SPARQL endpoint {endpoint_uri} is accessible and working with {return_format_name} return format")
+                return (True, response) if return_result else True
+
+            except TimeoutError:
+                metrics.record_sparql(endpoint_uri, return_format_name, time.perf_counter() - started, "timeout")
+                raise
+            except Exception as e:
+                # urllib wraps socket timeouts, trying the other formats would only wait again
+                if isinstance(getattr(e, "reason", None), TimeoutError):
+                    metrics.record_sparql(endpoint_uri, return_format_name, time.perf_counter() - started, "timeout")
+                    raise TimeoutError(str(e)) from e
+                metrics.record_sparql(endpoint_uri, return_format_name, time.perf_counter() - started, "error")
+                span.set_status(Status(StatusCode.ERROR, str(e)))
+                logging.error(f"Cannot access SPARQL endpoint {endpoint_uri} with {return_format_name} return format: {e}")
+                continue
 
     logging.error(f"Cannot access SPARQL endpoint {endpoint_uri} with any return format")
     return False
 
 
+def probe_sparql_endpoint(endpoint_uri: str, timeout: float) -> bool:
+    """Liveness probe used by the circuit breaker, bypassing the breaker itself."""
+    try:
+        return bool(_query_sparql_endpoint(endpoint_uri, "ASK { ?s ?p ?o }", False, timeout))
+    except TimeoutError:
+        return False
+
+
+@tracing.traced()
+@limit_outbound()
+def check_sparql_endpoint(endpoint_uri: str, query: str = "SELECT * WHERE { ?s ?p ?o } LIMIT 1", return_result: bool = False, set_timeout: bool = False, timeout: int = 15, operation: str = "check") -> bool|tuple[bool, any]:
+    """
+    Check if the SPARQL endpoint is accessible using SPARQLWrapper with a return format of JSON, XML, CSV, JSON-LD.
+
+    Latency and errors are tracked per endpoint: the timeout is derived from the observed
+    p95 latency of the operation (``timeout`` being the upper bound) and the call fails fast
+    while the circuit of the endpoint is open.
+
+    Args:
+        endpoint_uri (str): The URI of the SPARQL endpoint.
+        operation (str): The kind of call the latency is tracked under, "check" or "query".
+
+    Returns:
+        str: The name of the return format that works, or False if no return format works.
+    """
+    if not endpoint_health.allow_request(endpoint_uri, lambda t: probe_sparql_endpoint(endpoint_uri, t)):
+        logging.warning(f"Circuit for SPARQL endpoint {endpoint_uri} is open, failing fast")
+        return False
+
+    effective_timeout = endpoint_health.get_timeout(endpoint_uri, operation, timeout) if set_timeout else None
+    started = time.monotonic()
+    try:
+        outcome = _query_sparql_endpoint(endpoint_uri, query, return_result, effective_timeout)
+    except TimeoutError:
+        endpoint_health.record_failure(endpoint_uri, f"timed out after {effective_timeout} seconds")
+        logging.warning(f"SPARQL endpoint {endpoint_uri} is timing out")
+        return (True, "") if return_result else True
+
+    if outcome:
+        endpoint_health.record_success(endpoint_uri, time.monotonic() - started, operation)
+    else:
+        endpoint_health.record_failure(endpoint_uri, "no return format works")
+    return outcome
+
+
+def fingerprint_run(results: list[dict], max_rows: int) -> tuple[Optional[str], int, bool]:
+    """
+    Fingerprint the results of a validation run fetched with a limit of max_rows + 1.
+
+    A run with more than max_rows answers only holds a subset of them, which an endpoint
+    picks arbitrarily for queries without ORDER BY: it gets no fingerprint, so that it is
+    never compared with other runs, and is flagged as truncated.
+
+    Args:
+        results (list[dict]): Query results as returned by execute_sparql_query
+        max_rows (int): Maximum number of answers fingerprinted
+
+    Returns:
+        tuple[Optional[str], int, bool]: (fingerprint, row count, truncated); the row count
+            of a truncated run is a lower bound
+    """
+    if len(results) > max_rows:
+        return None, max_rows, True
+    fingerprint, row_count = fingerprint_results(results)
+    return fingerprint, row_count, False
+
+
+def fingerprint_results(results: list[dict]) -> tuple[str, int]:
+    """
+    Compute an order-insensitive fingerprint of query results.
+
+    Each row is canonicalised as JSON with sorted variable names, the rows are sorted and
+    hashed together with the row count, so the same answers in any order match.
+
+    Args:
+        results (list[dict]): Query results as returned by execute_sparql_query
+
+    Returns:
+        tuple[str, int]: (SHA-256 hex digest, row count)
+    """
+    rows = sorted(json.dumps(row, sort_keys=True, separators=(",", ":")) for row in results)
+    digest = hashlib.sha256(f"{len(rows)}\n".encode("utf-8"))
+    for row in rows:
+        digest.update(row.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest(), len(rows)
+
+
+def encode_cursor(payload: dict) -> str:
+    """Encode a position as an opaque URL-safe cursor: unpadded base64 of compact JSON."""
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is not valid base64 JSON
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(str(e))
+    if not isinstance(payload, dict):
+        raise ValueError("not a JSON object")
+    return payload
+
+
+def encode_page_cursor(last_id: int) -> str:
+    """Encode the ID of the last item of a page as an opaque URL-safe cursor."""
+    return encode_cursor({"a": last_id})
+
+
+def decode_page_cursor(cursor: Optional[str]) -> int:
+    """
+    Decode a cursor returned with a previous page.
+
+    Returns:
+        int: The ID after which the next page starts, 0 without a cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return 0
+    try:
+        return int(decode_cursor(cursor)["a"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid page cursor: {e}")
+
+
 def escape_string(text: str) -> str:
     """Escape special characters in strings for Turtle format"""
     if not text:
         return ""
-    return text.replace('"', '\\"').replace('\\', '\\\\').replace('\n', '\\n')
+    # backslashes first, otherwise the backslashes escaping the quotes get doubled
+    return (
+        text.replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+        .replace('\t', '\\t')
+    )
 
 
-def execute_sparql_query(query: str, endpoint_uri: str, limit: int = 20, timeout: int = 120):
+def format_sparql_results(response, limit: int) -> list[dict]:
+    """
+    Flatten the response of a SPARQL endpoint into rows mapping the variables to their string values.
+
+    Args:
+        response: The converted response, a dict for JSON results, a string for the other formats
+        limit (int): Maximum number of rows to return
+
+    Returns:
+        List[dict]: The rows of a SELECT, or a single row holding the response otherwise
+    """
+    if isinstance(response, dict):
+        if "results" in response and "bindings" in response["results"]:
+            # process SPARQL response format
+            formatted_results = []
+            for binding in response["results"]["bindings"][:max(limit, 0)]:
+                formatted_row = {}
+                for var, val in binding.items():
+                    if isinstance(val, dict) and "value" in val:
+                        formatted_row[var] = str(val["value"])
+                    else:
+                        formatted_row[var] = str(val)
+                formatted_results.append(formatted_row)
+            return formatted_results
+        return [response] if response else []
+    if isinstance(response, str):
+        return [{"result": response}]
+    return [{"result": str(response)}]
+
+
+@tracing.traced()
+@limit_outbound(shed=False)
+def execute_sparql_query(query: str, endpoint_uri: str, limit: int = 20, timeout: int = 120, is_dump: bool = False, progress=None):
     """Run SPARQL query against endpoint and return list of bindings as dictionaries.
 
     Args:
         query (str): SPARQL query to execute.
-        endpoint_uri (str): SPARQL endpoint URL.
+        endpoint_uri (str): SPARQL endpoint URL, or URL of the data dump if is_dump is set.
         limit (int, optional): Maximum number of results to return. Defaults to 20.
-        timeout (int, optional): Timeout in seconds. Defaults to 120.
+        timeout (int, optional): Upper bound of the timeout in seconds, the effective timeout
+            is derived from the observed query latency of the endpoint. Defaults to 120.
+        is_dump (bool, optional): Run the query against a local copy of the data dump,
+            downloading and loading it first if needed. Defaults to False.
+        progress (callable, optional): Called with progress messages while a dump loads.
 
     Returns:
         List[dict]: Query results where each dict maps variable names to their string values.
         
     Raises:
         TimeoutError: If the query takes longer than the specified timeout.
+        CircuitOpenError: If the endpoint failed repeatedly and its circuit is open.
     """
+    if is_dump:
+        import dump_store
+
+        return dump_store.query_dump(query, endpoint_uri, limit=limit, timeout=timeout, progress=progress)
+
+    if not endpoint_health.allow_request(endpoint_uri, lambda t: probe_sparql_endpoint(endpoint_uri, t)):
+        raise endpoint_health.CircuitOpenError(endpoint_uri, endpoint_health.retry_after(endpoint_uri))
+    timeout = endpoint_health.get_timeout(endpoint_uri, "query", timeout)
+
     result = None
     error = None
     completed = threading.Event()
@@ -187,50 +562,29 @@ def execute_sparql_query(query: str, endpoint_uri: str, limit: int = 20, timeout
 
             # Use check_sparql_endpoint directly to execute the query
             endpoint_check = check_sparql_endpoint(
-                endpoint_uri, query_to_run, return_result=True, set_timeout=True, timeout=timeout)
+                endpoint_uri, query_to_run, return_result=True, set_timeout=True, timeout=timeout, operation="query")
             
             if not endpoint_check or not endpoint_check[0]:
                 error = Exception(f"Failed to query SPARQL endpoint {endpoint_uri}")
                 return
             
-            response = endpoint_check[1]
-            formatted_results = []
-            
-            if isinstance(response, dict):
-                if "results" in response and "bindings" in response["results"]:
-                    # process SPARQL response format
-                    bindings = response["results"]["bindings"]
-                    counter = 0
-                    for binding in bindings:
-                        if counter >= limit:
-                            break
-                        formatted_row = {}
-                        for var, val in binding.items():
-                            if isinstance(val, dict) and "value" in val:
-                                formatted_row[var] = str(val["value"])
-                            else:
-                                formatted_row[var] = str(val)
-                        formatted_results.append(formatted_row)
-                        counter += 1
-                else:
-                    formatted_results = [response] if response else []
-            elif isinstance(response, str):
-                formatted_results = [{"result": response}]
-            else:
-                formatted_results = [{"result": str(response)}]
-            
-            result = formatted_results
+            result = format_sparql_results(endpoint_check[1], limit)
         except Exception as e:
             error = e
         finally:
             completed.set()
 
-    thread = threading.Thread(target=execute_query)
+    # The thread runs in a copy of the context, so its spans and logs belong to this trace
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(execute_query,))
     thread.daemon = True
     thread.start()
 
     if not completed.wait(timeout=timeout):
-        raise TimeoutError(f"SPARQL query execution timed out after {timeout} seconds")
+        timeout_error = TimeoutError(f"SPARQL query execution timed out after {round(timeout)} seconds")
+        # The request keeps running in its thread; callers bounding the load they put on the
+        # endpoint can wait for this event before sending it another query
+        timeout_error.call_finished = completed
+        raise timeout_error
     
     if error:
         raise error
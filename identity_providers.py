@@ -0,0 +1,285 @@
+import os
+import time
+import base64
+import asyncio
+import secrets
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+import httpx
+
+import endpoint_health
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Base URLs of the identity providers, overridable to point at a stand-in provider in tests
+GITHUB_BASE_URL = os.getenv("GITHUB_BASE_URL", "https://github.com")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+ORCID_BASE_URL = os.getenv("ORCID_BASE_URL", "https://orcid.org")
+ORCID_API_URL = os.getenv("ORCID_API_URL", "https://pub.orcid.org/v3.0")
+OPERAS_BASE_URL = os.getenv("OPERAS_BASE_URL", "https://id.operas-eu.org/oauth2")
+
+# Timeout of each call to a provider, and how many times failed calls are retried
+IDP_TIMEOUT = float(os.getenv("IDP_TIMEOUT", "10"))
+IDP_RETRIES = int(os.getenv("IDP_RETRIES", "2"))
+IDP_WINDOW_SIZE = 200
+
+PROVIDERS = {
+    "github": {
+        "authorize_url": f"{GITHUB_BASE_URL}/login/oauth/authorize",
+        "token_url": f"{GITHUB_BASE_URL}/login/oauth/access_token",
+        "client_id": os.getenv("GITHUB_CLIENT_ID"),
+        "client_secret": os.getenv("GITHUB_CLIENT_SECRET"),
+        "scope": "user:email",
+        "pkce": False,
+    },
+    "orcid": {
+        "authorize_url": f"{ORCID_BASE_URL}/oauth/authorize",
+        "token_url": f"{ORCID_BASE_URL}/oauth/token",
+        "client_id": os.getenv("ORCID_CLIENT_ID"),
+        "client_secret": os.getenv("ORCID_CLIENT_SECRET"),
+        "scope": "/authenticate",
+        "pkce": False,
+    },
+    "operas": {
+        "authorize_url": f"{OPERAS_BASE_URL}/authorize",
+        "token_url": f"{OPERAS_BASE_URL}/token",
+        "client_id": os.getenv("OPERAS_CLIENT_ID"),
+        "client_secret": os.getenv("OPERAS_CLIENT_SECRET"),
+        "scope": "openid email",
+        "pkce": True,
+    },
+}
+
+
+class IdentityProviderError(Exception):
+    """Raised when the OAuth flow with an identity provider fails."""
+
+
+# One pooled client per process, recreated if the event loop changes (e.g. in tests)
+_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client used for every call to an identity provider."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(IDP_TIMEOUT, connect=min(IDP_TIMEOUT, 5)),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+            headers={"Accept": "application/json"},
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    """Close the shared client, releasing its pooled connections."""
+    global _client
+    if _client is not None and not _client.is_closed and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+
+
+def _record(provider: str, latency: float, ok: bool):
+    with _metrics_lock:
+        metrics = _metrics.setdefault(
+            provider, {"latencies": deque(maxlen=IDP_WINDOW_SIZE), "requests": 0, "errors": 0, "retries": 0}
+        )
+        metrics["latencies"].append(latency)
+        metrics["requests"] += 1
+        if not ok:
+            metrics["errors"] += 1
+
+
+def _record_retry(provider: str):
+    with _metrics_lock:
+        if provider in _metrics:
+            _metrics[provider]["retries"] += 1
+
+
+def get_metrics() -> Dict[str, Dict]:
+    """Return the number of calls, errors, retries and latency percentiles per provider."""
+    with _metrics_lock:
+        snapshot = {
+            provider: (list(m["latencies"]), m["requests"], m["errors"], m["retries"])
+            for provider, m in _metrics.items()
+        }
+    result = {}
+    for provider, (latencies, requests_count, errors, retries) in snapshot.items():
+        p50 = endpoint_health.percentile(latencies, 50)
+        p95 = endpoint_health.percentile(latencies, 95)
+        result[provider] = {
+            "requests": requests_count,
+            "errors": errors,
+            "retries": retries,
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+        }
+    return result
+
+
+async def call(provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Call an identity provider through the shared client, with timeouts and retries.
+
+    GET requests are retried on transport errors, 429 and 5xx responses. Other
+    requests are only retried when the connection could not be established, as the
+    provider may already have processed them (authorization codes are single use).
+
+    Args:
+        provider (str): The name of the provider, used for the metrics
+        method (str): The HTTP method
+        url (str): The URL to call
+        **kwargs: Passed to httpx.AsyncClient.request
+
+    Returns:
+        httpx.Response: The response of the provider
+
+    Raises:
+        IdentityProviderError: If the provider could not be reached
+    """
+    client = get_client()
+    idempotent = method.upper() == "GET"
+    for attempt in range(IDP_RETRIES + 1):
+        started = time.monotonic()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            _record(provider, time.monotonic() - started, ok=False)
+            retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if retryable and attempt < IDP_RETRIES:
+                _record_retry(provider)
+                await asyncio.sleep(0.2 * 2**attempt)
+                continue
+            logging.error(f"Call to identity provider {provider} failed: {e!r}")
+            raise IdentityProviderError(f"Could not reach {provider}: {e!r}")
+
+        failed = response.status_code == 429 or response.status_code >= 500
+        _record(provider, time.monotonic() - started, ok=not failed)
+        if failed and idempotent and attempt < IDP_RETRIES:
+            _record_retry(provider)
+            await asyncio.sleep(0.2 * 2**attempt)
+            continue
+        return response
+
+
+def generate_pkce():
+    """Generate PKCE code verifier and code challenge for OAuth2 PKCE flow using authlib."""
+    # Generate code verifier (43-128 characters, URL-safe)
+    code_verifier = (
+        base64.urlsafe_b64encode(secrets.token_bytes(32)).decode("utf-8").rstrip("=")
+    )
+
+    # Generate code challenge using authlib's built-in function, imported on the first login
+    # as authlib slows down the startup of the workers
+    from authlib.oauth2.rfc7636 import create_s256_code_challenge
+
+    code_challenge = create_s256_code_challenge(code_verifier)
+
+    return code_verifier, code_challenge
+
+
+def authorization_url(provider: str, redirect_uri: str, session: Dict, **extra_params) -> str:
+    """
+    Build the URL redirecting the user to the provider, storing the state (and PKCE verifier) in the session.
+
+    Args:
+        provider (str): "github", "orcid" or "operas"
+        redirect_uri (str): The callback URL of the provider
+        session (Dict): The session of the user
+        **extra_params: Additional query parameters of the authorization request
+
+    Returns:
+        str: The authorization URL
+    """
+    config = PROVIDERS[provider]
+    state = secrets.token_urlsafe(24)
+    session[f"{provider}_oauth_state"] = state
+    params = {
+        "response_type": "code",
+        "client_id": config["client_id"],
+        "redirect_uri": redirect_uri,
+        "scope": config["scope"],
+        "state": state,
+        **extra_params,
+    }
+    if config["pkce"]:
+        code_verifier, code_challenge = generate_pkce()
+        session[f"{provider}_pkce_code_verifier"] = code_verifier
+        params.update({"code_challenge": code_challenge, "code_challenge_method": "S256"})
+    return f"{config['authorize_url']}?{urlencode(params)}"
+
+
+async def exchange_code(provider: str, query_params, session: Dict, redirect_uri: str) -> Dict:
+    """
+    Verify the state of the callback and exchange its authorization code for a token.
+
+    Args:
+        provider (str): "github", "orcid" or "operas"
+        query_params: The query parameters of the callback request
+        session (Dict): The session of the user
+        redirect_uri (str): The callback URL sent in the authorization request
+
+    Returns:
+        Dict: The token response of the provider
+
+    Raises:
+        IdentityProviderError: If the state does not match or the exchange fails
+    """
+    config = PROVIDERS[provider]
+    stored_state = session.pop(f"{provider}_oauth_state", None)
+    received_state = query_params.get("state")
+    if not received_state or received_state != stored_state:
+        raise IdentityProviderError("OAuth state mismatch - possible CSRF attack")
+
+    code = query_params.get("code")
+    if not code:
+        raise IdentityProviderError(
+            f"Authorization failed: {query_params.get('error')} - {query_params.get('error_description')}"
+        )
+
+    data = {
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": redirect_uri,
+        "client_id": config["client_id"],
+        "client_secret": config["client_secret"],
+    }
+    if config["pkce"]:
+        code_verifier = session.pop(f"{provider}_pkce_code_verifier", None)
+        if not code_verifier:
+            raise IdentityProviderError("PKCE code verifier missing")
+        data["code_verifier"] = code_verifier
+
+    response = await call(provider, "POST", config["token_url"], data=data)
+    if response.status_code != 200:
+        raise IdentityProviderError(f"Token exchange failed: HTTP {response.status_code}")
+    token = response.json()
+    if not token.get("access_token"):
+        raise IdentityProviderError(
+            f"No access token received from {provider}: {token.get('error_description') or token.get('error')}"
+        )
+    return token
+
+
+async def get_json(provider: str, url: str, access_token: Optional[str] = None):
+    """
+    Fetch a JSON resource from a provider, authenticated with the access token if given.
+
+    Raises:
+        IdentityProviderError: If the provider does not answer with a 200 response
+    """
+    headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+    response = await call(provider, "GET", url, headers=headers)
+    if response.status_code != 200:
+        raise IdentityProviderError(f"Failed to get {url}: HTTP {response.status_code}")
+    return response.json()
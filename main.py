@@ -1,86 +1,67 @@
 import io
 import os
+import json
+import time
+import asyncio
 import logging
-import requests
-import secrets
 import hashlib
-import base64
+import secrets
 from urllib.parse import urlencode
 from typing import Optional, List
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from rdflib import Graph, Namespace, Literal, URIRef
-from authlib.integrations.starlette_client import OAuth
-from authlib.integrations.requests_client import OAuth2Session
-from authlib.oauth2.rfc7636 import create_s256_code_challenge
-from starlette.middleware.sessions import SessionMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi import FastAPI, Request, Form, Depends, Response, HTTPException, status
+from fastapi.responses import JSONResponse, ORJSONResponse, RedirectResponse, StreamingResponse, FileResponse
+from fastapi import FastAPI, Request, Form, Depends, Query, Response, HTTPException, status
 from datetime import datetime
 from concurrent.futures import TimeoutError
 
 import database
 import data_models
 import helper_methods
+import endpoint_health
+import exporters
+import identity_providers
+import validation_jobs
+import snapshots
+import static_assets
+import compression
+import metrics
+import profiling
+import tracing
+import rate_limits
+import sessions
 import const
 
 
 app = FastAPI()
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY"))
+app.add_middleware(sessions.ServerSessionMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+tracing.setup()
 
-app.mount("/templates", StaticFiles(directory="templates"), name="templates")
+app.mount("/templates", static_assets.FingerprintedStaticFiles(directory="templates"), name="templates")
 
 logging.getLogger().setLevel(logging.INFO)
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_assets.static_url
 
-BASE_URI = "http://example.org/question-kg-linker/"
-QKL = Namespace(BASE_URI)
-
-# for setting up oauth for github
-oauth = OAuth()
-oauth.register(
-    name="github",
-    client_id=os.getenv("GITHUB_CLIENT_ID"),
-    client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
-    authorize_url="https://github.com/login/oauth/authorize",
-    access_token_url="https://github.com/login/oauth/access_token",
-    client_kwargs={"scope": "user:email"},
-)
-
-# for setting up oauth for orcid
-oauth.register(
-    name="orcid",
-    client_id=os.getenv("ORCID_CLIENT_ID"),
-    client_secret=os.getenv("ORCID_CLIENT_SECRET"),
-    authorize_url="https://orcid.org/oauth/authorize",
-    access_token_url="https://orcid.org/oauth/token",
-    client_kwargs={"scope": "/authenticate"},
-)
-
-
-# for setting up oauth for operas
-oauth.register(
-    name="operas",
-    client_id=os.getenv("OPERAS_CLIENT_ID"),
-    client_secret=os.getenv("OPERAS_CLIENT_SECRET"),
-    authorize_url="https://id.operas-eu.org/oauth2/authorize",
-    access_token_url="https://id.operas-eu.org/oauth2/token",
-    client_kwargs={"scope": "openid email"},
-)
-
-
-def generate_pkce():
-    """Generate PKCE code verifier and code challenge for OAuth2 PKCE flow using authlib."""
-    # Generate code verifier (43-128 characters, URL-safe)
-    code_verifier = (
-        base64.urlsafe_b64encode(secrets.token_bytes(32)).decode("utf-8").rstrip("=")
-    )
+# Number of submissions rendered per page of the submissions page
+SUBMISSIONS_PAGE_SIZE = int(os.getenv("SUBMISSIONS_PAGE_SIZE", "50"))
+SUBMISSION_TYPES = ("all", "questions-only", "with-sparql")
 
-    # Generate code challenge using authlib's built-in function
-    code_challenge = create_s256_code_challenge(code_verifier)
+# Default and maximum number of items per page of the JSON API
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
 
-    return code_verifier, code_challenge
+# Comma-separated emails of the users allowed to use the /admin routes
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
 
+# Shared secret of the load tests (tests/locustfile.py): when set, POST /auth/load_test logs in
+# load test users without an identity provider. Leave it unset outside of load test environments.
+LOAD_TEST_TOKEN = os.getenv("LOAD_TEST_TOKEN")
+# Load test users get emails in this domain, so that they can never act as real users
+LOAD_TEST_EMAIL_DOMAIN = "load-test.example.org"
 
 async def get_current_user(request: Request):
     """Get the current user from the session."""
@@ -94,10 +75,59 @@ async def get_current_user(request: Request):
     return user
 
 
+async def get_admin_user(user: dict = Depends(get_current_user)):
+    """Get the current user, if it is one of the ADMIN_EMAILS."""
+    if (user.get("email") or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+
+def rate_limited_response(user: dict, endpoint_url: str) -> Optional[JSONResponse]:
+    """Return a 429 response if the user or the target endpoint is over its rate limit."""
+    retry_after = rate_limits.check(user["email"], endpoint_url)
+    if retry_after is None:
+        return None
+    return JSONResponse(
+        {
+            "status": "error",
+            "message": f"Too many validation requests, please try again in {retry_after} seconds",
+            "retry_after": retry_after,
+        },
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def overloaded_response(error: helper_methods.OutboundOverloadedError) -> JSONResponse:
+    """Return a 503 response shedding a request whose outbound calls would wait too long."""
+    return JSONResponse(
+        {
+            "status": "error",
+            "message": f"The server is busy validating other requests, please try again in {error.retry_after} seconds",
+            "retry_after": error.retry_after,
+        },
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
 @app.on_event("startup")
 def on_startup():
-    """Initialize the database."""
+    """Initialize the database and start the validation workers and the snapshot builder."""
     database.init_db()
+    validation_jobs.start_workers()
+    if snapshots.BUILDER_IN_APP:
+        snapshots.start_builder()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop the validation workers and the snapshot builder, close the identity provider client and flush the spans."""
+    validation_jobs.stop_workers()
+    snapshots.stop_builder()
+    await identity_providers.close_client()
+    metrics.mark_process_dead()
+    tracing.shutdown()
 
 
 @app.get("/")
@@ -129,38 +159,28 @@ async def login(request: Request):
 
     # If github=true in query params, proceed with OAuth
     if request.query_params.get("github") == "true":
-        redirect_uri = request.url_for("auth_github")
-        return await oauth.github.authorize_redirect(
-            request, redirect_uri, prompt="consent", approval_prompt="force"
+        redirect_uri = str(request.url_for("auth_github"))
+        return RedirectResponse(
+            url=identity_providers.authorization_url(
+                "github", redirect_uri, request.session, prompt="consent", approval_prompt="force"
+            )
         )
 
     if request.query_params.get("orcid") == "true":
-        redirect_uri = request.url_for("auth_orcid")
-        print("redirecting to orcid")
-        return await oauth.orcid.authorize_redirect(request, redirect_uri)
+        redirect_uri = str(request.url_for("auth_orcid"))
+        return RedirectResponse(
+            url=identity_providers.authorization_url("orcid", redirect_uri, request.session)
+        )
 
     if request.query_params.get("operas") == "true":
         redirect_uri = request.url_for("auth_operasid")
         # Ensure HTTPS for production/deployed environments
         redirect_uri = str(redirect_uri).replace("http://", "https://")
-        # Use authlib's OAuth2Session with proper PKCE support
-        client = OAuth2Session(
-            client_id=os.getenv("OPERAS_CLIENT_ID"),
-            redirect_uri=str(redirect_uri),
-            scope=["openid", "email"],
+        # The PKCE code verifier is kept in the session along with the state
+        return RedirectResponse(
+            url=identity_providers.authorization_url("operas", redirect_uri, request.session)
         )
 
-        # Generate PKCE parameters using authlib
-        code_verifier, code_challenge = generate_pkce()
-        request.session["operas_pkce_code_verifier"] = code_verifier
-        authorization_url, state = client.create_authorization_url(
-            "https://id.operas-eu.org/oauth2/authorize",
-            code_challenge=code_challenge,
-            code_challenge_method="S256",
-        )
-        request.session["operas_oauth_state"] = state
-        return RedirectResponse(url=authorization_url)
-
     # Otherwise show the login page
     return templates.TemplateResponse("login.html", {"request": request})
 
@@ -169,14 +189,17 @@ async def login(request: Request):
 async def auth_github(request: Request):
     """Authenticate the user and redirect to home page."""
     try:
-        token = await oauth.github.authorize_access_token(request)
-        resp = await oauth.github.get("https://api.github.com/user", token=token)
-        user = resp.json()
-
-        emails_resp = await oauth.github.get(
-            "https://api.github.com/user/emails", token=token
+        redirect_uri = str(request.url_for("auth_github"))
+        token = await identity_providers.exchange_code(
+            "github", request.query_params, request.session, redirect_uri
+        )
+        access_token = token["access_token"]
+        user = await identity_providers.get_json(
+            "github", f"{identity_providers.GITHUB_API_URL}/user", access_token
+        )
+        emails = await identity_providers.get_json(
+            "github", f"{identity_providers.GITHUB_API_URL}/user/emails", access_token
         )
-        emails = emails_resp.json()
 
         primary_email = None
         for email in emails:
@@ -185,8 +208,7 @@ async def auth_github(request: Request):
                 break
 
         user["email"] = primary_email if primary_email else user["login"]
-        request.session["type"] = "github"
-        request.session["user"] = user
+        request.session["user"] = sessions.session_user(user)
 
         return RedirectResponse(url="/contribute")
     except Exception as e:
@@ -198,64 +220,29 @@ async def auth_github(request: Request):
 async def auth_operasid(request: Request):
     """Authenticate the user and redirect to home page."""
     try:
-        # Verify state parameter for CSRF protection
-        received_state = request.query_params.get("state")
-        stored_state = request.session.pop("operas_oauth_state", None)
-        if not received_state or received_state != stored_state:
-            return {"error": "OAuth state mismatch - possible CSRF attack"}
-
-        # Get authorization code from query parameters
-        auth_code = request.query_params.get("code")
-        if not auth_code:
-            return {"error": f"Authorization failed: {error} - {error_description}"}
-
-        # Retrieve the PKCE code verifier from session
-        code_verifier = request.session.pop("operas_pkce_code_verifier", None)
-        if not code_verifier:
-            return {"error": "PKCE code verifier missing"}
-
         # Ensure HTTPS for the redirect URI
         redirect_uri = request.url_for("auth_operasid")
         redirect_uri = str(redirect_uri).replace("http://", "https://")
 
-        client = OAuth2Session(
-            client_id=os.getenv("OPERAS_CLIENT_ID"),
-            client_secret=os.getenv("OPERAS_CLIENT_SECRET"),
-            redirect_uri=str(redirect_uri),
-        )
-        callback_url = str(request.url)
-
         try:
-            token = client.fetch_token(
-                "https://id.operas-eu.org/oauth2/token",
-                authorization_response=callback_url,
-                code_verifier=code_verifier,
+            # Verifies the state (CSRF protection) and sends the PKCE code verifier
+            token = await identity_providers.exchange_code(
+                "operas", request.query_params, request.session, redirect_uri
             )
-            access_token = token.get("access_token")
-            if not access_token:
-                return {"error": "No access token received from OPERAS"}
-
             # Get user information using the access token
-            user_response = requests.get(
-                "https://id.operas-eu.org/oauth2/userinfo",
-                headers={"Authorization": f"Bearer {access_token}"},
+            user = await identity_providers.get_json(
+                "operas", f"{identity_providers.OPERAS_BASE_URL}/userinfo", token["access_token"]
             )
-            if user_response.status_code != 200:
-                return {
-                    "error": f"Failed to get user information: {user_response.status_code}"
-                }
-            user = user_response.json()
-        except Exception as token_error:
+        except identity_providers.IdentityProviderError as token_error:
             logging.error(f"Token exchange error: {token_error}")
-            return {"error": f"Token exchange failed: {str(token_error)}"}
+            return {"error": str(token_error)}
 
         primary_email = user.get("email")
         user["email"] = (
             primary_email if primary_email else user.get("login", user.get("sub", ""))
         )
         user["login"] = primary_email or user.get("sub", "")
-        request.session["type"] = "operas"
-        request.session["user"] = user
+        request.session["user"] = sessions.session_user(user)
 
         return RedirectResponse(url="/contribute")
     except Exception as e:
@@ -266,43 +253,37 @@ async def auth_operasid(request: Request):
 @app.get("/auth/orcid")
 async def auth_orcid(request: Request):
     try:
-        token = await oauth.orcid.authorize_access_token(request)
+        redirect_uri = str(request.url_for("auth_orcid"))
+        token = await identity_providers.exchange_code(
+            "orcid", request.query_params, request.session, redirect_uri
+        )
         orcid_id = token.get("orcid")
-        access_token = token.get("access_token")
         name = token.get("name")
 
         email = None
         if orcid_id:
             try:
-                response = requests.get(
-                    f"https://pub.orcid.org/v3.0/{orcid_id}/email",
-                    headers={"Accept": "application/json"},
+                email_data = await identity_providers.get_json(
+                    "orcid", f"{identity_providers.ORCID_API_URL}/{orcid_id}/email"
                 )
+                emails = email_data.get("email", [])
 
-                if response.status_code == 200:
-                    email_data = response.json()
-                    emails = email_data.get("email", [])
-
-                    for email_entry in emails:
-                        if email_entry.get("visibility") == "public":
-                            email = email_entry.get("email")
-                            break
+                for email_entry in emails:
+                    if email_entry.get("visibility") == "public":
+                        email = email_entry.get("email")
+                        break
 
             except Exception as e:
                 logging.error(f"Error fetching ORCID email: {e}")
 
-        request.session["type"] = "orcid"
-        request.session["email"] = email if email else orcid_id
-
-        request.session["user"] = {
-            "orcid_id": orcid_id,
-            "login": email if email else name,
-            "email": email if email else orcid_id,
-        }
-        request.session["type"] = "orcid"
-        request.session["user"][
-            "avatar_url"
-        ] = f'https://ui-avatars.com/api/?name={request.session["user"]["login"]}&background=0D8ABC&color=fff&rounded=true'
+        login = email if email else name
+        request.session["user"] = sessions.session_user(
+            {
+                "login": login,
+                "email": email if email else orcid_id,
+                "avatar_url": f"https://ui-avatars.com/api/?name={login}&background=0D8ABC&color=fff&rounded=true",
+            }
+        )
 
         return RedirectResponse(url="/contribute")
     except Exception as e:
@@ -310,10 +291,75 @@ async def auth_orcid(request: Request):
         return {"error": str(e)}
 
 
+@app.post("/auth/load_test", include_in_schema=False)
+async def auth_load_test(request: Request, login: str = Form(...)):
+    """Log in a load test user, for requests bearing LOAD_TEST_TOKEN; the route does not exist otherwise."""
+    authorization = request.headers.get("authorization", "")
+    if not LOAD_TEST_TOKEN or not secrets.compare_digest(authorization.encode(), f"Bearer {LOAD_TEST_TOKEN}".encode()):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not login.replace("-", "").isalnum() or len(login) > 64:
+        return JSONResponse({"status": "error", "message": "Invalid login"}, status_code=400)
+
+    request.session["user"] = sessions.session_user(
+        {
+            "login": login,
+            "email": f"{login}@{LOAD_TEST_EMAIL_DOMAIN}",
+            "avatar_url": f"https://ui-avatars.com/api/?name={login}",
+        }
+    )
+    return JSONResponse({"status": "success", "email": request.session["user"]["email"]})
+
+
+@app.get("/auth/metrics", include_in_schema=False)
+async def identity_provider_metrics(user: dict = Depends(get_admin_user)):
+    """Latency and error counts of the calls this worker made to each identity provider, for admins."""
+    return JSONResponse(identity_providers.get_metrics())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics of every worker process of this pod."""
+    content, content_type = metrics.render_metrics()
+    return Response(content, media_type=content_type)
+
+
+@app.get("/admin/profiling", include_in_schema=False)
+async def profiling_status(user: dict = Depends(get_admin_user)):
+    """The profiling switch of this pod, and the folded stacks recorded per route."""
+    return JSONResponse({**profiling.get_settings(), "profiles": profiling.list_profiles()})
+
+
+@app.post("/admin/profiling", include_in_schema=False)
+async def set_profiling(
+    sample_rate: float = Form(...),
+    duration_seconds: int = Form(300),
+    user: dict = Depends(get_admin_user),
+):
+    """Profile a fraction of the requests of this pod for a while; a sample rate of 0 stops profiling."""
+    if sample_rate == 0:
+        profiling.disable()
+    else:
+        try:
+            profiling.enable(sample_rate, duration_seconds)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+    logging.info(f"Profiling set to {sample_rate} by {user['email']}")
+    return JSONResponse(profiling.get_settings())
+
+
+@app.get("/admin/profiling/{name}", include_in_schema=False)
+async def download_profile(name: str, user: dict = Depends(get_admin_user)):
+    """Download the folded stacks of a route, to render with flamegraph.pl or speedscope."""
+    path = profiling.get_profile_path(name)
+    if path is None:
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    return FileResponse(path, media_type="text/plain", filename=f"{name}.folded")
+
+
 @app.get("/logout")
 async def logout(request: Request):
     """Log out the user and redirect to login page with a success message."""
-    request.session.pop("user", None)
+    request.session.clear()
     return RedirectResponse(url="/login?logged_out=true")
 
 
@@ -335,8 +381,8 @@ async def submit_query(
     try:
         # Validate endpoint based on whether it's a dump URL or SPARQL endpoint
         if is_dump_url:
-            # For data dump URLs, use general URL validation
-            is_valid, error_message = helper_methods.validate_url(kg_endpoint)
+            # For data dump URLs, sniff the beginning of the content
+            is_valid, error_message, _ = await asyncio.to_thread(helper_methods.validate_dump_url, kg_endpoint)
             if not is_valid:
                 return JSONResponse(
                     {
@@ -347,7 +393,7 @@ async def submit_query(
                 )
         else:
             # For SPARQL endpoints, use SPARQL-specific validation
-            if not helper_methods.check_sparql_endpoint(kg_endpoint, set_timeout=True):
+            if not await asyncio.to_thread(helper_methods.check_sparql_endpoint, kg_endpoint, set_timeout=True):
                 return JSONResponse(
                     {"status": "error", "message": "Invalid SPARQL endpoint"},
                     status_code=400,
@@ -364,7 +410,7 @@ async def submit_query(
         if not database.get_if_endpoint_exists(kg_endpoint):
             # Validate about_page URL if this is a new custom endpoint
             if kg_about_page and kg_about_page.strip():
-                is_valid, error_msg = helper_methods.validate_url(kg_about_page.strip())
+                is_valid, error_msg = await asyncio.to_thread(helper_methods.validate_url, kg_about_page.strip())
                 if not is_valid:
                     return JSONResponse(
                         {
@@ -393,7 +439,7 @@ async def submit_query(
             )
 
         if source and source.strip():
-            is_valid, error_msg = helper_methods.validate_url(source)
+            is_valid, error_msg = await asyncio.to_thread(helper_methods.validate_url, source)
             if not is_valid:
                 return JSONResponse(
                     {"status": "error", "message": f"Source URL error: {error_msg}"},
@@ -417,6 +463,8 @@ async def submit_query(
             message = "Question submitted successfully."
 
         return JSONResponse({"status": "success", "message": message})
+    except helper_methods.OutboundOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         logging.info(f"Error submitting query: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
@@ -439,14 +487,22 @@ async def validate_endpoint(
 
         endpoint_url = endpoint_url.strip()
 
+        limited = rate_limited_response(user, endpoint_url)
+        if limited is not None:
+            return limited
+
         if is_dump_url:
-            is_valid, error_message = helper_methods.validate_url(endpoint_url)
+            is_valid, error_message, dump_info = await asyncio.to_thread(helper_methods.validate_dump_url, endpoint_url)
 
             if is_valid:
+                message = f"Data dump URL is accessible and contains {dump_info['format']} RDF data"
+                if not dump_info["queryable"]:
+                    message += ", but it is too large for SPARQL queries to be validated against it"
                 return JSONResponse(
                     {
                         "status": "success",
-                        "message": "Data dump URL is accessible and working correctly",
+                        "message": message,
+                        "dump_info": dump_info,
                     }
                 )
             else:
@@ -457,13 +513,24 @@ async def validate_endpoint(
                     }
                 )
         else:
-            is_valid = helper_methods.check_sparql_endpoint(endpoint_url, set_timeout=True)
+            is_valid = await asyncio.to_thread(helper_methods.check_sparql_endpoint, endpoint_url, set_timeout=True)
+            health = endpoint_health.get_health(endpoint_url)
 
             if is_valid:
                 return JSONResponse(
                     {
                         "status": "success",
                         "message": "SPARQL endpoint is accessible and working correctly",
+                        "endpoint_health": health,
+                    }
+                )
+            elif health["circuit_state"] != endpoint_health.CLOSED:
+                retry = f"in {health['retry_after']} seconds" if health["retry_after"] else "shortly"
+                return JSONResponse(
+                    {
+                        "status": "error",
+                        "message": f"SPARQL endpoint is temporarily unavailable after repeated failures. Please try again {retry}.",
+                        "endpoint_health": health,
                     }
                 )
             else:
@@ -471,9 +538,12 @@ async def validate_endpoint(
                     {
                         "status": "error",
                         "message": "SPARQL endpoint is not accessible or not responding correctly. Please check the URL and try again.",
+                        "endpoint_health": health,
                     }
                 )
 
+    except helper_methods.OutboundOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         logging.error(f"Error validating endpoint: {e}")
         return JSONResponse(
@@ -492,7 +562,7 @@ async def validate_query(
     endpoint_url: str = Form(...),
     user: dict = Depends(get_current_user),
 ):
-    """Validate SPARQL query syntax and, if valid, execute it against the given endpoint."""
+    """Validate SPARQL query syntax and, if valid, queue its execution against the given endpoint or data dump."""
     try:
         if not sparql_query or not sparql_query.strip():
             return JSONResponse(
@@ -506,24 +576,14 @@ async def validate_query(
                 status_code=400,
             )
 
+        limited = rate_limited_response(user, endpoint_url)
+        if limited is not None:
+            return limited
+
         kg_metadata = database.get_all_kg_metadata(for_one=True, endpoint=endpoint_url)
-        if kg_metadata and kg_metadata.get("is_dump"):
-            if not helper_methods.validate_sparql_query(sparql_query.strip()):
-                return JSONResponse(
-                    {
-                        "status": "error",
-                        "message": "Invalid SPARQL query syntax",
-                    },
-                    status_code=400,
-                )
-            else:
-                return JSONResponse(
-                    {
-                        "status": "success",
-                        "message": "Query is syntactically correct",
-                    },
-                    status_code=200
-                )
+        # Data dumps are queried against a local copy instead of a live endpoint. Only the dumps of
+        # registered KGs are, so that a request cannot make the server download arbitrary URLs
+        is_dump = bool(kg_metadata and kg_metadata.get("is_dump"))
 
         # Check endpoint accessibility (relax this requirement given it will already be validated)
         # if not helper_methods.check_sparql_endpoint(endpoint_url):
@@ -549,53 +609,53 @@ async def validate_query(
                 {"status": "error", "message": "Invalid SPARQL query syntax"},
                 status_code=400,
             )
-        # Execute query and limit results; log output on server
-        logging.info(f"Executing SPARQL query now")
-        try:
-            results = helper_methods.execute_sparql_query(
-                sparql_query.strip(), endpoint_url.strip(), timeout=120
+        # Estimate the cost before running anything on a shared public endpoint; the analyzer
+        # needs the rdflib SPARQL parser, which is only imported once a query is validated
+        import query_analyzer
+
+        cost = query_analyzer.assess_query(sparql_query.strip(), kg_metadata)
+        if cost["action"] == query_analyzer.REJECT:
+            message = (
+                "Query is too expensive to run on a shared endpoint: "
+                + "; ".join(cost["findings"])
             )
             database.insert_validation_result(
                 endpoint=endpoint_url.strip(),
-                validation_status="success",
-                validation_message="Query executed successfully",
+                validation_status="rejected",
+                validation_message=message,
                 username=user["email"],
                 sparql_query=sparql_query.strip(),
-                query_result=str(results),
+                query_result="rejected",
             )
-            logging.info("SPARQL validation result has been run")
-        except TimeoutError as e:
-            database.insert_validation_result(
-                endpoint=endpoint_url.strip(),
-                validation_status="timeout",
-                validation_message=f"Query execution timed out after 120 seconds: {e}",
-                username=user["email"],
-                sparql_query=sparql_query.strip(),
-                query_result="timeout",
-            )
-            logging.warning(f"SPARQL query timed out: {e}")
             return JSONResponse(
-                {"status": "success", 
-                 "message": "Query saved successfully in the database but timed out."},
-                status_code=200,
-            )
-        except Exception as e:
-            database.insert_validation_result(
-                endpoint=endpoint_url.strip(),
-                validation_status="error",
-                validation_message=f"Failed to run query: {e}",
-                username=user["email"],
-                sparql_query=sparql_query.strip(),
-                query_result="error",
-            )
-            return JSONResponse(
-                {"status": "error", "message": f"Failed to run query: {e}"},
-                status_code=500,
+                {"status": "error", "message": message, "cost": cost},
+                status_code=400,
             )
 
-        return JSONResponse(
-            {"status": "success", "message": "Query executed successfully"}
+        # Execution can take up to two minutes, so hand it over to the worker pool
+        heavy = cost["action"] == query_analyzer.HEAVY
+        job_id = validation_jobs.enqueue(
+            endpoint_url.strip(),
+            sparql_query.strip(),
+            user["email"],
+            validation_jobs.HEAVY_QUEUE if heavy else validation_jobs.DEFAULT_QUEUE,
+            is_dump,
         )
+        response = {
+            "status": "queued",
+            "message": "Query queued for validation",
+            "job_id": job_id,
+            # Relative, as url_for would give http:// URLs behind the TLS terminating proxy
+            "status_url": str(request.app.url_path_for("validation_job_status", job_id=job_id)),
+            "events_url": str(request.app.url_path_for("validation_job_events", job_id=job_id)),
+            "cost": cost,
+        }
+        if heavy:
+            response["warning"] = (
+                "Query looks expensive and was queued with lower priority: "
+                + "; ".join(cost["findings"])
+            )
+        return JSONResponse(response, status_code=202)
 
     except Exception as e:
         logging.error(f"Error validating/executing SPARQL query: {e}")
@@ -616,6 +676,66 @@ async def validate_query(
         )
 
 
+def get_validation_job_for_user(job_id: int, user: dict) -> dict:
+    """Fetch a validation job, making sure it belongs to the current user."""
+    job = validation_jobs.get_job(job_id)
+    if not job or job["username"] != user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Validation job not found"
+        )
+    return job
+
+
+@app.get("/validate_query/jobs/{job_id}")
+async def validation_job_status(
+    request: Request,
+    job_id: int,
+    user: dict = Depends(get_current_user),
+):
+    """Returns the state, progress and result of a validation job."""
+    job = await asyncio.to_thread(get_validation_job_for_user, job_id, user)
+    return JSONResponse(validation_jobs.serialize_job(job))
+
+
+@app.get("/validate_query/jobs/{job_id}/events")
+async def validation_job_events(
+    request: Request,
+    job_id: int,
+    user: dict = Depends(get_current_user),
+):
+    """Streams the progress and result of a validation job as Server-Sent Events."""
+    job = await asyncio.to_thread(get_validation_job_for_user, job_id, user)
+
+    async def event_stream():
+        last_payload = None
+        last_sent = time.monotonic()
+        current = job
+        while True:
+            payload = validation_jobs.serialize_job(current)
+            if payload != last_payload:
+                event = "result" if payload["state"] == validation_jobs.FINISHED else "progress"
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+                if event == "result":
+                    return
+            elif time.monotonic() - last_sent > 15:
+                # comment line keeping proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(1)
+            current = await asyncio.to_thread(validation_jobs.get_job, job_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/trigger_modification", include_in_schema=False)
 async def trigger_modification(
     request: Request,
@@ -666,37 +786,43 @@ async def modify_db_submission(
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/delete_submission", include_in_schema=False)
+async def delete_db_submission(
+    request: Request,
+    id_submission: str = Form(...),
+    kg_endpoint: str = Form(...),
+    user: dict = Depends(get_current_user),
+):
+    """Deletes a submission of the current user, leaving a tombstone for incremental exports."""
+    try:
+        if not database.delete_submission(kg_endpoint, id_submission, user["email"]):
+            return JSONResponse(
+                {"status": "error", "message": "Submission not found"},
+                status_code=404,
+            )
+        return JSONResponse({"status": "success", "message": "Submission deleted successfully"})
+    except Exception as e:
+        logging.info(f"Error deleting submission: {e}")
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
 @app.get("/browse")
-async def browse_page(request: Request):
+async def browse_page(request: Request, domain: List[str] = Query([])):
     """Public browse page that lists all submissions from all KG endpoints."""
     user = request.session.get("user")
 
     # Check if user wants to filter by their contributions
     show_my_contributions = request.query_params.get("my_contributions") == "true"
-    
+    contributor = user["email"] if user and show_my_contributions else None
+
     # Get current month for footer
     current_month = datetime.now().strftime("%B")
 
-    # Fetch list of knowledge graph metadata entries
-    if user and show_my_contributions:
-        kg_list = database.get_kg_metadata_with_user_contributions(user["email"])
-    else:
-        kg_list = database.get_all_kg_metadata()
-
-    # Calculate domain-specific KG counts (count of KGs per domain, not submissions)
-    domain_counts = {}
-    for domain_code in const.DISCIPLINE_DOMAINS.keys():
-        domain_counts[domain_code] = 0
-
-    # Count KGs for each domain (each KG counts as 1 regardless of submission count)
-    for kg_data in kg_list:
-        if kg_data.get("domains"):
-            kg_domains = [d.strip() for d in kg_data["domains"].split(",")]
-
-            # Add 1 to each domain this KG belongs to
-            for domain_code in kg_domains:
-                if domain_code in domain_counts:
-                    domain_counts[domain_code] += 1
+    # Only the KGs of the selected domains are rendered; the counts of KGs per domain
+    # (each KG counts as 1 regardless of submission count) are computed in the database
+    selected_domains = [code for code in domain if code in const.DISCIPLINE_DOMAINS]
+    kg_list = database.get_filtered_kg_metadata(selected_domains, contributor)
+    domain_counts = database.get_domain_kg_counts(list(const.DISCIPLINE_DOMAINS), contributor)
 
     # The browse landing page now shows one card per knowledge graph.  We still pass an
     # empty ``submissions`` list so that template logic relying on the variable does not break.
@@ -712,25 +838,83 @@ async def browse_page(request: Request):
             "is_browse_page": True,
             "domain_map": const.DISCIPLINE_DOMAINS,
             "domain_counts": domain_counts,
+            "selected_domains": selected_domains,
             "show_my_contributions": show_my_contributions,
             "current_month": current_month,
         },
     )
 
 
+def submissions_page_context(
+    request: Request, kg_endpoint: str, user: Optional[dict], submission_type: str, mine: bool, q: Optional[str], page: int
+) -> dict:
+    """
+    Filter and paginate the submissions of a KG endpoint in the database for submissions.html.
+
+    Args:
+        submission_type (str): "all", "questions-only" or "with-sparql"
+        mine (bool): Only the submissions of the logged-in user
+        q (Optional[str]): Only the submissions whose question contains this text
+        page (int): The 1-based page number
+
+    Returns:
+        dict: The template variables of the page and its filters
+    """
+    if submission_type not in SUBMISSION_TYPES:
+        submission_type = "all"
+    username = user["email"] if user and mine else None
+    search = q.strip() if q and q.strip() else None
+
+    counts = database.get_filtered_submission_counts(kg_endpoint, username, search)
+    matching = {"all": counts["total"], "with-sparql": counts["with_sparql"], "questions-only": counts["questions_only"]}[
+        submission_type
+    ]
+    n_pages = max(1, -(-matching // SUBMISSIONS_PAGE_SIZE))
+    page = max(1, min(page, n_pages))
+    submissions = database.get_filtered_submissions(
+        kg_endpoint,
+        submission_type,
+        username,
+        search,
+        limit=SUBMISSIONS_PAGE_SIZE,
+        offset=(page - 1) * SUBMISSIONS_PAGE_SIZE,
+    )
+
+    return {
+        "submissions": submissions,
+        "counts": counts,
+        "matching_count": matching,
+        "submission_type": submission_type,
+        "show_my_submissions": bool(username),
+        "filters_active": bool(username or search or submission_type != "all"),
+        "search": search or "",
+        "page": page,
+        "n_pages": n_pages,
+        "first_index": (page - 1) * SUBMISSIONS_PAGE_SIZE + 1 if submissions else 0,
+        "last_index": (page - 1) * SUBMISSIONS_PAGE_SIZE + len(submissions),
+        "prev_url": str(request.url.include_query_params(page=page - 1)) if page > 1 else None,
+        "next_url": str(request.url.include_query_params(page=page + 1)) if page < n_pages else None,
+    }
+
+
 @app.get("/browse/{kg_endpoint:path}")
-async def browse_submissions_for_kg(request: Request, kg_endpoint: str):
-    """Public page that lists all submissions for a specific KG endpoint."""
+async def browse_submissions_for_kg(
+    request: Request,
+    kg_endpoint: str,
+    submission_type: str = Query("all", alias="type"),
+    mine: bool = False,
+    q: Optional[str] = None,
+    page: int = 1,
+):
+    """Public page that lists the submissions for a specific KG endpoint, filtered and paginated server-side."""
     user = request.session.get("user")  # Optional user for conditional UI
     current_month = datetime.now().strftime("%B")
-    submissions = database.get_submissions_by_kg(kg_endpoint)
     kg_metadata = database.get_all_kg_metadata(for_one=True, endpoint=kg_endpoint)
     return templates.TemplateResponse(
         "submissions.html",
         {
             "request": request,
             "user": user,
-            "submissions": submissions,
             "endpoint": kg_endpoint,
             "kg_name": kg_metadata["name"],
             "kg_description": kg_metadata["description"],
@@ -738,6 +922,7 @@ async def browse_submissions_for_kg(request: Request, kg_endpoint: str):
             "is_dump": kg_metadata.get("is_dump", False),
             "is_browse_page": False,
             "current_month": current_month,
+            **submissions_page_context(request, kg_endpoint, user, submission_type, mine, q, page),
         },
     )
 
@@ -750,22 +935,13 @@ async def list_kglite_endpoints(
     current_month = datetime.now().strftime("%B")
     kg_endpoints = database.get_unique_kg_endpoints()
     kg_metadata = database.get_all_kg_metadata()
+    counts_by_kg = database.get_submission_stats()["by_kg"]
 
     for endpoint_data in kg_metadata:
-        endpoint = endpoint_data["endpoint"]
-        submissions = database.get_submissions_by_kg(endpoint)
-
-        total_submissions = len(submissions)
-        query_pairs = sum(
-            1
-            for sub in submissions
-            if sub.get("sparql_query") and sub.get("sparql_query").strip()
-        )
-        questions_only = total_submissions - query_pairs
-
-        endpoint_data["total_submissions"] = total_submissions
-        endpoint_data["query_pairs"] = query_pairs
-        endpoint_data["questions_only"] = questions_only
+        counts = counts_by_kg.get(endpoint_data["endpoint"], {"n_submissions": 0, "n_queries": 0})
+        endpoint_data["total_submissions"] = counts["n_submissions"]
+        endpoint_data["query_pairs"] = counts["n_queries"]
+        endpoint_data["questions_only"] = counts["n_submissions"] - counts["n_queries"]
 
     return templates.TemplateResponse(
         "contribute.html",
@@ -781,66 +957,296 @@ async def list_kglite_endpoints(
 
 @app.get("/list/{kg_endpoint:path}")
 async def list_submissions_for_kg(
-    request: Request, kg_endpoint: str, user: dict = Depends(get_current_user)
+    request: Request,
+    kg_endpoint: str,
+    submission_type: str = Query("all", alias="type"),
+    mine: bool = False,
+    q: Optional[str] = None,
+    page: int = 1,
+    user: dict = Depends(get_current_user),
 ):
-    """Lists all submissions for a specific KG endpoint. Protected route for logged-in users."""
-    submissions = database.get_submissions_by_kg(kg_endpoint)
+    """Lists the submissions for a specific KG endpoint. Protected route for logged-in users."""
     kg_metadata = database.get_all_kg_metadata(for_one=True, endpoint=kg_endpoint)
     return templates.TemplateResponse(
         "submissions.html",
         {
             "request": request,
             "user": user,
-            "submissions": submissions,
             "endpoint": kg_endpoint,
             "kg_name": kg_metadata["name"],
             "kg_description": kg_metadata["description"],
             "kg_about_page": kg_metadata["about_page"],
             "is_dump": kg_metadata.get("is_dump", False),
+            **submissions_page_context(request, kg_endpoint, user, submission_type, mine, q, page),
         },
     )
 
 
+def serve_export_snapshot(request: Request, export_format: str, compression: str, since: Optional[str]):
+    """Serve the precomputed compressed snapshot of a full export."""
+    if since:
+        return JSONResponse(
+            {"status": "error", "message": "Compressed snapshots only hold full exports, omit since"},
+            status_code=400,
+        )
+    if compression not in snapshots.COMPRESSIONS:
+        return JSONResponse(
+            {
+                "status": "error",
+                "message": f"Unsupported compression '{compression}'. Supported compressions: {', '.join(snapshots.COMPRESSIONS)}",
+            },
+            status_code=400,
+        )
+
+    snapshot = snapshots.get_snapshot(export_format, compression)
+    metrics.record_cache("export_snapshot", hit=snapshot is not None)
+    if snapshot is None:
+        snapshots.request_refresh()
+        return JSONResponse(
+            {"status": "error", "message": "The export snapshot is being built, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": "30"},
+        )
+
+    headers = {
+        "ETag": snapshot["etag"],
+        "Cache-Control": "no-cache",
+        "X-Next-Cursor": snapshot["next_cursor"],
+    }
+    if snapshot["etag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        snapshot["path"],
+        media_type=snapshot["media_type"],
+        filename=snapshot["filename"],
+        headers=headers,
+    )
+
+
 @app.get("/export", include_in_schema=False)
 async def export_submissions_rdf(
-    request: Request, user: dict = Depends(get_current_user)
+    request: Request,
+    format: str = "turtle",
+    since: Optional[str] = None,
+    limit: int = 10000,
+    compression: Optional[str] = None,
+    user: dict = Depends(get_current_user),
 ):
-    """Exports all submissions as RDF (Turtle format)."""
-    all_submissions = database.get_all_submissions()
+    """
+    Exports submissions as Turtle, N-Triples, JSON-LD, JSONL or CSV, streamed from the database.
 
-    # create the content of the rdf file in a specified format
-    # reference: https://github.com/sib-swiss/sparql-examples
-    rdf_content = """
-@prefix sh: <http://www.w3.org/ns/shacl#> .
-@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
-@prefix schema: <http://schema.org/> .
-@prefix qkl: <http://example.org/question-kg-linker/> .
-"""
-
-    for sub in all_submissions:
-        submission_id = sub["id"]
-        comment = (
-            "SPARQL - Natural language question pair"
-            if sub["sparql_query"]
-            else "Natural Language Question"
+    Without `since` every submission is exported. With the cursor returned in the
+    X-Next-Cursor header of a previous export, only the submissions created or modified
+    since then are exported, followed by the deleted ones, at most `limit` of each;
+    X-More-Changes tells whether another page is waiting.
+
+    With `compression` (gzip or zstd) the full export is served from the precomputed
+    snapshot file, with ETag and Range support.
+    """
+    if format not in exporters.EXPORT_FORMATS:
+        return JSONResponse(
+            {
+                "status": "error",
+                "message": f"Unsupported export format '{format}'. Supported formats: {', '.join(exporters.EXPORT_FORMATS)}",
+            },
+            status_code=400,
         )
 
-        rdf_content += f"""qkl:{submission_id} .
-\ta sh:SPARQLExecutable, sh:SPARQLSelectExecutable ;
-\trdfs:comment "{comment}" ;
-\tsh:prefixes _:sparql_examples_prefixes ;
-"""
+    if compression:
+        return serve_export_snapshot(request, format, compression, since)
 
-        if sub["sparql_query"]:
-            rdf_content += f'\tsh:select """{helper_methods.escape_string(sub["sparql_query"])}""" ;\n'
+    _, media_type, extension = exporters.EXPORT_FORMATS[format]
+    lag = exporters.CURSOR_LAG_SECONDS
+    if not since:
+        watermark = database.get_export_watermark(lag)
+        next_cursor = exporters.encode_cursor(watermark["updated_at"], 0, watermark["tombstone_id"])
+        chunks = exporters.export_submissions(database.iter_submissions(), format)
+        headers = {"X-Next-Cursor": next_cursor}
+    else:
+        try:
+            position = exporters.decode_cursor(since)
+        except ValueError as e:
+            return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
 
-        rdf_content += f'\tschema:target <{sub["kg_endpoint"]}> ;\n'
-        rdf_content += (
-            f'\tqkl:nlQuestion "{helper_methods.escape_string(sub["nl_question"])}" ;\n'
+        limit = max(1, min(limit, 100000))
+        changed = database.get_changed_submissions(
+            position["updated_at"], position["submission_id"], limit, lag
+        )
+        tombstones = database.get_submission_tombstones(position["tombstone_id"], limit, lag)
+        if changed:
+            position["updated_at"] = str(changed[-1]["updated_at"])
+            position["submission_id"] = changed[-1]["id"]
+        if tombstones:
+            position["tombstone_id"] = tombstones[-1]["id"]
+        next_cursor = exporters.encode_cursor(
+            position["updated_at"], position["submission_id"], position["tombstone_id"]
         )
-        rdf_content += ".\n\n"
+        chunks = exporters.export_submissions(changed, format, tombstones)
+        headers = {
+            "X-Next-Cursor": next_cursor,
+            "X-More-Changes": "true" if len(changed) == limit or len(tombstones) == limit else "false",
+            "X-Changed-Count": str(len(changed)),
+            "X-Deleted-Count": str(len(tombstones)),
+        }
 
-    return Response(content=rdf_content.encode("utf-8"), media_type="text/turtle")
+    headers["Content-Disposition"] = f'attachment; filename="quagga_submissions.{extension}"'
+    return StreamingResponse(
+        (chunk.encode("utf-8") for chunk in chunks),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@app.get("/answer_drift")
+async def answer_drift(
+    request: Request,
+    endpoint: Optional[str] = None,
+    after: int = 0,
+    limit: int = 100,
+    user: dict = Depends(get_current_user),
+):
+    """Lists submissions whose answers changed between their last two validation runs."""
+    limit = max(1, min(limit, 1000))
+    rows = database.get_submissions_with_answer_drift(endpoint, after, limit)
+    for row in rows:
+        row["previous_run_at"] = str(row["previous_run_at"])
+        row["run_at"] = str(row["run_at"])
+    return JSONResponse(
+        {
+            "submissions": rows,
+            "next_after": rows[-1]["submission_id"] if len(rows) == limit else None,
+        }
+    )
+
+
+def _api_kg(kg: dict) -> dict:
+    """Shape a kg_endpoints row as a data_models.KnowledgeGraph."""
+    return {
+        "kg_id": kg["id"],
+        "kg_name": kg["name"],
+        "kg_description": kg["description"],
+        "kg_url": kg["endpoint"],
+        "about_page": kg["about_page"],
+        "domains": [d.strip() for d in (kg["domains"] or "").split(",") if d.strip()],
+        "is_dump": bool(kg["is_dump"]),
+        "n_submissions": int(kg.get("n_submissions") or 0),
+        "n_queries": int(kg.get("n_queries") or 0),
+    }
+
+
+def _api_error(message: str, status_code: int) -> ORJSONResponse:
+    return ORJSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+# The API routes return ORJSONResponse directly: the response models document the schema
+# without validating every row, and orjson encodes the pages much faster than json.
+@app.get("/api/v1/kgs", response_model=data_models.KGPage)
+async def api_list_kgs(cursor: Optional[str] = None, limit: int = API_PAGE_SIZE):
+    """Lists the knowledge graphs with their number of submissions, paginated with next_cursor."""
+    try:
+        after_id = helper_methods.decode_page_cursor(cursor)
+    except ValueError as e:
+        return _api_error(str(e), 400)
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+    rows = database.get_kg_page(after_id, limit)
+    return ORJSONResponse(
+        {
+            "items": [_api_kg(row) for row in rows],
+            "next_cursor": helper_methods.encode_page_cursor(rows[-1]["id"]) if len(rows) == limit else None,
+        }
+    )
+
+
+@app.get("/api/v1/kgs/{kg_id}/submissions", response_model=data_models.SubmissionPage)
+async def api_list_kg_submissions(
+    kg_id: int,
+    cursor: Optional[str] = None,
+    limit: int = API_PAGE_SIZE,
+    fields: Optional[str] = None,
+):
+    """
+    Lists the submissions of a knowledge graph in ID order, paginated with next_cursor.
+
+    `fields` is a comma-separated subset of the submission fields (e.g. `id,nl_question`),
+    so that clients not interested in the SPARQL queries do not download them.
+    """
+    try:
+        after_id = helper_methods.decode_page_cursor(cursor)
+    except ValueError as e:
+        return _api_error(str(e), 400)
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(database.SUBMISSION_API_FIELDS)
+    unknown = [f for f in selected if f not in database.SUBMISSION_API_FIELDS]
+    if unknown or not selected:
+        return _api_error(
+            f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(database.SUBMISSION_API_FIELDS)}",
+            400,
+        )
+
+    kg = database.get_kg_by_id(kg_id)
+    if not kg:
+        return _api_error("Knowledge graph not found", 404)
+
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+    rows = database.get_submissions_page(kg["endpoint"], after_id, limit, selected)
+    next_cursor = helper_methods.encode_page_cursor(rows[-1]["id"]) if len(rows) == limit else None
+    items = []
+    for row in rows:
+        item = {field: row[field] for field in selected}
+        for column in ("created_at", "updated_at"):
+            if item.get(column) is not None:
+                item[column] = str(item[column])
+        items.append(item)
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+
+@app.get("/api/v1/stats", response_model=data_models.Stats)
+async def api_stats():
+    """Returns the number of knowledge graphs, submissions, queries and contributors."""
+    stats = database.get_submission_stats()
+    by_kg = {
+        endpoint: {
+            "n_submissions": counts["n_submissions"],
+            "n_queries": counts["n_queries"],
+            "n_questions": counts["n_submissions"] - counts["n_queries"],
+        }
+        for endpoint, counts in stats["by_kg"].items()
+    }
+    n_submissions = sum(counts["n_submissions"] for counts in by_kg.values())
+    n_queries = sum(counts["n_queries"] for counts in by_kg.values())
+    return ORJSONResponse(
+        {
+            "n_kgs": stats["n_kgs"],
+            "n_submissions": n_submissions,
+            "n_queries": n_queries,
+            "n_questions": n_submissions - n_queries,
+            "n_contributors": stats["n_contributors"],
+            "by_kg": by_kg,
+        }
+    )
+
+
+def home_statistics() -> dict:
+    """Count the queries, questions without a query, contributors and KGs shown on the home page."""
+    all_submissions = database.get_all_submissions()
+
+    n_queries = sum(
+        1
+        for sub in all_submissions
+        if sub.get("sparql_query") and sub.get("sparql_query").strip()
+    )
+    n_contributors = len(
+        set(
+            sub.get("username", "")
+            for sub in all_submissions
+            if sub.get("username")
+        )
+    )
+    return {
+        "n_queries": n_queries,
+        "n_questions": len(all_submissions) - n_queries,
+        "n_contributors": n_contributors,
+        "n_kgs": len(database.get_unique_kg_endpoints()),
+    }
 
 
 @app.get("/home")
@@ -858,25 +1264,6 @@ async def home_page(request: Request):
         current_date = datetime.now().strftime("%B %d, %Y")
         current_month = datetime.now().strftime("%B")
 
-        # Get statistics from database
-        all_submissions = database.get_all_submissions()
-
-        # Calculate statistics
-        n_queries = sum(
-            1
-            for sub in all_submissions
-            if sub.get("sparql_query") and sub.get("sparql_query").strip()
-        )
-        n_questions = len(all_submissions) - n_queries
-        n_contributors = len(
-            set(
-                sub.get("username", "")
-                for sub in all_submissions
-                if sub.get("username")
-            )
-        )
-        n_kgs = len(database.get_unique_kg_endpoints())
-
         return templates.TemplateResponse(
             "home.html",
             {
@@ -884,10 +1271,7 @@ async def home_page(request: Request):
                 "user": user,
                 "current_date": current_date,
                 "current_month": current_month,
-                "n_queries": n_queries,
-                "n_questions": n_questions,
-                "n_contributors": n_contributors,
-                "n_kgs": n_kgs,
+                **home_statistics(),
             },
         )
     except Exception as e:
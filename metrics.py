@@ -0,0 +1,186 @@
+import os
+import time
+import inspect
+import logging
+import functools
+from typing import Callable
+from urllib.parse import urlparse
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logging.getLogger().setLevel(logging.INFO)
+
+# With several uvicorn workers, every process writes its samples to this directory and
+# /metrics aggregates them; the directory must be emptied before the workers start.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_REQUESTS = Counter("quagga_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "quagga_http_request_duration_seconds",
+    "Latency of the HTTP requests until the end of the response body",
+    ["method", "route"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+HTTP_IN_PROGRESS = Gauge(
+    "quagga_http_requests_in_progress", "HTTP requests being served", ["method"], multiprocess_mode="livesum"
+)
+
+DB_LATENCY = Histogram(
+    "quagga_db_call_duration_seconds",
+    "Duration of the database.py functions",
+    ["function"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_ERRORS = Counter("quagga_db_call_errors_total", "database.py calls that raised", ["function"])
+
+SPARQL_LATENCY = Histogram(
+    "quagga_sparql_request_duration_seconds",
+    "Latency of the outbound SPARQL requests",
+    ["endpoint", "format"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+SPARQL_REQUESTS = Counter(
+    "quagga_sparql_requests_total", "Outbound SPARQL requests", ["endpoint", "format", "outcome"]
+)
+
+CACHE_REQUESTS = Counter("quagga_cache_requests_total", "Cache lookups", ["cache", "result"])
+
+# Saturation of the outbound calls, summed over the worker processes: the autoscaler scales
+# on (in flight + waiting) / capacity
+OUTBOUND_IN_FLIGHT = Gauge(
+    "quagga_outbound_in_flight", "Outbound calls holding a slot", multiprocess_mode="livesum"
+)
+OUTBOUND_WAITING = Gauge(
+    "quagga_outbound_waiting", "Outbound calls waiting for a slot", multiprocess_mode="livesum"
+)
+OUTBOUND_CAPACITY = Gauge(
+    "quagga_outbound_capacity", "Outbound call slots", multiprocess_mode="livesum"
+)
+LOAD_SHED = Counter("quagga_load_shed_total", "Outbound calls shed because their wait would exceed the deadline")
+VALIDATION_JOBS_QUEUED = Gauge(
+    "quagga_validation_jobs_queued", "Validation jobs waiting for a worker, in all pods", ["queue"],
+    multiprocess_mode="livemax",
+)
+
+RATE_LIMITED = Counter("quagga_rate_limited_total", "Requests rejected by a rate limit", ["bucket"])
+
+
+def endpoint_label(endpoint_uri: str) -> str:
+    """Label SPARQL metrics by host, as any URL can be validated and full URLs would explode the series."""
+    return urlparse(endpoint_uri).netloc or "unknown"
+
+
+def record_sparql(endpoint_uri: str, return_format: str, seconds: float, outcome: str):
+    """Record one outbound SPARQL request; outcome is "success", "error" or "timeout"."""
+    endpoint = endpoint_label(endpoint_uri)
+    SPARQL_LATENCY.labels(endpoint, return_format).observe(seconds)
+    SPARQL_REQUESTS.labels(endpoint, return_format, outcome).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    """Record a lookup of a cache; the hit ratio is derived from the hit and miss counts."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def timed_db(function: Callable) -> Callable:
+    """Time a database.py function, and count the calls that raise."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.labels(name).inc()
+            raise
+        finally:
+            DB_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def instrument_module(namespace: dict, exclude: tuple = ()):
+    """
+    Wrap the functions defined in a module with timed_db.
+
+    Generator functions are left alone, as their duration would include the consumer's work.
+    """
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (
+            inspect.isfunction(value)
+            and value.__module__ == module
+            and not name.startswith("_")
+            and name not in exclude
+            and not inspect.isgeneratorfunction(value)
+        ):
+            namespace[name] = timed_db(value)
+
+
+def route_label(scope: Scope) -> str:
+    """Label a request by its route template, bounding the number of series."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # Mounted apps (the static files) are labelled by their mount point to bound the series
+    if scope.get("root_path"):
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Count and time the HTTP requests per route template, and track the requests in progress."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.labels(method).dec()
+            route = route_label(scope)
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Render the metrics of every worker process in the Prometheus text format."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop the live gauges of this worker process when it exits."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import random
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Profiles are local to the pod: the switch and the folded stacks live on its disk,
+# shared by its worker processes
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/var/tmp/quagga_profiles")
+# Seconds between two samples of the stack of a profiled request
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+MAX_PROFILE_DURATION = 3600
+
+CONTROL_FILE = os.path.join(PROFILE_DIR, "control.json")
+STACKS_DIR = os.path.join(PROFILE_DIR, "stacks")
+SETTINGS_TTL = 1.0
+
+_settings = {"sample_rate": 0.0, "until": 0.0}
+_settings_read_at = 0.0
+_settings_lock = threading.Lock()
+
+
+def enable(sample_rate: float, duration_seconds: int) -> Dict:
+    """
+    Profile a fraction of the requests of every worker of this pod for a while.
+
+    Args:
+        sample_rate (float): Fraction of the requests that are profiled, between 0 and 1
+        duration_seconds (int): Profiling stops by itself after this many seconds
+
+    Returns:
+        Dict: The new settings
+    """
+    if not 0 <= sample_rate <= 1:
+        raise ValueError("sample_rate must be between 0 and 1")
+    duration_seconds = max(1, min(duration_seconds, MAX_PROFILE_DURATION))
+    settings = {"sample_rate": sample_rate, "until": time.time() + duration_seconds}
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp_file = f"{CONTROL_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(settings, f)
+    os.replace(tmp_file, CONTROL_FILE)
+    _invalidate()
+    logging.info(f"Profiling {sample_rate:.0%} of the requests for {duration_seconds} seconds")
+    return settings
+
+
+def disable():
+    """Stop profiling; the stacks recorded so far are kept."""
+    try:
+        os.remove(CONTROL_FILE)
+    except FileNotFoundError:
+        pass
+    _invalidate()
+
+
+def _invalidate():
+    global _settings_read_at
+    with _settings_lock:
+        _settings_read_at = 0.0
+
+
+def get_settings() -> Dict:
+    """Return the current sample rate, re-reading the switch at most once a second."""
+    global _settings, _settings_read_at
+    now = time.time()
+    with _settings_lock:
+        if now - _settings_read_at > SETTINGS_TTL:
+            try:
+                with open(CONTROL_FILE) as f:
+                    _settings = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                _settings = {"sample_rate": 0.0, "until": 0.0}
+            _settings_read_at = now
+        settings = dict(_settings)
+    if settings["until"] < now:
+        settings["sample_rate"] = 0.0
+    return settings
+
+
+def _folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        names.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# Threads that run the sync routes and the blocking calls of the async ones: the threadpool
+# of Starlette (AnyIO) and the default executor of asyncio.to_thread
+WORKER_THREAD_PREFIXES = ("AnyIO worker thread", "asyncio_")
+# Innermost frames of a worker thread waiting for work, whose samples are not recorded
+IDLE_WORKER_STACKS = ("_asyncio:run;queue:get;threading:wait", "thread:_worker")
+
+
+class StackSampler:
+    """
+    Samples at a fixed interval, from a background thread, the stacks of the event loop
+    thread and of the busy worker threads, each stack rooted at the name of its thread.
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, "")
+                if thread_id != self.loop_thread_id and not name.startswith(WORKER_THREAD_PREFIXES):
+                    continue
+                stack = _folded_stack(frame)
+                if thread_id != self.loop_thread_id and stack.endswith(IDLE_WORKER_STACKS):
+                    continue
+                self.stacks[f"{name};{stack}"] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def _profile_name(method: str, route: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", f"{method} {route}").strip("_") or "root"
+
+
+def write_stacks(method: str, route: str, stacks: Counter):
+    """Append the stacks of a request to the folded stack file of its route."""
+    if not stacks:
+        return
+    os.makedirs(STACKS_DIR, exist_ok=True)
+    lines = "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+    with open(os.path.join(STACKS_DIR, f"{_profile_name(method, route)}.folded"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(lines)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def list_profiles() -> List[Dict]:
+    """List the folded stack files with their number of samples."""
+    if not os.path.isdir(STACKS_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(STACKS_DIR)):
+        if not name.endswith(".folded"):
+            continue
+        with open(os.path.join(STACKS_DIR, name)) as f:
+            samples = sum(int(line.rsplit(" ", 1)[1]) for line in f if line.strip())
+        profiles.append({"name": name[: -len(".folded")], "samples": samples})
+    return profiles
+
+
+def get_profile_path(name: str) -> Optional[str]:
+    """Return the path of a folded stack file listed by list_profiles, or None."""
+    if not re.fullmatch(r"[A-Za-z0-9_]+", name):
+        return None
+    path = os.path.join(STACKS_DIR, f"{name}.folded")
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of a fraction of the requests while profiling is enabled.
+
+    Async routes run on the event loop thread, while sync routes and asyncio.to_thread calls
+    run on worker threads, so both are sampled; requests served concurrently can show up in
+    the same profile. Stopping the sampler and writing its stacks block, so they run off the
+    loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sample_rate = get_settings()["sample_rate"]
+        if not sample_rate or random.random() >= sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stacks = await asyncio.to_thread(sampler.stop)
+            try:
+                await asyncio.to_thread(write_stacks, scope["method"], metrics.route_label(scope), stacks)
+            except OSError as e:
+                logging.error(f"Could not write the profile of {scope['path']}: {e}")
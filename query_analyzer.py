@@ -0,0 +1,197 @@
+import os
+import logging
+from typing import Dict, Optional
+
+from rdflib.term import BNode, Variable
+from rdflib.paths import Path, MulPath, SequencePath, AlternativePath, InvPath, NegatedPath
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Cost added per occurrence of each feature of the query
+COST_WEIGHTS = {
+    "unbound_patterns": 30,  # ?s ?p ?o
+    "two_variable_patterns": 4,
+    "unbounded_paths": 30,  # property paths with * or +
+    "other_paths": 5,
+    "cross_products": 25,  # joined parts sharing no variable
+    "optional_depth": 10,  # per level of nested OPTIONAL
+    # execute_sparql_query appends a LIMIT to most queries without one, but not to those
+    # mentioning "limit" anywhere (an IRI, a variable), hence a smaller weight
+    "missing_limit": 10,
+}
+
+# Defaults used for endpoints without thresholds of their own in kg_endpoints
+DEFAULT_WARN_THRESHOLD = int(os.getenv("QUERY_COST_WARN_THRESHOLD", "50"))
+DEFAULT_REJECT_THRESHOLD = int(os.getenv("QUERY_COST_REJECT_THRESHOLD", "120"))
+
+RUN = "run"
+HEAVY = "heavy"
+REJECT = "reject"
+
+
+def _is_variable(term) -> bool:
+    return isinstance(term, (Variable, BNode))
+
+
+def _pattern_variables(triple) -> set:
+    variables = {term for term in triple if _is_variable(term)}
+    if isinstance(triple[1], Path):
+        variables.discard(triple[1])
+    return variables
+
+
+def _count_paths(path, stats: Dict):
+    """Count the path operators of a property path, recursing into nested paths."""
+    if isinstance(path, MulPath):
+        key = "unbounded_paths" if path.mod in ("*", "+") else "other_paths"
+        stats[key] += 1
+        _count_paths(path.path, stats)
+    elif isinstance(path, (SequencePath, AlternativePath)):
+        stats["other_paths"] += 1
+        for arg in path.args:
+            _count_paths(arg, stats)
+    elif isinstance(path, (InvPath, NegatedPath)):
+        stats["other_paths"] += 1
+
+
+def _count_components(triples) -> int:
+    """Number of groups of triple patterns connected through shared variables."""
+    groups = []
+    for triple in triples:
+        variables = _pattern_variables(triple)
+        connected = [g for g in groups if g & variables]
+        for group in connected:
+            groups.remove(group)
+            variables |= group
+        groups.append(variables)
+    # fully bound patterns only filter, they do not multiply the results
+    return len([g for g in groups if g])
+
+
+def _variables(node) -> set:
+    variables = getattr(node, "_vars", None)
+    return set(variables) if variables else set()
+
+
+def _walk(node, stats: Dict, optional_depth: int):
+    """Collect the cost features of an algebra node and its children."""
+    if isinstance(node, (list, tuple)):
+        for child in node:
+            _walk(child, stats, optional_depth)
+        return
+    if not isinstance(node, CompValue):
+        return
+
+    if node.name == "BGP":
+        for triple in node.triples:
+            stats["triple_patterns"] += 1
+            n_variables = sum(1 for term in triple if _is_variable(term))
+            if n_variables == 3:
+                stats["unbound_patterns"] += 1
+            elif n_variables == 2:
+                stats["two_variable_patterns"] += 1
+            if isinstance(triple[1], Path):
+                _count_paths(triple[1], stats)
+        stats["cross_products"] += max(_count_components(node.triples) - 1, 0)
+        return
+
+    if node.name in ("Join", "LeftJoin"):
+        left, right = _variables(node.p1), _variables(node.p2)
+        if left and right and not left & right:
+            stats["cross_products"] += 1
+
+    if node.name == "LeftJoin":
+        _walk(node.p1, stats, optional_depth)
+        depth = optional_depth + 1
+        stats["optional_depth"] = max(stats["optional_depth"], depth)
+        _walk(node.p2, stats, depth)
+        return
+
+    for key, value in node.items():
+        if key != "_vars":
+            _walk(value, stats, optional_depth)
+
+
+def analyze_query(query: str) -> Dict:
+    """
+    Estimate the cost of a SPARQL query from its parsed algebra, without executing it.
+
+    Args:
+        query (str): The SPARQL query to analyze
+
+    Returns:
+        Dict: The cost score, the features it was computed from and human readable findings
+
+    Raises:
+        Exception: If the query is not syntactically correct
+    """
+    algebra = prepareQuery(query).algebra
+    stats = {
+        "triple_patterns": 0,
+        "unbound_patterns": 0,
+        "two_variable_patterns": 0,
+        "unbounded_paths": 0,
+        "other_paths": 0,
+        "cross_products": 0,
+        "optional_depth": 0,
+        "has_limit": False,
+    }
+    _walk(algebra, stats, 0)
+    # Only a LIMIT of the query itself bounds its results, not one of a subquery
+    stats["has_limit"] = algebra.p.name == "Slice" and algebra.p.length is not None
+    # ASK stops at the first solution, so only SELECT/CONSTRUCT/DESCRIBE need a LIMIT
+    stats["missing_limit"] = int(not stats["has_limit"] and algebra.name != "AskQuery")
+
+    score = sum(weight * stats[feature] for feature, weight in COST_WEIGHTS.items())
+
+    findings = []
+    if stats["unbound_patterns"]:
+        findings.append(f"{stats['unbound_patterns']} triple pattern(s) with subject, predicate and object all unbound")
+    if stats["unbounded_paths"]:
+        findings.append(f"{stats['unbounded_paths']} property path(s) using * or +")
+    if stats["cross_products"]:
+        findings.append(f"{stats['cross_products']} join(s) between patterns sharing no variable (cross product)")
+    if stats["optional_depth"] > 1:
+        findings.append(f"OPTIONAL nested {stats['optional_depth']} levels deep")
+    if stats["missing_limit"]:
+        findings.append("no LIMIT clause")
+
+    return {"score": score, "features": stats, "findings": findings}
+
+
+def get_thresholds(kg_metadata: Optional[Dict]) -> tuple[int, int]:
+    """Return the (warn, reject) cost thresholds of an endpoint, falling back to the defaults."""
+    kg_metadata = kg_metadata or {}
+    warn = kg_metadata.get("cost_warn_threshold")
+    reject = kg_metadata.get("cost_reject_threshold")
+    return (
+        DEFAULT_WARN_THRESHOLD if warn is None else int(warn),
+        DEFAULT_REJECT_THRESHOLD if reject is None else int(reject),
+    )
+
+
+def assess_query(query: str, kg_metadata: Optional[Dict]) -> Dict:
+    """
+    Decide whether a query can run normally, should go to the heavy queue, or is rejected.
+
+    Args:
+        query (str): The syntactically valid SPARQL query
+        kg_metadata (Optional[Dict]): The metadata of the target endpoint, with its thresholds
+
+    Returns:
+        Dict: The cost analysis together with the thresholds and the resulting action
+    """
+    report = analyze_query(query)
+    warn_threshold, reject_threshold = get_thresholds(kg_metadata)
+    if report["score"] >= reject_threshold:
+        action = REJECT
+    elif report["score"] >= warn_threshold:
+        action = HEAVY
+    else:
+        action = RUN
+    report.update(
+        {"action": action, "warn_threshold": warn_threshold, "reject_threshold": reject_threshold}
+    )
+    return report
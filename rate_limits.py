@@ -0,0 +1,102 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import database
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Quotas of the routes that call SPARQL endpoints and data dumps on behalf of the user,
+# written "<requests>/<seconds>": a burst of <requests>, refilled evenly over <seconds>.
+# An empty value disables the limit.
+RATE_LIMIT_PER_USER = os.getenv("RATE_LIMIT_PER_USER", "20/60")
+RATE_LIMIT_PER_ENDPOINT = os.getenv("RATE_LIMIT_PER_ENDPOINT", "60/60")
+
+
+def parse_quota(quota: str) -> Optional[tuple[float, float]]:
+    """
+    Parse a "<requests>/<seconds>" quota.
+
+    Returns:
+        Optional[tuple[float, float]]: (capacity, refill_per_second), or None if the quota is empty
+    """
+    if not quota or not quota.strip():
+        return None
+    requests, _, seconds = quota.partition("/")
+    capacity, period = float(requests), float(seconds)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Invalid rate limit quota {quota}, expected <requests>/<seconds>")
+    return capacity, capacity / period
+
+
+USER_QUOTA = parse_quota(RATE_LIMIT_PER_USER)
+ENDPOINT_QUOTA = parse_quota(RATE_LIMIT_PER_ENDPOINT)
+# Buckets that refilled completely are deleted at most this often per process
+CLEANUP_INTERVAL = 3600
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def _maybe_delete_full():
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.monotonic() - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.monotonic()
+    for bucket, quota in (("user", USER_QUOTA), ("endpoint", ENDPOINT_QUOTA)):
+        if quota is None:
+            continue
+        try:
+            deleted = database.delete_full_rate_limits(f"{bucket}:", *quota, time.time())
+            if deleted:
+                logging.info(f"Deleted {deleted} idle {bucket} rate limit buckets")
+        except Exception as e:
+            logging.error(f"Could not delete the idle {bucket} rate limit buckets: {e}")
+
+
+def _take(bucket: str, key: str, quota: Optional[tuple[float, float]]) -> float:
+    if quota is None:
+        return 0.0
+    try:
+        wait = database.take_rate_limit_token(f"{bucket}:{key}", *quota)
+    except Exception as e:
+        # A database hiccup should not lock every user out
+        logging.error(f"Could not check the {bucket} rate limit, letting the request through: {e}")
+        return 0.0
+    if wait > 0:
+        metrics.RATE_LIMITED.labels(bucket).inc()
+    return wait
+
+
+def check(user_email: str, endpoint_url: str) -> Optional[int]:
+    """
+    Take a token from the buckets of the user and of the target endpoint, or from neither.
+
+    Args:
+        user_email (str): The email of the current user
+        endpoint_url (str): The SPARQL endpoint or data dump URL the request will call
+
+    Returns:
+        Optional[int]: None if the request is allowed, else the seconds to wait before retrying
+    """
+    _maybe_delete_full()
+    user_key = user_email.lower()
+    wait = _take("user", user_key, USER_QUOTA)
+    if wait == 0:
+        # The URL is hashed to fit the key column whatever its length
+        wait = _take("endpoint", hashlib.sha256(endpoint_url.strip().encode()).hexdigest(), ENDPOINT_QUOTA)
+        if wait > 0 and USER_QUOTA is not None:
+            # The request is refused, so it should not count against the user's quota
+            try:
+                database.refund_rate_limit_token(f"user:{user_key}", USER_QUOTA[0])
+            except Exception as e:
+                logging.error(f"Could not refund the user rate limit token: {e}")
+    if wait == 0:
+        return None
+    return max(1, math.ceil(wait))
@@ -0,0 +1,399 @@
+import os
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import database
+import endpoint_health
+import helper_methods
+
+logging.getLogger().setLevel(logging.INFO)
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` calls per second are started."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            slot = max(time.monotonic(), self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class EndpointProgress:
+    """Tracks the highest submission ID of an endpoint below which every result is stored."""
+
+    def __init__(self, watermark: int):
+        self.watermark = watermark
+        self.pending = deque()
+        self.completed = set()
+        self.lock = threading.Lock()
+        # Set once the endpoint refused calls for longer than max_retry_wait; its remaining
+        # queries are then left, unrecorded, for the next run
+        self.unavailable = False
+
+    def started(self, submission_id: int):
+        with self.lock:
+            self.pending.append(submission_id)
+
+    def finished(self, submission_id: int):
+        with self.lock:
+            self.completed.add(submission_id)
+            while self.pending and self.pending[0] in self.completed:
+                self.watermark = self.pending.popleft()
+                self.completed.remove(self.watermark)
+
+
+class Checkpoint:
+    """Persists per-endpoint watermarks and the running summary so that a run can resume."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.state = {
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "watermarks": {},
+            "counts": {"success": 0, "timeout": 0, "error": 0},
+            "broken": [],
+            "slow": [],
+            "changed": [],
+        }
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+            logging.info(f"Resuming re-validation from checkpoint {path}")
+
+    def watermark(self, endpoint: str) -> int:
+        return self.state["watermarks"].get(endpoint, 0)
+
+    def save(self, progress: Dict[str, EndpointProgress]):
+        for endpoint, endpoint_progress in progress.items():
+            self.state["watermarks"][endpoint] = endpoint_progress.watermark
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+def run_stored_query(submission: Dict, timeout: int, username: str, limit: int = helper_methods.FINGERPRINT_MAX_ROWS) -> Dict:
+    """
+    Execute the stored SPARQL query of a submission against its endpoint.
+
+    Args:
+        submission (Dict): The submission with its id, kg_endpoint, sparql_query and is_dump flag
+        timeout (int): Upper bound of the execution timeout in seconds
+        username (str): The name recorded as the author of the validation result
+        limit (int): Maximum number of result rows fingerprinted, runs with more are stored as truncated
+
+    Returns:
+        Dict: The validation result, ready to be inserted into validation_results
+
+    Raises:
+        CircuitOpenError: If the circuit of the endpoint is open, nothing was learnt about the query
+        OutboundOverloadedError: If the process has too many outbound calls in progress
+    """
+    started = time.monotonic()
+    fingerprint, row_count, truncated = None, None, False
+    abandoned_call = None
+    try:
+        results = helper_methods.execute_sparql_query(
+            submission["sparql_query"],
+            submission["kg_endpoint"],
+            limit=limit + 1,
+            timeout=timeout,
+            is_dump=submission.get("is_dump", False),
+        )
+        fingerprint, row_count, truncated = helper_methods.fingerprint_run(results, limit)
+        status, message = "success", "Query executed successfully"
+        query_result = str(results[: helper_methods.RESULT_PREVIEW_ROWS])
+    except (endpoint_health.CircuitOpenError, helper_methods.OutboundOverloadedError):
+        raise
+    except TimeoutError as e:
+        status, message, query_result = "timeout", f"Query execution timed out: {e}", "timeout"
+        abandoned_call = getattr(e, "call_finished", None)
+    except Exception as e:
+        status, message, query_result = "error", f"Failed to run query: {e}", "error"
+    duration_ms = int((time.monotonic() - started) * 1000)
+    if abandoned_call is not None:
+        # The endpoint is still answering the abandoned call: wait for it, so that the next
+        # query of this worker does not go over the per-endpoint concurrency
+        abandoned_call.wait()
+
+    return {
+        "submission_id": submission["id"],
+        "endpoint": submission["kg_endpoint"],
+        "validation_status": status,
+        "validation_message": message,
+        "username": username,
+        "sparql_query": submission["sparql_query"],
+        "query_result": query_result,
+        "duration_ms": duration_ms,
+        "result_fingerprint": fingerprint,
+        "row_count": row_count,
+        "truncated": truncated,
+    }
+
+
+def _feed(endpoint: str, is_dump: bool, progress: EndpointProgress, work: queue.Queue, page_size: int, n_workers: int):
+    """Page through the stored queries of an endpoint, starting after its watermark."""
+    after_id = progress.watermark
+    try:
+        while not progress.unavailable:
+            page = database.get_submission_queries_page(endpoint, after_id, page_size)
+            for submission in page:
+                submission["is_dump"] = is_dump
+                progress.started(submission["id"])
+                work.put(submission)
+            if len(page) < page_size:
+                break
+            after_id = page[-1]["id"]
+    except Exception as e:
+        logging.error(f"Error reading stored queries for {endpoint}: {e}")
+    finally:
+        for _ in range(n_workers):
+            work.put(None)
+
+
+def _work(
+    work: queue.Queue,
+    results: queue.Queue,
+    progress: EndpointProgress,
+    limiter: RateLimiter,
+    slots: threading.Semaphore,
+    timeout: int,
+    username: str,
+    limit: int,
+    max_retry_wait: float,
+):
+    """
+    Run the queries handed over by the feeder of an endpoint.
+
+    Calls refused by an open circuit or an overloaded process are retried once the endpoint
+    may be called again. A query still refused after max_retry_wait seconds is not recorded,
+    so the watermark stays before it and a resumed run retries it.
+    """
+    while True:
+        submission = work.get()
+        if submission is None:
+            return
+        retry_until = time.monotonic() + max_retry_wait
+        while not progress.unavailable:
+            limiter.wait()
+            try:
+                with slots:
+                    results.put(run_stored_query(submission, timeout, username, limit))
+                break
+            except (endpoint_health.CircuitOpenError, helper_methods.OutboundOverloadedError) as e:
+                delay = max(e.retry_after, 1)
+                if time.monotonic() + delay > retry_until:
+                    logging.warning(
+                        f"{submission['kg_endpoint']} is still unavailable after {max_retry_wait:.0f} seconds, "
+                        "its remaining queries are left for the next run"
+                    )
+                    progress.unavailable = True
+                    break
+                time.sleep(delay)
+
+
+def _answers_differ(before: Dict, after: Dict) -> bool:
+    """Compare two runs by fingerprint, falling back to the stored repr for older runs."""
+    # Truncated runs hold an arbitrary subset of the answers, so they cannot be compared
+    if before.get("truncated") or after.get("truncated"):
+        return False
+    if before.get("result_fingerprint") and after.get("result_fingerprint"):
+        return before["result_fingerprint"] != after["result_fingerprint"]
+    return before["query_result"] != after["query_result"]
+
+
+def _record(batch: List[Dict], checkpoint: Checkpoint, progress: Dict[str, EndpointProgress], slow_threshold_ms: int):
+    """Classify a batch against the previous runs, store it and advance the checkpoint."""
+    previous = database.get_latest_validation_results([r["submission_id"] for r in batch])
+    database.insert_validation_results(batch)
+
+    state = checkpoint.state
+    for result in batch:
+        status = result["validation_status"]
+        state["counts"][status] = state["counts"].get(status, 0) + 1
+        entry = {
+            "submission_id": result["submission_id"],
+            "endpoint": result["endpoint"],
+            "duration_ms": result["duration_ms"],
+        }
+        if status == "error":
+            state["broken"].append({**entry, "message": result["validation_message"]})
+        if status == "timeout" or result["duration_ms"] >= slow_threshold_ms:
+            state["slow"].append(entry)
+
+        before = previous.get(result["submission_id"])
+        if (
+            before
+            and status == "success"
+            and before["validation_status"] == "success"
+            and _answers_differ(before, result)
+        ):
+            state["changed"].append(entry)
+        progress[result["endpoint"]].finished(result["submission_id"])
+
+    checkpoint.save(progress)
+
+
+def summarize(checkpoint: Checkpoint) -> Dict:
+    """Build the summary of broken, slow and changed queries of the run."""
+    state = checkpoint.state
+    return {
+        "started_at": state["started_at"],
+        "counts": state["counts"],
+        "n_broken": len(state["broken"]),
+        "n_slow": len(state["slow"]),
+        "n_changed": len(state["changed"]),
+        "broken": state["broken"],
+        "slow": state["slow"],
+        "changed": state["changed"],
+    }
+
+
+def revalidate(
+    checkpoint_path: str,
+    restart: bool = False,
+    endpoints: Optional[List[str]] = None,
+    concurrency: int = 8,
+    per_endpoint_concurrency: int = 1,
+    rate: float = 1.0,
+    batch_size: int = 100,
+    timeout: int = 120,
+    limit: int = helper_methods.FINGERPRINT_MAX_ROWS,
+    slow_threshold: float = 30.0,
+    progress_interval: float = 10.0,
+    max_retry_wait: float = 600.0,
+    username: str = "bulk-revalidation",
+) -> Dict:
+    """
+    Re-execute every stored SPARQL query, concurrently across endpoints.
+
+    Each endpoint is fed in ID order with its own rate limit, results are written to
+    validation_results in batches and the checkpoint only moves past stored results.
+    Endpoints refusing calls for longer than max_retry_wait are left for a resumed run.
+
+    Returns:
+        Dict: The summary of broken, slow and changed queries, and the unavailable endpoints
+    """
+    checkpoint = Checkpoint(checkpoint_path, restart)
+    counts = database.get_endpoints_with_queries()
+    if endpoints:
+        counts = {e: n for e, n in counts.items() if e in endpoints}
+
+    progress = {}
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(concurrency)
+    threads = []
+    for endpoint in sorted(counts):
+        kg_metadata = database.get_all_kg_metadata(for_one=True, endpoint=endpoint)
+        is_dump = bool(kg_metadata and kg_metadata.get("is_dump"))
+
+        progress[endpoint] = EndpointProgress(checkpoint.watermark(endpoint))
+        work = queue.Queue(maxsize=batch_size * 2)
+        limiter = RateLimiter(rate)
+        threads.append(threading.Thread(
+            target=_feed, args=(endpoint, is_dump, progress[endpoint], work, batch_size, per_endpoint_concurrency)
+        ))
+        for _ in range(per_endpoint_concurrency):
+            threads.append(threading.Thread(
+                target=_work,
+                args=(work, results, progress[endpoint], limiter, slots, timeout, username, limit, max_retry_wait),
+            ))
+
+    total = sum(counts[e] for e in progress)
+    done = sum(checkpoint.state["counts"].values())
+    logging.info(f"Re-validating {total - done} of {total} stored queries across {len(progress)} endpoints")
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    started = time.monotonic()
+    last_report = started
+    processed = 0
+    batch = []
+    while any(t.is_alive() for t in threads) or not results.empty() or batch:
+        try:
+            batch.append(results.get(timeout=1))
+        except queue.Empty:
+            pass
+
+        finished = not any(t.is_alive() for t in threads) and results.empty()
+        if batch and (len(batch) >= batch_size or finished or time.monotonic() - last_report >= progress_interval):
+            _record(batch, checkpoint, progress, int(slow_threshold * 1000))
+            processed += len(batch)
+            batch = []
+
+        if time.monotonic() - last_report >= progress_interval or finished:
+            last_report = time.monotonic()
+            rate_per_s = processed / max(last_report - started, 1e-6)
+            remaining = max(total - done - processed, 0)
+            eta = f"{remaining / rate_per_s / 60:.1f} min" if rate_per_s > 0 else "unknown"
+            state = checkpoint.state
+            logging.info(
+                f"Re-validated {done + processed}/{total} queries ({rate_per_s:.1f}/s, ETA {eta}): "
+                f"{len(state['broken'])} broken, {len(state['slow'])} slow, {len(state['changed'])} changed"
+            )
+
+    summary = summarize(checkpoint)
+    summary["unavailable"] = sorted(e for e, endpoint_progress in progress.items() if endpoint_progress.unavailable)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-execute every stored SPARQL query against its KG endpoint and record the outcomes."
+    )
+    parser.add_argument("--checkpoint", default="revalidation_checkpoint.json", help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--endpoint", action="append", help="Only re-validate this endpoint (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of queries running at once")
+    parser.add_argument("--per-endpoint-concurrency", type=int, default=1, help="Maximum number of queries running at once per endpoint")
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum number of queries started per second per endpoint")
+    parser.add_argument("--batch-size", type=int, default=100, help="Number of results written to the database at once")
+    parser.add_argument("--timeout", type=int, default=120, help="Upper bound of the execution timeout in seconds")
+    parser.add_argument("--limit", type=int, default=helper_methods.FINGERPRINT_MAX_ROWS, help="Maximum number of result rows fingerprinted per query, runs with more are stored as truncated")
+    parser.add_argument("--slow-threshold", type=float, default=30.0, help="Duration in seconds from which a query counts as slow")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--max-retry-wait", type=float, default=600.0, help="Seconds a query refused by an open circuit is retried before its endpoint is left for a resumed run")
+    parser.add_argument("--summary", default="revalidation_summary.json", help="File the summary is written to")
+    args = parser.parse_args()
+
+    summary = revalidate(
+        args.checkpoint,
+        restart=args.restart,
+        endpoints=args.endpoint,
+        concurrency=args.concurrency,
+        per_endpoint_concurrency=args.per_endpoint_concurrency,
+        rate=args.rate,
+        batch_size=args.batch_size,
+        timeout=args.timeout,
+        limit=args.limit,
+        slow_threshold=args.slow_threshold,
+        progress_interval=args.progress_interval,
+        max_retry_wait=args.max_retry_wait,
+    )
+    with open(args.summary, "w") as f:
+        json.dump(summary, f, indent=2)
+    logging.info(
+        f"Re-validation finished: {summary['counts']}, {summary['n_broken']} broken, "
+        f"{summary['n_slow']} slow, {summary['n_changed']} changed. Summary written to {args.summary}"
+    )
+    if summary["unavailable"]:
+        logging.warning(f"Unavailable endpoints, run again to resume them: {', '.join(summary['unavailable'])}")
+
+
+if __name__ == "__main__":
+    main()
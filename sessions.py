@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import secrets
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import database
+import static_assets
+
+logging.getLogger().setLevel(logging.INFO)
+
+SESSION_COOKIE = "session"
+# Sessions unused for this long expire, as the signed cookies did by default
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+SESSION_HTTPS_ONLY = os.getenv("SESSION_HTTPS_ONLY", "false").lower() == "true"
+# Expired sessions are deleted at most this often per process
+CLEANUP_INTERVAL = 3600
+
+# Requests that never read the session skip the lookup
+SKIPPED_PATHS = (static_assets.STATIC_URL_PREFIX + "/", "/metrics")
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def _session_key(session_id: str) -> str:
+    # Only a hash of the cookie is stored, so the table cannot be used to hijack sessions
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+def _maybe_delete_expired():
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.monotonic() - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.monotonic()
+    try:
+        deleted = database.delete_expired_sessions(time.time())
+        if deleted:
+            logging.info(f"Deleted {deleted} expired sessions")
+    except Exception as e:
+        logging.error(f"Could not delete the expired sessions: {e}")
+
+
+def session_user(user: dict) -> dict:
+    """Keep only the fields of an identity provider profile that the app uses."""
+    return {"email": user.get("email"), "login": user.get("login"), "avatar_url": user.get("avatar_url")}
+
+
+class ServerSessionMiddleware:
+    """
+    Keep the sessions in the database, the cookie only holding an opaque random id.
+
+    Drop-in replacement for Starlette's SessionMiddleware: routes read and write
+    `request.session` as before. A session is stored once something is put in it, and a new
+    id is issued when the user changes, so that an id set before the login cannot be reused.
+    The expiry slides, but is only pushed back once half of SESSION_MAX_AGE has passed.
+    """
+
+    def __init__(self, app: ASGIApp, max_age: int = SESSION_MAX_AGE, https_only: bool = SESSION_HTTPS_ONLY):
+        self.app = app
+        self.max_age = max_age
+        self.security_flags = "httponly; samesite=lax" + ("; secure" if https_only else "")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        if scope["path"].startswith(SKIPPED_PATHS):
+            scope["session"] = {}
+            await self.app(scope, receive, send)
+            return
+
+        session_id = HTTPConnection(scope).cookies.get(SESSION_COOKIE)
+        try:
+            stored = database.get_session(_session_key(session_id), time.time()) if session_id else None
+        except Exception as e:
+            # A database hiccup should not fail every request, serve this one anonymously
+            logging.error(f"Could not load the session, treating the request as anonymous: {e}")
+            stored = None
+        if stored is None:
+            session_id = None
+        initial_data = stored["data"] if stored else "{}"
+        scope["session"] = json.loads(initial_data)
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start":
+                try:
+                    cookie = self._save(scope["session"], session_id, stored, initial_data)
+                except Exception as e:
+                    # The response is sent as it is, the session changes of this request are lost
+                    logging.error(f"Could not save the session: {e}")
+                    cookie = None
+                if cookie is not None:
+                    MutableHeaders(scope=message).append("Set-Cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _save(self, session: dict, session_id: Optional[str], stored: Optional[dict], initial_data: str) -> Optional[str]:
+        """Persist the changes of the session, returning the Set-Cookie header value if the cookie changes."""
+        data = json.dumps(session, sort_keys=True)
+        now = time.time()
+        if not session:
+            if session_id is None:
+                return None
+            database.delete_session(_session_key(session_id))
+            return f"{SESSION_COOKIE}=null; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}"
+
+        user_changed = json.loads(initial_data).get("user") != session.get("user")
+        if session_id is None or user_changed:
+            if session_id is not None:
+                database.delete_session(_session_key(session_id))
+            session_id = secrets.token_urlsafe(32)
+            _maybe_delete_expired()
+        elif data == initial_data and stored["expires_at"] - now > self.max_age / 2:
+            return None
+
+        database.save_session(_session_key(session_id), data, now + self.max_age)
+        return f"{SESSION_COOKIE}={session_id}; path=/; Max-Age={self.max_age}; {self.security_flags}"
@@ -0,0 +1,238 @@
+import os
+import gzip
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, Optional
+
+import database
+import exporters
+
+try:
+    import zstandard
+except ImportError:  # zstd snapshots are skipped without the zstandard package
+    zstandard = None
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Local directory holding one sub-directory of compressed exports per data version
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "/var/tmp/quagga_snapshots")
+# How often the builder checks whether the data changed since the last snapshot
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+# Whether the app process runs the builder thread; set to false when `python snapshots.py`
+# runs it once per pod instead of once per worker
+BUILDER_IN_APP = os.getenv("SNAPSHOT_BUILDER_IN_APP", "true").lower() == "true"
+
+# compression name -> (file suffix, media type)
+COMPRESSIONS = {"gzip": ("gz", "application/gzip")}
+if zstandard is not None:
+    COMPRESSIONS["zstd"] = ("zst", "application/zstd")
+
+MANIFEST = os.path.join(SNAPSHOT_DIR, "current.json")
+
+_stop = threading.Event()
+_trigger = threading.Event()
+
+
+def _open_compressed(path: str, compression: str):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+def get_manifest() -> Optional[Dict]:
+    """Return the manifest of the current snapshot, or None if none was built yet."""
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def get_snapshot(export_format: str, compression: str) -> Optional[Dict]:
+    """
+    Look up the current snapshot file of an export format.
+
+    Returns:
+        Optional[Dict]: The path, etag, media type, filename and cursor of the snapshot,
+            or None if no snapshot is available yet
+    """
+    manifest = get_manifest()
+    if not manifest:
+        return None
+    entry = manifest["files"].get(export_format, {}).get(compression)
+    if not entry:
+        return None
+    path = os.path.join(SNAPSHOT_DIR, manifest["directory"], entry["file"])
+    if not os.path.exists(path):
+        return None
+    return {
+        "path": path,
+        "etag": f'"{entry["sha256"][:32]}"',
+        "media_type": COMPRESSIONS[compression][1],
+        "filename": entry["file"],
+        "next_cursor": manifest["next_cursor"],
+    }
+
+
+def build_snapshots(version: str) -> Dict:
+    """
+    Materialise every export format, compressed with every available codec, for a data version.
+
+    Files are written to a build directory that is swapped in once complete, and the
+    manifest is replaced atomically, so readers never see a partial snapshot.
+
+    Args:
+        version (str): The data version, from database.get_data_version()
+
+    Returns:
+        Dict: The new manifest
+    """
+    started = time.monotonic()
+    watermark = database.get_export_watermark(exporters.CURSOR_LAG_SECONDS)
+    # unique per build, so that rebuilding a version never replaces files being served
+    directory = f"{hashlib.sha256(version.encode('utf-8')).hexdigest()[:12]}-{int(time.time())}"
+    build_dir = os.path.join(SNAPSHOT_DIR, f".build-{directory}")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    files = {}
+    for export_format, (_, _, extension) in exporters.EXPORT_FORMATS.items():
+        names = {
+            compression: f"quagga_submissions.{extension}.{suffix}"
+            for compression, (suffix, _) in COMPRESSIONS.items()
+        }
+        writers = {
+            compression: _open_compressed(os.path.join(build_dir, name), compression)
+            for compression, name in names.items()
+        }
+        try:
+            for chunk in exporters.export_submissions(database.iter_submissions(), export_format):
+                data = chunk.encode("utf-8")
+                for writer in writers.values():
+                    writer.write(data)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        files[export_format] = {}
+        for compression, name in names.items():
+            digest = hashlib.sha256()
+            with open(os.path.join(build_dir, name), "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            files[export_format][compression] = {
+                "file": name,
+                "size": os.path.getsize(os.path.join(build_dir, name)),
+                "sha256": digest.hexdigest(),
+            }
+
+    os.replace(build_dir, os.path.join(SNAPSHOT_DIR, directory))
+
+    previous = get_manifest()
+    manifest = {
+        "version": version,
+        "directory": directory,
+        "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "next_cursor": exporters.encode_cursor(watermark["updated_at"], 0, watermark["tombstone_id"]),
+        "files": files,
+    }
+    tmp_manifest = f"{MANIFEST}.tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, MANIFEST)
+
+    # Keep the previous snapshot for the requests still downloading it
+    keep = {directory, previous["directory"] if previous else None}
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if os.path.isdir(path) and not name.startswith(".build-") and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+    logging.info(f"Built export snapshots for data version {version} in {time.monotonic() - started:.1f}s")
+    return manifest
+
+
+def _is_current(manifest: Optional[Dict], version: str) -> bool:
+    """Whether the manifest holds every format and compression for the data version."""
+    if not manifest or manifest["version"] != version:
+        return False
+    return set(manifest["files"]) == set(exporters.EXPORT_FORMATS) and all(
+        set(entries) == set(COMPRESSIONS) for entries in manifest["files"].values()
+    )
+
+
+def refresh_snapshots() -> bool:
+    """
+    Rebuild the snapshots if the data changed since they were built.
+
+    Only one process of the pod builds at a time; the others skip while the build lock is held.
+
+    Returns:
+        bool: True if the snapshots were rebuilt
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, "build.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            version = database.get_data_version()
+            manifest = get_manifest()
+            if _is_current(manifest, version):
+                return False
+            build_snapshots(version)
+            return True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def request_refresh():
+    """Ask the builder thread of this process, if it runs one, to check for new data right away."""
+    _trigger.set()
+
+
+def _builder_loop():
+    while not _stop.is_set():
+        try:
+            refresh_snapshots()
+        except Exception as e:
+            logging.error(f"Error building export snapshots: {e}")
+        _trigger.wait(SNAPSHOT_INTERVAL)
+        _trigger.clear()
+
+
+def start_builder():
+    """Start the background thread keeping the snapshots of this pod up to date."""
+    _stop.clear()
+    thread = threading.Thread(target=_builder_loop, name="snapshot-builder")
+    thread.daemon = True
+    thread.start()
+
+
+def stop_builder():
+    """Signal the builder thread to stop after its current build."""
+    _stop.set()
+    _trigger.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the compressed export snapshots of this pod up to date.")
+    parser.add_argument("--once", action="store_true", help="Build the snapshots if the data changed, then exit")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.once:
+        refresh_snapshots()
+        return
+    _builder_loop()
+
+
+if __name__ == "__main__":
+    main()
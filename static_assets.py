@@ -0,0 +1,92 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+STATIC_DIR = "templates"
+STATIC_URL_PREFIX = "/templates"
+
+# Fingerprinted URLs change with the content, so browsers may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Plain URLs are still served for old links, but revalidated with their ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_FINGERPRINT = re.compile(r"\.([0-9a-f]{12})(\.[A-Za-z0-9]+)$")
+
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def file_hash(path: str) -> str:
+    """Return the first 12 hex digits of the sha256 of a static file, cached until the file changes."""
+    full_path = os.path.join(STATIC_DIR, path)
+    mtime = os.stat(full_path).st_mtime_ns
+    with _hashes_lock:
+        cached = _hashes.get(path)
+    if cached and cached[0] == mtime:
+        metrics.record_cache("static_hash", hit=True)
+        return cached[1]
+    metrics.record_cache("static_hash", hit=False)
+    digest = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()[:12]
+    with _hashes_lock:
+        _hashes[path] = (mtime, value)
+    return value
+
+
+def static_url(path: str) -> str:
+    """
+    Build the content-hashed URL of a static file, used as `static_url(...)` in the templates.
+
+    Args:
+        path (str): The path of the file relative to the static directory, e.g. "assets/Logo-Quagga.svg"
+
+    Returns:
+        str: e.g. "/templates/assets/Logo-Quagga.0123456789ab.svg"
+    """
+    root, extension = os.path.splitext(path)
+    try:
+        return f"{STATIC_URL_PREFIX}/{root}.{file_hash(path)}{extension}"
+    except OSError:
+        logging.warning(f"Static file {path} not found, linking it without fingerprint")
+        return f"{STATIC_URL_PREFIX}/{path}"
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that also serve the content-hashed URLs of static_url with immutable caching.
+
+    A fingerprint that does not match the current content (e.g. a page rendered before a
+    deployment) still serves the current file, but without the immutable caching.
+    """
+
+    def get_path(self, scope: Scope) -> str:
+        path = super().get_path(scope)
+        match = _FINGERPRINT.search(path)
+        if match:
+            path = path[: match.start()] + match.group(2)
+        scope["static_fingerprint"] = match.group(1) if match else None
+        return path
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            fingerprint = scope.get("static_fingerprint")
+            try:
+                current = fingerprint is not None and file_hash(path) == fingerprint
+            except OSError:
+                current = False
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if current else REVALIDATE_CACHE_CONTROL
+        return response
@@ -0,0 +1,552 @@
+// For Matomo analytics
+var _paq = window._paq = window._paq || [];
+/* tracker methods like "setCustomDimension" should be called before
+"trackPageView" */
+_paq.push(['setDocumentTitle', 'Quagga Contribute']);
+_paq.push(['trackPageView']);
+_paq.push(['enableLinkTracking']);
+(function() {
+    var u="https://analytics.operas-eu.org/";
+    _paq.push(['setTrackerUrl', u+'matomo.php']);
+    _paq.push(['setSiteId', '13']);
+    var d=document, g=d.createElement('script'),
+s=d.getElementsByTagName('script')[0];
+    g.async=true; g.src=u+'matomo.js'; s.parentNode.insertBefore(g,s);
+})();
+
+// Mobile menu toggle functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileToggle = document.querySelector('.mobile-menu-toggle');
+    const navMenu = document.querySelector('.nav-menu');
+
+    if (mobileToggle && navMenu) {
+        mobileToggle.addEventListener('click', function() {
+            navMenu.classList.toggle('mobile-open');
+        });
+
+        const navLinks = navMenu.querySelectorAll('.nav-link');
+        navLinks.forEach(link => {
+            link.addEventListener('click', function() {
+                // Only apply animation if mobile menu is actually open
+                if (navMenu.classList.contains('mobile-open')) {
+                    navMenu.style.animation = 'slideUp 0.2s ease-out';
+                    setTimeout(() => {
+                        navMenu.classList.remove('mobile-open');
+                        navMenu.style.animation = '';
+                    }, 200);
+                }
+            });
+        });
+
+        // Close mobile menu when clicking outside
+        document.addEventListener('click', function(event) {
+            if (navMenu.classList.contains('mobile-open') && !navMenu.contains(event.target) && !mobileToggle.contains(event.target)) {
+                navMenu.style.animation = 'slideUp 0.2s ease-out';
+                setTimeout(() => {
+                    navMenu.classList.remove('mobile-open');
+                    navMenu.style.animation = '';
+                }, 200);
+            }
+        });
+    }
+});
+
+function handleEndpointChange() {
+    const select = document.getElementById('kg_endpoint');
+    const customForm = document.getElementById('custom-endpoint-form');
+    const customName = document.getElementById('custom_name');
+    const customDescription = document.getElementById('custom_description');
+    const customEndpoint = document.getElementById('custom_endpoint');
+    const customAboutPage = document.getElementById('custom_about_page');
+
+    if (select.value === 'custom') {
+        // Show custom form
+        customForm.style.display = 'block';
+
+        // Make custom fields required
+        customName.required = true;
+        customDescription.required = true;
+        customEndpoint.required = true;
+        customAboutPage.required = true;
+
+        // Clear any previous values
+        customName.value = '';
+        customDescription.value = '';
+        customEndpoint.value = '';
+        customAboutPage.value = '';
+    } else {
+        // Hide custom form
+        customForm.style.display = 'none';
+
+        // Remove required attribute from custom fields
+        customName.required = false;
+        customDescription.required = false;
+        customEndpoint.required = false;
+        customAboutPage.required = false;
+    }
+}
+
+
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Function to set up form handling
+    function setupFormHandler(formId) {
+        const form = document.getElementById(formId);
+
+        // If the form doesn't exist on this page, just return
+        if (!form) return;
+
+        // Create a message container if it doesn't exist
+        let messageContainer = form.querySelector('.response-message');
+        if (!messageContainer) {
+            messageContainer = document.createElement('div');
+            messageContainer.className = 'response-message';
+            messageContainer.style.display = 'none';
+            form.appendChild(messageContainer);
+        }
+
+        form.addEventListener('submit', async function(e) {
+            e.preventDefault();
+
+            // Show loading state
+            const submitButton = form.querySelector('button[type="submit"]');
+            const originalButtonText = submitButton.textContent;
+            submitButton.textContent = 'Submitting...';
+            submitButton.disabled = true;
+
+            try {
+                const select = document.getElementById('kg_endpoint');
+                const formData = new FormData(form);
+
+                if (select && select.value === 'custom') {
+                    const customName = document.getElementById('custom_name').value;
+                    const customDescription = document.getElementById('custom_description').value;
+                    const customEndpoint = document.getElementById('custom_endpoint').value;
+                    const customAboutPage = document.getElementById('custom_about_page').value;
+                    const customDomains = document.getElementById('custom_disciplines').value.split(',').filter(d => d.trim() !== '');
+
+                    formData.set('kg_endpoint', customEndpoint);
+                    formData.set('kg_name', customName);
+                    formData.set('kg_description', customDescription);
+                    formData.set('kg_about_page', customAboutPage);
+                    formData.set('domains', customDomains);
+
+                }
+
+                const response = await fetch(form.action, {
+                    method: 'POST',
+                    body: formData
+                });
+
+                // Check if response is ok before trying to parse JSON
+                if (!response.ok) {
+                    const errorData = await response.json();
+                    throw new Error(errorData.message || `HTTP error status: ${response.status}`);
+                }
+
+                const result = await response.json();
+
+                // Display message
+                messageContainer.textContent = result.message || 'Operation completed successfully';
+                messageContainer.className = 'response-message';
+                messageContainer.classList.add(result.status === 'success' ? 'success-message' : 'error-message');
+                messageContainer.style.display = 'block';
+
+                // If successful, optionally clear the form
+                if (result.status === 'success') {
+                    // Capture possible custom endpoint details before resetting
+                    const kgName = formData.get('kg_name');
+                    const kgDescription = formData.get('kg_description');
+                    const kgEndpoint = formData.get('kg_endpoint');
+                    const kgAboutPage = formData.get('kg_about_page');
+
+                    form.reset(); // clear all inputs
+                    document.getElementById('custom-endpoint-form').style.display = 'none';
+
+                    // If this submission included a custom endpoint, add it to the dropdown
+                    if (kgName && kgDescription && kgEndpoint && kgAboutPage) {
+                        const selectEl = document.getElementById('kg_endpoint');
+
+                        // Avoid adding duplicates
+                        if (!selectEl.querySelector(`option[value="${kgEndpoint}"]`)) {
+                            const option = document.createElement('option');
+                            option.value = kgEndpoint;
+                            option.dataset.name = kgName;
+                            option.dataset.description = kgDescription;
+                            option.dataset.aboutPage = kgAboutPage;
+                            option.textContent = `${kgName} - ${kgDescription} - ${kgEndpoint}`;
+
+                            // Insert the new option right before the "custom" option for visibility
+                            const customOpt = selectEl.querySelector('option[value="custom"]');
+                            selectEl.insertBefore(option, customOpt);
+                        }
+
+                        // Automatically select the newly added endpoint
+                        selectEl.value = kgEndpoint;
+                    }
+                }
+            } catch (error) {
+                // Handle fetch errors
+                messageContainer.textContent = `Error: ${error.message || 'Could not submit the form'}`;
+                messageContainer.className = 'response-message error-message';
+                messageContainer.style.display = 'block';
+            } finally {
+                // Restore button state
+                submitButton.textContent = originalButtonText;
+                submitButton.disabled = false;
+
+                // Scroll to message
+                messageContainer.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+
+                // Set timeout to hide message after 30 seconds
+                setTimeout(() => {
+                    // Add fade-out animation class
+                    messageContainer.classList.add('fade-out');
+
+                    // After animation completes, hide the element
+                    setTimeout(() => {
+                        messageContainer.style.display = 'none';
+                        messageContainer.classList.remove('fade-out');
+                    }, 500); // 500ms for fade-out animation
+                }, 30000); //
+            }
+        });
+    }
+
+    // Set up the form
+    setupFormHandler('queryForm');
+    // Add discipline pill selection functionality
+    const disciplinePills = document.querySelectorAll('.discipline-pill');
+    const disciplineHiddenInput = document.getElementById('custom_disciplines');
+
+    if (disciplinePills.length > 0) {
+        disciplinePills.forEach(pill => {
+            pill.addEventListener('click', function() {
+                const value = this.getAttribute('data-value');
+                const isActive = this.classList.contains('active');
+
+                if (isActive) {
+                    // Deselect the pill
+                    this.classList.remove('active');
+                } else {
+                    // Check if we can select more (max 3)
+                    const activePills = document.querySelectorAll('.discipline-pill.active');
+                    if (activePills.length >= 3) {
+                        alert('You can select up to 3 disciplines.');
+                        return;
+                    }
+                    // Select the pill
+                    this.classList.add('active');
+                }
+
+                // Update hidden input with selected values
+                const selectedValues = Array.from(document.querySelectorAll('.discipline-pill.active'))
+                    .map(p => p.getAttribute('data-value'));
+                disciplineHiddenInput.value = selectedValues.join(',');
+            });
+        });
+    }
+
+    // Add word counter and validation for description field
+    const descriptionInput = document.getElementById('custom_description');
+    const descriptionCounter = document.getElementById('description-counter');
+
+    if (descriptionInput && descriptionCounter) {
+        descriptionInput.addEventListener('input', function() {
+            const words = this.value.trim().split(/\s+/).filter(word => word.length > 0);
+            const currentWordCount = this.value.trim() === '' ? 0 : words.length;
+            const maxWords = 100;
+
+            // Update counter
+            descriptionCounter.textContent = `${currentWordCount}/${maxWords} words`;
+
+            // Change counter color based on word count
+            if (currentWordCount >= maxWords) {
+                descriptionCounter.style.color = '#e74c3c'; // Red when at limit
+                descriptionCounter.textContent = `${currentWordCount}/${maxWords} words (limit reached)`;
+            } else if (currentWordCount >= 80) {
+                descriptionCounter.style.color = '#f39c12'; // Orange when approaching limit
+            } else {
+                descriptionCounter.style.color = '#7f8c8d'; // Default gray
+            }
+        });
+
+        // Prevent typing beyond limit and show message
+        descriptionInput.addEventListener('keypress', function(e) {
+            const words = this.value.trim().split(/\s+/).filter(word => word.length > 0);
+            const currentWordCount = this.value.trim() === '' ? 0 : words.length;
+
+            if (currentWordCount >= 100 && e.key !== 'Backspace' && e.key !== 'Delete' && e.key !== ' ') {
+                e.preventDefault();
+
+                // Show temporary message
+                const originalText = descriptionCounter.textContent;
+                descriptionCounter.textContent = 'Maximum 100 words allowed!';
+                descriptionCounter.style.color = '#e74c3c';
+
+                setTimeout(() => {
+                    descriptionCounter.textContent = originalText;
+                }, 2000);
+            }
+        });
+    }
+});
+
+
+// Endpoint validation functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const validateBtn = document.getElementById('validate-endpoint-btn');
+    const endpointInput = document.getElementById('custom_endpoint');
+    const validationStatus = document.getElementById('validation-status');
+    const isDumpCheckbox = document.getElementById('is_dump_url');
+
+    if (validateBtn && endpointInput && validationStatus && isDumpCheckbox) {
+        validateBtn.addEventListener('click', async function() {
+            const endpointUrl = endpointInput.value.trim();
+            const isDumpUrl = isDumpCheckbox.checked;
+
+            // Check if URL is provided
+            if (!endpointUrl) {
+                showValidationStatus('error', 'Please enter an endpoint URL first');
+                return;
+            }
+
+            // Show loading state with appropriate message
+            const loadingMessage = isDumpUrl ? 'Validating data dump URL...' : 'Validating SPARQL endpoint...';
+            showValidationStatus('loading', loadingMessage);
+            validateBtn.disabled = true;
+            validateBtn.textContent = 'Validating...';
+
+            try {
+                const formData = new FormData();
+                formData.append('endpoint_url', endpointUrl);
+                formData.append('is_dump_url', isDumpUrl);
+
+                const response = await fetch('/validate_endpoint', {
+                    method: 'POST',
+                    body: formData
+                });
+
+                const result = await response.json();
+
+                if (result.status === 'success') {
+                    showValidationStatus('success', result.message);
+                } else {
+                    showValidationStatus('error', result.message);
+                }
+
+            } catch (error) {
+                showValidationStatus('error', 'Network error: Could not validate endpoint');
+            } finally {
+                // Restore button state
+                validateBtn.disabled = false;
+                validateBtn.innerHTML = 'Validate KG';
+            }
+        });
+
+        function showValidationStatus(type, message) {
+            validationStatus.className = `validation-status ${type}`;
+            validationStatus.style.display = 'flex';
+
+            let icon = '';
+            switch(type) {
+                case 'success':
+                    icon = '✅ ';
+                    break;
+                case 'error':
+                    icon = '❌ ';
+                    break;
+                case 'loading':
+                    icon = '⏳ ';
+                    break;
+            }
+
+            validationStatus.innerHTML = `<span class="validation-icon">${icon} </span> ${message}`;
+
+            // Auto-hide after 20 seconds for success/error (not loading)
+            if (type !== 'loading') {
+                setTimeout(() => {
+                    validationStatus.style.display = 'none';
+                }, 30000);
+            }
+        }
+
+        // Clear validation status when endpoint URL or checkbox changes
+        endpointInput.addEventListener('input', function() {
+            validationStatus.style.display = 'none';
+        });
+
+        isDumpCheckbox.addEventListener('change', function() {
+            validationStatus.style.display = 'none';
+        });
+    }
+});
+
+
+document.addEventListener('DOMContentLoaded', function() {
+    const validateQueryBtn = document.getElementById('validate-query-btn');
+    const queryTextarea = document.getElementById('sparql_query');
+    const queryStatus = document.getElementById('query-validation-status');
+
+    if (validateQueryBtn && queryTextarea && queryStatus) {
+        validateQueryBtn.addEventListener('click', async function() {
+            const sparqlQuery = queryTextarea.value.trim();
+
+            if (!sparqlQuery) {
+                showQueryStatus('error', 'Please enter a SPARQL query first');
+                return;
+            }
+
+            showQueryStatus('loading', 'Validating query...');
+            validateQueryBtn.disabled = true;
+            validateQueryBtn.textContent = 'Validating...';
+
+            try {
+                const formData = new FormData();
+                formData.append('sparql_query', sparqlQuery);
+
+                // Determine endpoint URL (selected or custom)
+                const kgSelect = document.getElementById('kg_endpoint');
+                let endpointUrl = '';
+                if (kgSelect) {
+                    if (kgSelect.value === 'custom') {
+                        endpointUrl = document.getElementById('custom_endpoint').value.trim();
+                    } else {
+                        endpointUrl = kgSelect.value;
+                    }
+                }
+
+                if (!endpointUrl) {
+                    showQueryStatus('error', 'Please select or enter a knowledge graph endpoint');
+                    validateQueryBtn.disabled = false;
+                    validateQueryBtn.innerHTML = 'Validate SPARQL';
+                    return;
+                }
+
+                // Data dumps are loaded and queried locally on the server, only once they are registered
+                const isDumpCheckbox = document.getElementById('is_dump_url');
+                if (kgSelect && kgSelect.value === 'custom' && isDumpCheckbox && isDumpCheckbox.checked) {
+                    showQueryStatus('error', 'Queries against a new data dump can be validated once it is submitted');
+                    validateQueryBtn.disabled = false;
+                    validateQueryBtn.innerHTML = 'Validate SPARQL';
+                    return;
+                }
+
+                formData.append('endpoint_url', endpointUrl);
+
+                const response = await fetch('/validate_query', {
+                    method: 'POST',
+                    body: formData
+                });
+
+                let result = await response.json();
+
+                // Execution runs in the background, follow the job until it finishes
+                if (result.status === 'queued') {
+                    showQueryStatus('loading', result.warning || 'Query queued for validation...');
+                    result = await waitForValidationJob(result);
+                }
+
+                if (result.status === 'success') {
+                    showQueryStatus('success', result.message);
+                } else {
+                    showQueryStatus('error', result.message);
+                }
+            } catch (error) {
+                showQueryStatus('error', 'Network error: Could not validate query');
+            } finally {
+                validateQueryBtn.disabled = false;
+                validateQueryBtn.innerHTML = 'Validate SPARQL';
+            }
+        });
+
+        function waitForValidationJob(job) {
+            return new Promise((resolve, reject) => {
+                if (!window.EventSource) {
+                    pollValidationJob(job.status_url).then(resolve, reject);
+                    return;
+                }
+
+                const source = new EventSource(job.events_url);
+                source.addEventListener('progress', function(event) {
+                    const data = JSON.parse(event.data);
+                    showQueryStatus('loading', data.progress || 'Validating query...');
+                });
+                source.addEventListener('result', function(event) {
+                    source.close();
+                    resolve(JSON.parse(event.data).result);
+                });
+                source.onerror = function() {
+                    // Fall back to polling when the stream is interrupted
+                    source.close();
+                    pollValidationJob(job.status_url).then(resolve, reject);
+                };
+            });
+        }
+
+        async function pollValidationJob(statusUrl) {
+            while (true) {
+                const response = await fetch(statusUrl);
+                const data = await response.json();
+                if (!response.ok) {
+                    return {status: 'error', message: data.detail || 'Could not follow the validation'};
+                }
+                if (data.state === 'finished') {
+                    return data.result;
+                }
+                showQueryStatus('loading', data.progress || 'Validating query...');
+                await new Promise(r => setTimeout(r, 2000));
+            }
+        }
+
+        function showQueryStatus(type, message) {
+            queryStatus.className = `validation-status ${type}`;
+            queryStatus.style.display = 'flex';
+
+            let icon = '';
+            switch (type) {
+                case 'success':
+                    icon = '✅ ';
+                    break;
+                case 'error':
+                    icon = '❌ ';
+                    break;
+                case 'loading':
+                    icon = '⏳ ';
+                    break;
+            }
+
+            queryStatus.innerHTML = `<span class="validation-icon">${icon} </span> ${message}`;
+
+            if (type !== 'loading') {
+                setTimeout(() => {
+                    queryStatus.style.display = 'none';
+                }, 30000);
+            }
+        }
+
+        // Hide status when user edits the query
+        queryTextarea.addEventListener('input', function() {
+            queryStatus.style.display = 'none';
+        });
+    }
+});
+
+
+function openTab(tabId) {
+    // hide all tab contents
+    const tabContents = document.getElementsByClassName("tab-content");
+    for (let i = 0; i < tabContents.length; i++) {
+        tabContents[i].classList.remove("active");
+    }
+
+    // deactivate all tab buttons
+    const tabButtons = document.getElementsByClassName("tab-btn");
+    for (let i = 0; i < tabButtons.length; i++) {
+        tabButtons[i].classList.remove("active");
+    }
+
+    // activate the button
+    document.getElementById(tabId).classList.add("active");
+    event.currentTarget.classList.add("active");
+}
@@ -0,0 +1,54 @@
+// For Matomo analytics
+var _paq = window._paq = window._paq || [];
+/* tracker methods like "setCustomDimension" should be called before
+"trackPageView" */
+_paq.push(['setDocumentTitle', 'Quagga Home']);
+_paq.push(['trackPageView']);
+_paq.push(['enableLinkTracking']);
+(function() {
+    var u="https://analytics.operas-eu.org/";
+    _paq.push(['setTrackerUrl', u+'matomo.php']);
+    _paq.push(['setSiteId', '13']);
+    var d=document, g=d.createElement('script'),
+s=d.getElementsByTagName('script')[0];
+    g.async=true; g.src=u+'matomo.js'; s.parentNode.insertBefore(g,s);
+})();
+
+// Mobile menu toggle functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileToggle = document.querySelector('.mobile-menu-toggle');
+    const navMenu = document.querySelector('.nav-menu');
+
+    if (mobileToggle && navMenu) {
+        mobileToggle.addEventListener('click', function() {
+            navMenu.classList.toggle('mobile-open');
+        });
+
+        // Close mobile menu when clicking on a link
+        const navLinks = navMenu.querySelectorAll('.nav-link');
+        navLinks.forEach(link => {
+            link.addEventListener('click', function() {
+                // Only apply animation if mobile menu is actually open
+                if (navMenu.classList.contains('mobile-open')) {
+                    navMenu.style.animation = 'slideUp 0.2s ease-out';
+                    setTimeout(() => {
+                        navMenu.classList.remove('mobile-open');
+                        navMenu.style.animation = '';
+                    }, 200);
+                }
+            });
+        });
+
+
+        // Close mobile menu when clicking outside
+        document.addEventListener('click', function(event) {
+            if (navMenu.classList.contains('mobile-open') && !navMenu.contains(event.target) && !mobileToggle.contains(event.target)) {
+                navMenu.style.animation = 'slideUp 0.2s ease-out';
+                setTimeout(() => {
+                    navMenu.classList.remove('mobile-open');
+                    navMenu.style.animation = '';
+                }, 200);
+            }
+        });
+    }
+});
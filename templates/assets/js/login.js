@@ -0,0 +1,30 @@
+// For Matomo analytics
+var _paq = window._paq = window._paq || [];
+/* tracker methods like "setCustomDimension" should be called before
+"trackPageView" */
+_paq.push(['setDocumentTitle', 'Quagga Login']);
+_paq.push(['trackPageView']);
+_paq.push(['enableLinkTracking']);
+(function() {
+    var u="https://analytics.operas-eu.org/";
+    _paq.push(['setTrackerUrl', u+'matomo.php']);
+    _paq.push(['setSiteId', '13']);
+    var d=document, g=d.createElement('script'),
+s=d.getElementsByTagName('script')[0];
+    g.async=true; g.src=u+'matomo.js'; s.parentNode.insertBefore(g,s);
+})();
+
+// Auto-hide the logout message after 5 seconds
+document.addEventListener('DOMContentLoaded', function() {
+    const message = document.getElementById('logoutMessage');
+    if (message) {
+        setTimeout(function() {
+            message.style.opacity = '0';
+            message.style.transition = 'opacity 0.5s ease-out';
+
+            setTimeout(function() {
+                message.style.display = 'none';
+            }, 500);
+        }, 5000);
+    }
+});
@@ -0,0 +1,192 @@
+// For Matomo analytics
+var _paq = window._paq = window._paq || [];
+/* tracker methods like "setCustomDimension" should be called before
+"trackPageView" */
+_paq.push(['setDocumentTitle', 'Quagga Modify Form']);
+_paq.push(['trackPageView']);
+_paq.push(['enableLinkTracking']);
+(function() {
+    var u="https://analytics.operas-eu.org/";
+    _paq.push(['setTrackerUrl', u+'matomo.php']);
+    _paq.push(['setSiteId', '13']);
+    var d=document, g=d.createElement('script'),
+s=d.getElementsByTagName('script')[0];
+    g.async=true; g.src=u+'matomo.js'; s.parentNode.insertBefore(g,s);
+})();
+
+// Mobile menu toggle functionality
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileToggle = document.querySelector('.mobile-menu-toggle');
+    const navMenu = document.querySelector('.nav-menu');
+
+    if (mobileToggle && navMenu) {
+        mobileToggle.addEventListener('click', function() {
+            navMenu.classList.toggle('mobile-open');
+        });
+
+        const navLinks = navMenu.querySelectorAll('.nav-link');
+        navLinks.forEach(link => {
+            link.addEventListener('click', function() {
+                // Only apply animation if mobile menu is actually open
+                if (navMenu.classList.contains('mobile-open')) {
+                    navMenu.style.animation = 'slideUp 0.2s ease-out';
+                    setTimeout(() => {
+                        navMenu.classList.remove('mobile-open');
+                        navMenu.style.animation = '';
+                    }, 200);
+                }
+            });
+        });
+
+
+
+        // Close mobile menu when clicking outside
+        document.addEventListener('click', function(event) {
+            if (navMenu.classList.contains('mobile-open') && !navMenu.contains(event.target) && !mobileToggle.contains(event.target)) {
+                navMenu.style.animation = 'slideUp 0.2s ease-out';
+                setTimeout(() => {
+                    navMenu.classList.remove('mobile-open');
+                    navMenu.style.animation = '';
+                }, 200);
+            }
+        });
+    }
+});
+
+let messageTimeout;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Setup AJAX form handler
+    function setupFormHandler(formId) {
+        const form = document.getElementById(formId);
+
+        // If the form doesn't exist on this page, just return
+        if (!form) return;
+
+        // Get or create a message container
+        let messageContainer = form.querySelector('.response-message');
+        if (!messageContainer) {
+            messageContainer = document.createElement('div');
+            messageContainer.className = 'response-message';
+            messageContainer.style.display = 'none';
+            form.appendChild(messageContainer);
+        }
+
+        form.addEventListener('submit', async function(e) {
+            e.preventDefault();
+
+            // Clear any existing timeout
+            if (messageTimeout) {
+                clearTimeout(messageTimeout);
+            }
+
+            // Validate form before submission
+            const nlQuestion = document.getElementById('nl_question').value.trim();
+            if (!nlQuestion) {
+                messageContainer.textContent = 'Please enter a natural language question.';
+                messageContainer.className = 'response-message error-message';
+                messageContainer.style.display = 'block';
+                document.getElementById('nl_question').focus();
+                return false;
+            }
+
+            // Show loading state
+            const submitButton = form.querySelector('button[type="submit"]');
+            const originalButtonText = submitButton.textContent;
+            submitButton.textContent = 'Submitting...';
+            submitButton.disabled = true;
+
+            try {
+                const formData = new FormData(form);
+                console.log('Form data being sent:', Object.fromEntries(formData));
+
+                const response = await fetch(form.action, {
+                    method: 'POST',
+                    body: formData
+                });
+
+                console.log('Response status:', response.status);
+
+                let result;
+                try {
+                    result = await response.json();
+                } catch (parseError) {
+                    console.error('Error parsing JSON response:', parseError);
+                    messageContainer.textContent = 'Error: Invalid response from server';
+                    messageContainer.className = 'response-message error-message';
+                    messageContainer.style.display = 'block';
+                    return;
+                }
+
+                // Display message
+                let messageText = 'Operation completed';
+                let isSuccess = false;
+
+                if (result.status === 'success') {
+                    messageText = result.message || 'Operation completed successfully';
+                    isSuccess = true;
+                } else if (result.detail) {
+                    // Handle FastAPI validation errors
+                    messageText = Array.isArray(result.detail) ? result.detail[0].msg : result.detail;
+                    isSuccess = false;
+                } else if (result.message) {
+                    messageText = result.message;
+                    isSuccess = false;
+                } else {
+                    messageText = 'An error occurred';
+                    isSuccess = false;
+                }
+
+                messageContainer.textContent = messageText;
+                messageContainer.className = 'response-message';
+                messageContainer.classList.add(isSuccess ? 'success-message' : 'error-message');
+                messageContainer.style.display = 'block';
+
+                // Log the response for debugging
+                console.log('Response:', result);
+                console.log('Status:', result.status);
+                console.log('Is success?', result.status === 'success');
+                console.log('Message class:', result.status === 'success' ? 'success-message' : 'error-message');
+
+                // If successful, you might want to redirect or show success state
+                if (result.status === 'success') {
+                    // Optionally redirect after a delay
+                    setTimeout(() => {
+                        if (result.redirect) {
+                            window.location.href = result.redirect;
+                        }
+                    }, 2000);
+                }
+
+            } catch (error) {
+                console.error('Form submission error:', error);
+                // Handle fetch errors
+                messageContainer.textContent = 'Network error: Could not submit the form. Please try again.';
+                messageContainer.className = 'response-message error-message';
+                messageContainer.style.display = 'block';
+            } finally {
+                // Restore button state
+                submitButton.textContent = originalButtonText;
+                submitButton.disabled = false;
+
+                // Scroll to message
+                messageContainer.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+
+                // Set timeout to hide message after 15 seconds
+                messageTimeout = setTimeout(() => {
+                    // Add fade-out animation class
+                    messageContainer.classList.add('fade-out');
+
+                    // After animation completes, hide the element
+                    setTimeout(() => {
+                        messageContainer.style.display = 'none';
+                        messageContainer.classList.remove('fade-out');
+                    }, 500); // 500ms for fade-out animation
+                }, 15000); // 15 seconds
+            }
+        });
+    }
+
+    // Set up the form handler
+    setupFormHandler('modifySubmissionForm');
+});
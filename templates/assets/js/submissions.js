@@ -0,0 +1,180 @@
+// For Matomo analytics
+var _paq = window._paq = window._paq || [];
+/* tracker methods like "setCustomDimension" should be called before
+"trackPageView" */
+_paq.push(['setDocumentTitle', 'Quagga Browse']);
+_paq.push(['trackPageView']);
+_paq.push(['enableLinkTracking']);
+(function() {
+    var u="https://analytics.operas-eu.org/";
+    _paq.push(['setTrackerUrl', u+'matomo.php']);
+    _paq.push(['setSiteId', '13']);
+    var d=document, g=d.createElement('script'),
+s=d.getElementsByTagName('script')[0];
+    g.async=true; g.src=u+'matomo.js'; s.parentNode.insertBefore(g,s);
+})();
+
+
+// The filters are applied server-side: each one reloads the page with its query parameters
+function navigateWithParams(update) {
+    const currentUrl = new URL(window.location);
+    update(currentUrl.searchParams);
+    currentUrl.searchParams.delete('page');
+    window.location.href = currentUrl.toString();
+}
+
+function toggleUserFilter() {
+    const isActive = document.getElementById('userToggle').classList.contains('active');
+    navigateWithParams(params => isActive ? params.delete('mine') : params.set('mine', 'true'));
+}
+
+function searchSubmissions(form) {
+    const q = form.elements['q'].value.trim();
+    navigateWithParams(params => q ? params.set('q', q) : params.delete('q'));
+    return false;
+}
+
+function toggleKGContributionFilter() {
+    const toggle = document.getElementById('kgContributionToggle');
+    const isActive = toggle.classList.contains('active');
+
+    // Build new URL with or without my_contributions parameter
+    const currentUrl = new URL(window.location);
+    if (isActive) {
+        // Remove the parameter
+        currentUrl.searchParams.delete('my_contributions');
+    } else {
+        // Add the parameter
+        currentUrl.searchParams.set('my_contributions', 'true');
+    }
+
+    // Navigate to the new URL
+    window.location.href = currentUrl.toString();
+}
+
+function filterByType(type) {
+    navigateWithParams(params => type === 'all' ? params.delete('type') : params.set('type', type));
+}
+
+function copyQuery(queryId, button) {
+    const queryElement = document.getElementById(queryId);
+    const text = queryElement.textContent;
+
+    navigator.clipboard.writeText(text).then(() => {
+        showCopySuccess(button);
+    }).catch(err => {
+        showCopyError(button);
+    });
+}
+
+function showCopySuccess(button) {
+    const originalText = button.querySelector('.copy-text').textContent;
+    button.classList.add('copied');
+    button.querySelector('.copy-text').textContent = 'Copied!';
+
+    setTimeout(() => {
+        button.classList.remove('copied');
+        button.querySelector('.copy-text').textContent = originalText;
+    }, 2000);
+}
+
+function showCopyError(button) {
+    const originalText = button.querySelector('.copy-text').textContent;
+    button.querySelector('.copy-text').textContent = 'Failed';
+
+    setTimeout(() => {
+        button.querySelector('.copy-text').textContent = originalText;
+    }, 2000);
+}
+
+function openEditor(queryId, endpoint) {
+    const queryElement = document.getElementById(queryId);
+    if (!queryElement) {
+        // No query element found – just open endpoint in generic editor (YASGUI)
+        const yasguiUrl = 'https://yasgui.triply.cc/#endpoint=' + encodeURIComponent(endpoint);
+        window.open(yasguiUrl, '_blank');
+        return false; // prevent default navigation handled here
+    }
+
+    const queryText = queryElement.textContent;
+
+    // Copy the query to the clipboard (best-effort)
+    navigator.clipboard.writeText(queryText).catch(() => {/* ignore clipboard errors */});
+
+    // Open YASGUI with query + endpoint pre-filled so user sees the query in the editor.
+    const yasguiUrl = 'https://yasgui.triply.cc/#endpoint=' + encodeURIComponent(endpoint) + '&query=' + encodeURIComponent(queryText);
+    window.open(yasguiUrl, '_blank');
+    return false; // prevent the original <a> default
+}
+
+// Domain filtering functionality
+function setDomainFilter(domainCodes) {
+    navigateWithParams(params => {
+        params.delete('domain');
+        domainCodes.forEach(code => params.append('domain', code));
+    });
+}
+
+function selectedDomains() {
+    return Array.from(document.querySelectorAll('.domain-pill-btn.active')).map(button => button.getAttribute('data-value'));
+}
+
+function toggleDomainFilter(domainCode) {
+    const button = document.getElementById(`domain-${domainCode}`);
+    // Don't allow toggling if the button is frozen (has zero count)
+    if (button.classList.contains('frozen')) {
+        return;
+    }
+    const domains = selectedDomains().filter(code => code !== domainCode);
+    if (!button.classList.contains('active')) {
+        domains.push(domainCode);
+    }
+    setDomainFilter(domains);
+}
+
+function selectAllDomains() {
+    // Skip frozen buttons (those with zero count)
+    const pillButtons = document.querySelectorAll('.domain-pill-btn:not(.frozen)');
+    setDomainFilter(Array.from(pillButtons).map(button => button.getAttribute('data-value')));
+}
+
+function clearAllDomains() {
+    setDomainFilter([]);
+}
+
+// Mobile menu toggle functionality for browse page
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileToggle = document.querySelector('.mobile-menu-toggle');
+    const navMenu = document.querySelector('.nav-menu');
+
+    if (mobileToggle && navMenu) {
+        mobileToggle.addEventListener('click', function() {
+            navMenu.classList.toggle('mobile-open');
+        });
+
+        const navLinks = navMenu.querySelectorAll('.nav-link');
+        navLinks.forEach(link => {
+            link.addEventListener('click', function() {
+                // Only apply animation if mobile menu is actually open
+                if (navMenu.classList.contains('mobile-open')) {
+                    navMenu.style.animation = 'slideUp 0.2s ease-out';
+                    setTimeout(() => {
+                        navMenu.classList.remove('mobile-open');
+                        navMenu.style.animation = '';
+                    }, 200);
+                }
+            });
+        });
+
+        // Close mobile menu when clicking outside
+        document.addEventListener('click', function(event) {
+            if (navMenu.classList.contains('mobile-open') && !navMenu.contains(event.target) && !mobileToggle.contains(event.target)) {
+                navMenu.style.animation = 'slideUp 0.2s ease-out';
+                setTimeout(() => {
+                    navMenu.classList.remove('mobile-open');
+                    navMenu.style.animation = '';
+                }, 200);
+            }
+        });
+    }
+});
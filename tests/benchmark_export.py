@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exporters
+
+
+def synthetic_submissions(n_rows: int):
+    """Generate submissions shaped like real ones, with characters that need escaping."""
+    for i in range(1, n_rows + 1):
+        yield {
+            "id": i,
+            "kg_endpoint": f"https://kg{i % 20}.example.org/sparql",
+            "nl_question": f'Which "works" were written by author {i}?\nInclude C:\\paths',
+            "sparql_query": (
+                "PREFIX dc: <http://purl.org/dc/terms/>\n"
+                f'SELECT ?work WHERE {{ ?work dc:creator ?a . ?a dc:name "author {i}" }} LIMIT 10'
+                if i % 3
+                else None
+            ),
+            "username": f"user{i % 500}@example.org",
+            "source": f"https://source.example.org/{i}" if i % 5 == 0 else None,
+        }
+
+
+def benchmark(export_format: str, n_rows: int, from_db: bool) -> dict:
+    if from_db:
+        import database
+
+        submissions = database.iter_submissions()
+    else:
+        submissions = synthetic_submissions(n_rows)
+
+    started = time.perf_counter()
+    n_bytes = 0
+    for chunk in exporters.export_submissions(submissions, export_format):
+        n_bytes += len(chunk.encode("utf-8"))
+    elapsed = time.perf_counter() - started
+    return {"format": export_format, "seconds": elapsed, "rows_per_second": n_rows / elapsed, "mb": n_bytes / 1024**2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of the /export serializers.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of synthetic submissions")
+    parser.add_argument("--format", action="append", choices=list(exporters.EXPORT_FORMATS), help="Format to benchmark (repeatable, default: all)")
+    parser.add_argument("--from-db", action="store_true", help="Stream the submissions of the configured database instead (--rows must match its size)")
+    args = parser.parse_args()
+
+    print(f"{'format':<10}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'MB':>10}")
+    for export_format in args.format or exporters.EXPORT_FORMATS:
+        result = benchmark(export_format, args.rows, args.from_db)
+        print(
+            f"{result['format']:<10}{args.rows:>10}{result['seconds']:>10.2f}"
+            f"{result['rows_per_second']:>12,.0f}{result['mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
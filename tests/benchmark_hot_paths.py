@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import platform
+import statistics
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("RUN_MODE", "RENDER")
+
+import const
+import database
+import exporters
+import generate_dataset
+import helper_methods
+import main as app_main
+
+BASELINE_PATH = os.path.join(ROOT, "tests", "benchmark_baselines.json")
+# The synthetic databases are kept between runs, as the 1M one takes a while to build
+DATASET_DIR = os.getenv("BENCHMARK_DATASET_DIR", "/var/tmp")
+N_KGS = 40
+N_USERS = 500
+# Runs shorter than this repeat the function, to time sub-millisecond functions reliably
+MIN_RUN_MS = 50
+
+# Queries shaped like the ones submitted for the public knowledge graphs
+QUERY_CORPUS = (
+    """PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX wikibase: <http://wikiba.se/ontology#>
+PREFIX bd: <http://www.bigdata.com/rdf#>
+SELECT ?painting ?paintingLabel ?year WHERE {
+  ?painting wdt:P31 wd:Q3305213 ; wdt:P170 wd:Q5582 .
+  OPTIONAL { ?painting wdt:P571 ?date . BIND(YEAR(?date) AS ?year) }
+  SERVICE wikibase:label { bd:serviceParam wikibase:language "en". }
+} ORDER BY ?year LIMIT 100""",
+    """PREFIX dbo: <http://dbpedia.org/ontology/>
+PREFIX dbr: <http://dbpedia.org/resource/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+SELECT ?city ?population WHERE {
+  ?city a dbo:City ; dbo:country dbr:Switzerland ; dbo:populationTotal ?population .
+  FILTER (?population > 100000)
+} ORDER BY DESC(?population)""",
+    """PREFIX schema: <http://schema.org/>
+PREFIX gesis: <https://data.gesis.org/gesiskg/>
+SELECT ?dataset (COUNT(DISTINCT ?variable) AS ?n_variables) WHERE {
+  ?dataset a schema:Dataset ; schema:variableMeasured ?variable .
+  ?dataset schema:keywords ?keyword .
+  FILTER (CONTAINS(LCASE(STR(?keyword)), "migration"))
+} GROUP BY ?dataset HAVING (COUNT(DISTINCT ?variable) > 10) ORDER BY DESC(?n_variables) LIMIT 20""",
+    """PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>
+PREFIX la: <https://linked.art/ns/terms/>
+SELECT ?object ?title WHERE {
+  ?object a crm:E22_Human-Made_Object ;
+          crm:P108i_was_produced_by/crm:P14_carried_out_by ?artist ;
+          crm:P1_is_identified_by ?name .
+  ?name crm:P190_has_symbolic_content ?title .
+  VALUES ?artist { <https://lux.collections.yale.edu/data/person/1> <https://lux.collections.yale.edu/data/person/2> }
+} LIMIT 50""",
+    """PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+PREFIX dct: <http://purl.org/dc/terms/>
+SELECT ?author (SAMPLE(?name) AS ?author_name) (COUNT(?work) AS ?n_works) WHERE {
+  ?work dct:creator ?author ; dct:issued ?issued .
+  ?author foaf:name ?name .
+  FILTER (?issued >= "1900-01-01"^^<http://www.w3.org/2001/XMLSchema#date>)
+  MINUS { ?work dct:type "review" }
+} GROUP BY ?author ORDER BY DESC(?n_works) LIMIT 10""",
+    """PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+SELECT ?concept ?label WHERE {
+  ?concept skos:broader+ <http://vocab.getty.edu/aat/300264092> ;
+           skos:prefLabel ?label .
+  FILTER (LANG(?label) = "en")
+}""",
+    """PREFIX owl: <http://www.w3.org/2002/07/owl#>
+SELECT ?s ?same WHERE {
+  { SELECT ?s WHERE { ?s a owl:Thing } LIMIT 1000 }
+  ?s owl:sameAs ?same .
+  FILTER (STRSTARTS(STR(?same), "http://www.wikidata.org/"))
+}""",
+    """PREFIX dbo: <http://dbpedia.org/ontology/>
+ASK { <http://dbpedia.org/resource/Bern> dbo:country <http://dbpedia.org/resource/Switzerland> }""",
+    """PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+CONSTRUCT { ?class rdfs:label ?label } WHERE {
+  ?class a <http://www.w3.org/2002/07/owl#Class> .
+  OPTIONAL { ?class rdfs:label ?label }
+} LIMIT 500""",
+    "SELECT DISTINCT ?type WHERE { ?s a ?type } LIMIT 100",
+    # Syntax errors are validated as often as correct queries
+    "SELECT ?s WHERE { ?s ?p ?o LIMIT 10",
+    "PREFIX dbo: <http://dbpedia.org/ontology/> SELECT ?x WHERE { ?x dbo:unknownPrefix:birthPlace ?y }",
+)
+
+
+def build_dataset(n_submissions: int) -> str:
+    """Create, or reuse, a SQLite database holding n_submissions synthetic submissions."""
+    path = os.path.join(DATASET_DIR, f"quagga_benchmark_{n_submissions}.db")
+    database.SQLITE_DB_PATH = path
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0] == n_submissions:
+                database.init_db()
+                return path
+        finally:
+            conn.close()
+        os.remove(path)
+
+    generate_dataset.generate_dataset(n_kgs=N_KGS, n_contributors=N_USERS, n_submissions=n_submissions, seed=n_submissions)
+    return path
+
+
+def sparql_response(n_rows: int) -> dict:
+    """A SPARQL JSON results document of n_rows bindings of three variables."""
+    return {
+        "head": {"vars": ["s", "label", "year"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": f"http://example.org/resource/{i}"},
+                    "label": {"type": "literal", "value": f"Resource {i}", "xml:lang": "en"},
+                    "year": {"type": "literal", "value": str(1900 + i % 120), "datatype": "http://www.w3.org/2001/XMLSchema#integer"},
+                }
+                for i in range(n_rows)
+            ]
+        },
+    }
+
+
+def drain(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def validate_corpus():
+    for query in QUERY_CORPUS:
+        helper_methods.validate_sparql_query(query)
+
+
+SIZED_BENCHMARKS = (
+    "export_turtle",
+    "export_jsonl",
+    "export_csv",
+    "home_statistics",
+    "browse_domain_counts",
+    "browse_domain_counts_mine",
+    "format_sparql_results",
+)
+
+
+def sized_benchmarks(n_submissions: int) -> dict[str, Callable]:
+    """The benchmarks that run against the dataset of n_submissions submissions."""
+    response = sparql_response(n_submissions)
+    domain_codes = list(const.DISCIPLINE_DOMAINS)
+    return {
+        "export_turtle": lambda: drain(exporters.export_submissions(database.iter_submissions(), "turtle")),
+        "export_jsonl": lambda: drain(exporters.export_submissions(database.iter_submissions(), "jsonl")),
+        "export_csv": lambda: drain(exporters.export_submissions(database.iter_submissions(), "csv")),
+        "home_statistics": app_main.home_statistics,
+        "browse_domain_counts": lambda: database.get_domain_kg_counts(domain_codes),
+        "browse_domain_counts_mine": lambda: database.get_domain_kg_counts(domain_codes, "contributor1@synthetic.example.org"),
+        "format_sparql_results": lambda: helper_methods.format_sparql_results(response, n_submissions),
+    }
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    """Time the calls of a function, each run repeating quick functions for at least MIN_RUN_MS like timeit."""
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        if (time.perf_counter() - started) * 1000 >= MIN_RUN_MS:
+            break
+        calls *= 10
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        timings.append((time.perf_counter() - started) * 1000 / calls)
+    return {"median_ms": round(statistics.median(timings), 4), "min_ms": round(min(timings), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the helpers and data paths run per request, and compare them with a baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000, 1_000_000], help="Numbers of submissions of the datasets")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each benchmark, the median is reported")
+    parser.add_argument("--only", action="append", help="Only run the benchmarks whose name starts with this (repeatable)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare with, or to save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline instead of comparing")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Fail if the fastest run is more than this fraction slower than in the baseline")
+    parser.add_argument("--min-regression-ms", type=float, default=1.0, help="Ignore slowdowns of fewer milliseconds than this, whatever their fraction")
+    args = parser.parse_args()
+
+    # validate_sparql_query logs every invalid query of the corpus
+    logging.getLogger().setLevel(logging.CRITICAL)
+    helper_methods.validate_sparql_query(QUERY_CORPUS[0])  # rdflib is imported on first use
+
+    machine = f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+    baseline = {}
+    compare = False
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        # Timings of another machine or Python version say nothing about a regression
+        compare = stored.get("machine") == machine
+        if not compare and not args.save_baseline:
+            print(f"The baseline was recorded on {stored.get('machine')}, not {machine}: the changes are shown but cannot fail the run")
+
+    def selected(name: str) -> bool:
+        return not args.only or name.startswith(tuple(args.only))
+
+    results = {}
+    failures = []
+    print(f"{'benchmark':<42}{'median ms':>12}{'min ms':>12}{'baseline ms':>13}{'change':>9}")
+
+    def run(name: str, function: Callable):
+        result = measure(function, args.repeat)
+        results[name] = result
+        reference = baseline.get(name, {}).get("median_ms")
+        compared = f"{reference:>13.2f}{result['median_ms'] / reference - 1:>+9.0%}" if reference else f"{'-':>13}{'-':>9}"
+        print(f"{name:<42}{result['median_ms']:>12.2f}{result['min_ms']:>12.2f}{compared}")
+        # The fastest runs are compared, as they vary the least with the load of the machine
+        fastest = baseline.get(name, {}).get("min_ms")
+        if (
+            compare
+            and fastest
+            and result["min_ms"] > fastest * (1 + args.max_regression)
+            and result["min_ms"] - fastest > args.min_regression_ms
+        ):
+            failures.append(f"{name} takes at best {result['min_ms']:.2f} ms, {result['min_ms'] / fastest - 1:.0%} over its baseline")
+
+    if selected("validate_sparql_query[corpus]"):
+        run("validate_sparql_query[corpus]", validate_corpus)
+    for size in args.sizes:
+        names = [name for name in SIZED_BENCHMARKS if selected(f"{name}[{size}]")]
+        if not names:
+            continue
+        build_dataset(size)
+        benchmarks = sized_benchmarks(size)
+        for name in names:
+            run(f"{name}[{size}]", benchmarks[name])
+        # The SPARQL response of the largest size takes a lot of memory
+        del benchmarks
+
+    if args.save_baseline:
+        # Benchmarks not run this time keep their previous baseline, if it was recorded on this machine
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {"machine": machine, "results": {**baseline, **results} if compare else results},
+                f, indent=2, sort_keys=True,
+            )
+        print(f"Saved the baseline to {args.baseline}")
+        return
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
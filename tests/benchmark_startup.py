@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use, not when a worker starts
+LAZY_MODULES = ("rdflib", "SPARQLWrapper", "requests", "authlib", "mysql.connector", "opentelemetry.sdk", "dump_store", "query_analyzer")
+
+# Runs in a fresh interpreter, like a new uvicorn worker
+WORKER_STARTUP = """
+import sys, time, json
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.database.init_db()
+initialized = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "init_db_ms": (initialized - imported) * 1000,
+    "eager_modules": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def measure_worker_startup() -> dict:
+    env = {**os.environ, "RUN_MODE": os.getenv("RUN_MODE", "RENDER")}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER_STARTUP % (LAZY_MODULES,)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import and startup time of a worker, and fail on regressions.")
+    parser.add_argument("--runs", type=int, default=7, help="Number of fresh interpreters to start")
+    parser.add_argument("--max-import-ms", type=float, default=750, help="Fail if the median import time of main.py exceeds this")
+    parser.add_argument("--max-init-db-ms", type=float, default=100, help="Fail if the median init_db time with an up-to-date schema exceeds this")
+    args = parser.parse_args()
+
+    # The first start migrates the schema, the measured ones find it up to date like the workers do
+    measure_worker_startup()
+    runs = [measure_worker_startup() for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    init_db_ms = statistics.median(run["init_db_ms"] for run in runs)
+    eager_modules = sorted({module for run in runs for module in run["eager_modules"]})
+
+    print(f"{'step':<12}{'median ms':>12}{'max ms':>10}{'limit ms':>10}")
+    print(f"{'import':<12}{import_ms:>12.1f}{max(run['import_ms'] for run in runs):>10.1f}{args.max_import_ms:>10.0f}")
+    print(f"{'init_db':<12}{init_db_ms:>12.1f}{max(run['init_db_ms'] for run in runs):>10.1f}{args.max_init_db_ms:>10.0f}")
+
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f"importing main.py takes {import_ms:.0f} ms")
+    if init_db_ms > args.max_init_db_ms:
+        failures.append(f"init_db takes {init_db_ms:.0f} ms with an up-to-date schema")
+    if eager_modules:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager_modules)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,201 @@
 import os
+import re
 import random
-from locust import HttpUser, task, between
+import time
+import logging
+import secrets
+
+import requests
+from locust import HttpUser, task, between, events
+
+# Shared secret of the app's POST /auth/load_test route, which logs the simulated users in
+LOAD_TEST_TOKEN = os.getenv("LOAD_TEST_TOKEN")
+# The stand-in SPARQL endpoint of tests/mock_sparql_endpoint.py
+MOCK_SPARQL_ENDPOINT = os.getenv("MOCK_SPARQL_ENDPOINT", "http://localhost:8890/sparql")
+MOCK_SPARQL_ABOUT_PAGE = os.getenv("MOCK_SPARQL_ABOUT_PAGE", MOCK_SPARQL_ENDPOINT.rsplit("/", 1)[0] + "/")
+# Submissions each user creates when it starts, which it then lists, modifies and exports
+SUBMISSIONS_PER_USER = int(os.getenv("LOAD_TEST_SUBMISSIONS_PER_USER", "5"))
+JOB_POLL_INTERVAL = 0.5
+JOB_TIMEOUT = 60
+
+# The run fails when the p95 latency of a request name or the overall error rate exceed these
+MAX_P95_MS = float(os.getenv("LOAD_TEST_MAX_P95_MS", "1000"))
+MAX_ERROR_RATE = float(os.getenv("LOAD_TEST_MAX_ERROR_RATE", "0.01"))
+# Requests that are slow by design get their own p95 limit
+P95_LIMITS_MS = {
+    "Export": float(os.getenv("LOAD_TEST_MAX_EXPORT_P95_MS", "5000")),
+    "Validate Query Job": float(os.getenv("LOAD_TEST_MAX_JOB_P95_MS", "5000")),
+}
+
+QUESTIONS = [
+    "Which resources have an English label?",
+    "How many resources are described in the graph?",
+    "What are the labels of the first ten resources?",
+    "Which properties are used the most?",
+]
+QUERIES = [
+    "SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 10",
+    "SELECT ?s ?label WHERE { ?s <http://www.w3.org/2000/01/rdf-schema#label> ?label } LIMIT 5",
+    "ASK { ?s ?p ?o }",
+]
+SUBMISSION_ID = re.compile(r"/trigger_modification\?id_submission=(\d+)")
+
+
+def log_in(client, login: str, base_url: str = ""):
+    """Log in through the load test route of the app, keeping the session cookie in the client."""
+    response = client.post(
+        f"{base_url}/auth/load_test",
+        data={"login": login},
+        headers={"Authorization": f"Bearer {LOAD_TEST_TOKEN}"},
+    )
+    response.raise_for_status()
+
+
+@events.test_start.add_listener
+def seed_knowledge_graph(environment, **kwargs):
+    """Register the mock endpoint as a KG once, so that the users do not race to create it."""
+    if not LOAD_TEST_TOKEN:
+        raise RuntimeError("Set LOAD_TEST_TOKEN to the value the app was started with")
+    base_url = environment.host.rstrip("/")
+    with requests.Session() as client:
+        log_in(client, "load-test-seed", base_url)
+        response = client.post(
+            f"{base_url}/submit_query",
+            data={
+                "kg_endpoint": MOCK_SPARQL_ENDPOINT,
+                "nl_question": QUESTIONS[0],
+                "sparql_query": QUERIES[0],
+                "kg_name": "Load Test KG",
+                "kg_description": "Mock SPARQL endpoint of the load tests",
+                "kg_about_page": MOCK_SPARQL_ABOUT_PAGE,
+                "domains": ["hist"],
+            },
+        )
+        response.raise_for_status()
+
+
+@events.quitting.add_listener
+def check_thresholds(environment, **kwargs):
+    """Set a failing exit code when the p95 latency or the error rate is over its limit."""
+    failures = []
+    for (name, method), entry in environment.stats.entries.items():
+        limit = P95_LIMITS_MS.get(name, MAX_P95_MS)
+        p95 = entry.get_response_time_percentile(0.95)
+        if p95 > limit:
+            failures.append(f"p95 of {method} {name} is {p95:.0f} ms (limit {limit:.0f} ms)")
+    error_rate = environment.stats.total.fail_ratio
+    if error_rate > MAX_ERROR_RATE:
+        failures.append(f"error rate is {error_rate:.2%} (limit {MAX_ERROR_RATE:.2%})")
+
+    for failure in failures:
+        logging.error(f"Load test threshold exceeded: {failure}")
+    if failures:
+        environment.process_exit_code = 1
 
 
 class QuaggaUser(HttpUser):
     wait_time = between(1, 3)
 
     def on_start(self):
-        """Called once per user when they start - set up authentication"""
-        # Set the session cookie manually (get this from your browser after logging in)
-        self.client.cookies.set("session", os.getenv("SESSION_COOKIE"))
+        """Log in as a user of its own, and create the submissions it works on."""
+        log_in(self.client, f"load-test-{secrets.token_hex(6)}")
+        for _ in range(SUBMISSIONS_PER_USER):
+            self.submit_query()
+        self.submission_ids = []
+        self.list_own_submissions()
 
-    @task(5)
+    @task(3)
     def submit_query(self):
-        """Submit a query to the endpoint"""
-        response = self.client.post(
+        """Submit a question, with a query most of the time, to the mock KG"""
+        self.client.post(
             "/submit_query",
             data={
-                "kg_endpoint": "https://data.gesis.org/gesiskg/sparql",
-                "nl_question": "What is the capital of France?",
-                "kg_name": "GESIS KG",
-                "kg_description": "GESIS Social Science Knowledge Graph",
-                "kg_about_page": "https://www.gesis.org/home",
-                "is_dump_url": False,
+                "kg_endpoint": MOCK_SPARQL_ENDPOINT,
+                "nl_question": random.choice(QUESTIONS),
+                "sparql_query": random.choice(QUERIES) if random.random() < 0.8 else "",
             },
             name="Submit Query",
         )
-        print(f"Response: {response.status_code}, Body: {response.text}")
+
+    @task(3)
+    def validate_query(self):
+        """Queue the validation of a query, and poll its job until it finishes"""
+        response = self.client.post(
+            "/validate_query",
+            data={"sparql_query": random.choice(QUERIES), "endpoint_url": MOCK_SPARQL_ENDPOINT},
+            name="Validate Query",
+        )
+        if response.status_code != 202:
+            return
+
+        # The time until the result is ready is reported as a request of its own
+        started = time.perf_counter()
+        exception = None
+        while True:
+            job = self.client.get(response.json()["status_url"], name="Validate Query Job Status")
+            if job.status_code != 200:
+                exception = Exception(f"Job status answered {job.status_code}")
+                break
+            if job.json()["state"] == "finished":
+                if job.json()["result"]["status"] != "success":
+                    exception = Exception(job.json()["result"]["message"])
+                break
+            if time.perf_counter() - started > JOB_TIMEOUT:
+                exception = Exception(f"Job not finished after {JOB_TIMEOUT} seconds")
+                break
+            time.sleep(JOB_POLL_INTERVAL)
+        self.environment.events.request.fire(
+            request_type="JOB",
+            name="Validate Query Job",
+            response_time=(time.perf_counter() - started) * 1000,
+            response_length=0,
+            exception=exception,
+            context={},
+        )
+
+    @task(2)
+    def validate_endpoint(self):
+        """Check that the mock endpoint answers"""
+        self.client.post("/validate_endpoint", data={"endpoint_url": MOCK_SPARQL_ENDPOINT}, name="Validate Endpoint")
+
+    @task(2)
+    def list_kgs(self):
+        """List the KGs with their submission counts"""
+        self.client.get("/list", name="List KGs")
+
+    @task(3)
+    def list_own_submissions(self):
+        """List the user's own submissions of the mock KG, remembering their IDs"""
+        response = self.client.get(
+            f"/list/{MOCK_SPARQL_ENDPOINT}", params={"mine": "true"}, name="List Own Submissions"
+        )
+        if response.status_code == 200:
+            self.submission_ids = sorted(set(SUBMISSION_ID.findall(response.text)))
+
+    @task(3)
+    def modify_submission(self):
+        """Rephrase one of the user's submissions and replace its query"""
+        if not self.submission_ids:
+            return
+        self.client.post(
+            "/modify_db_submission",
+            data={
+                "id_submission": random.choice(self.submission_ids),
+                "kg_endpoint": MOCK_SPARQL_ENDPOINT,
+                "nl_question": random.choice(QUESTIONS),
+                "updated_sparql_query": random.choice(QUERIES),
+            },
+            name="Modify Submission",
+        )
+
+    @task(1)
+    def export(self):
+        """Export every submission, then the changes since, as an incremental harvester would"""
+        export_format = random.choice(["turtle", "jsonl", "csv"])
+        response = self.client.get("/export", params={"format": export_format}, name="Export")
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor:
+            self.client.get("/export", params={"format": export_format, "since": cursor}, name="Export Changes")
 
     @task(5)
     def view_home(self):
@@ -40,15 +209,8 @@ class QuaggaUser(HttpUser):
 
     @task(2)
     def browse_specific_kg(self):
-        """Browse submissions for a specific KG"""
-        kg_endpoints = [
-            "https://data.gesis.org/gesiskg/sparql",
-            "https://lux.collections.yale.edu",
-        ]
-        kg = random.choice(kg_endpoints)
-        self.client.get(
-            f"/browse/{kg}", name="Browse Specific KG"
-        )
+        """Browse submissions for the mock KG"""
+        self.client.get(f"/browse/{MOCK_SPARQL_ENDPOINT}", name="Browse Specific KG")
 
     @task(1)
     def view_faq(self):
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the GitHub, ORCID and OPERAS identity providers.
+
+Run it with `uvicorn tests.mock_identity_provider:app --port 8090` and start the app with
+    GITHUB_BASE_URL=http://localhost:8090/github GITHUB_API_URL=http://localhost:8090/github-api
+    ORCID_BASE_URL=http://localhost:8090/orcid ORCID_API_URL=http://localhost:8090/orcid-api
+    OPERAS_BASE_URL=http://localhost:8090/operas
+Every login then succeeds as the user below. MOCK_IDP_DELAY adds latency to every call and
+MOCK_IDP_FAILURES makes the first calls of each user info endpoint answer 503, to exercise
+the timeouts and retries of identity_providers.
+"""
+import os
+import asyncio
+import secrets
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+from authlib.oauth2.rfc7636 import create_s256_code_challenge
+
+DELAY = float(os.getenv("MOCK_IDP_DELAY", "0"))
+FAILURES = int(os.getenv("MOCK_IDP_FAILURES", "0"))
+
+USER = {
+    "login": "test-user",
+    "email": "test-user@example.org",
+    "name": "Test User",
+    "avatar_url": "https://ui-avatars.com/api/?name=test-user",
+    "orcid": "0000-0002-1825-0097",
+}
+
+app = FastAPI()
+_codes = {}
+_failures = {}
+
+
+async def _simulate(endpoint: str = None):
+    """Apply the configured delay, and return a 503 response for the first calls of the endpoint."""
+    if DELAY:
+        await asyncio.sleep(DELAY)
+    if endpoint is None:
+        return None
+    _failures[endpoint] = _failures.get(endpoint, 0) + 1
+    if _failures[endpoint] <= FAILURES:
+        return JSONResponse({"error": "temporarily_unavailable"}, status_code=503)
+    return None
+
+
+def _authorize(request: Request):
+    params = request.query_params
+    code = secrets.token_urlsafe(16)
+    _codes[code] = params.get("code_challenge")
+    return RedirectResponse(f"{params['redirect_uri']}?{urlencode({'code': code, 'state': params['state']})}")
+
+
+async def _token(code: str, code_verifier: str = None, **extra):
+    # token requests are not retried by the app, so they only get the delay
+    await _simulate()
+    if code not in _codes:
+        return JSONResponse({"error": "invalid_grant"}, status_code=400)
+    challenge = _codes.pop(code)
+    if challenge and (not code_verifier or create_s256_code_challenge(code_verifier) != challenge):
+        return JSONResponse({"error": "invalid_grant", "error_description": "PKCE verification failed"}, status_code=400)
+    return {"access_token": secrets.token_urlsafe(16), "token_type": "bearer", **extra}
+
+
+@app.get("/github/login/oauth/authorize")
+@app.get("/orcid/oauth/authorize")
+@app.get("/operas/authorize")
+async def authorize(request: Request):
+    return _authorize(request)
+
+
+@app.post("/github/login/oauth/access_token")
+@app.post("/operas/token")
+async def token(code: str = Form(...), code_verifier: str = Form(None)):
+    return await _token(code, code_verifier)
+
+
+@app.post("/orcid/oauth/token")
+async def orcid_token(code: str = Form(...)):
+    return await _token(code, orcid=USER["orcid"], name=USER["name"])
+
+
+@app.get("/github-api/user")
+async def github_user():
+    return await _simulate("github_user") or {"login": USER["login"], "avatar_url": USER["avatar_url"], "name": USER["name"]}
+
+
+@app.get("/github-api/user/emails")
+async def github_emails():
+    return await _simulate("github_emails") or [{"email": USER["email"], "primary": True, "verified": True}]
+
+
+@app.get("/orcid-api/{orcid_id}/email")
+async def orcid_email(orcid_id: str):
+    return await _simulate("orcid_email") or {"email": [{"email": USER["email"], "visibility": "public"}]}
+
+
+@app.get("/operas/userinfo")
+async def operas_userinfo():
+    return await _simulate("operas_userinfo") or {"sub": USER["login"], "email": USER["email"]}
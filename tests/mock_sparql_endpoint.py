@@ -0,0 +1,70 @@
+"""
+Local stand-in for a SPARQL endpoint, so that load tests do not hammer public knowledge graphs.
+
+Run it with `uvicorn tests.mock_sparql_endpoint:app --port 8890`; the endpoint is then
+http://localhost:8890/sparql and http://localhost:8890/ serves as its about page.
+SELECT queries answer MOCK_SPARQL_ROWS rows (capped by the LIMIT of the query) and ASK
+queries answer true, in the SPARQL JSON results format. MOCK_SPARQL_DELAY adds latency to
+every query, with a random jitter of up to half of it either way, and MOCK_SPARQL_ERROR_RATE
+makes that fraction of the queries answer 500, to exercise the timeouts and circuit breaker.
+"""
+import os
+import re
+import random
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+
+DELAY = float(os.getenv("MOCK_SPARQL_DELAY", "0.05"))
+ERROR_RATE = float(os.getenv("MOCK_SPARQL_ERROR_RATE", "0"))
+ROWS = int(os.getenv("MOCK_SPARQL_ROWS", "10"))
+
+RESULTS_MEDIA_TYPE = "application/sparql-results+json"
+
+app = FastAPI()
+
+
+def _results(query: str) -> dict:
+    """Build the JSON results of a query, from its form rather than from any data."""
+    if re.search(r"\bASK\b", query, re.IGNORECASE):
+        return {"head": {}, "boolean": True}
+    limit = re.search(r"\bLIMIT\s+(\d+)", query, re.IGNORECASE)
+    rows = min(ROWS, int(limit.group(1))) if limit else ROWS
+    return {
+        "head": {"vars": ["s", "p", "o"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": f"http://example.org/resource/{i}"},
+                    "p": {"type": "uri", "value": "http://www.w3.org/2000/01/rdf-schema#label"},
+                    "o": {"type": "literal", "value": f"Resource {i}", "xml:lang": "en"},
+                }
+                for i in range(rows)
+            ]
+        },
+    }
+
+
+@app.api_route("/sparql", methods=["GET", "POST"])
+async def sparql(request: Request):
+    """Answer a query sent in the query string or as a form, like the SPARQL protocol allows."""
+    query = request.query_params.get("query")
+    if query is None and request.method == "POST":
+        if request.headers.get("content-type", "").startswith("application/sparql-query"):
+            query = (await request.body()).decode("utf-8")
+        else:
+            query = (await request.form()).get("query")
+    if not query:
+        return PlainTextResponse("Missing query parameter", status_code=400)
+
+    if DELAY:
+        await asyncio.sleep(random.uniform(DELAY / 2, DELAY * 1.5))
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        return PlainTextResponse("Simulated endpoint failure", status_code=500)
+    return JSONResponse(_results(query), media_type=RESULTS_MEDIA_TYPE)
+
+
+@app.api_route("/", methods=["GET", "HEAD"])
+async def about_page():
+    return HTMLResponse("<html><body><h1>Mock knowledge graph</h1></body></html>")
@@ -0,0 +1,172 @@
+import os
+import inspect
+import logging
+import functools
+from typing import Callable, Optional
+
+from opentelemetry import trace, propagate
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+# "none" disables tracing, "console" prints the spans, "file" appends them as JSON lines to
+# TRACING_FILE and "otlp" sends them to OTEL_EXPORTER_OTLP_ENDPOINT (needs the
+# opentelemetry-exporter-otlp-proto-http package)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "/var/tmp/quagga_traces.jsonl")
+# Fraction of the traces started here that are recorded; traces started upstream follow
+# the sampling decision of their traceparent header
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+
+tracer = trace.get_tracer("quagga")
+
+# The SDK is only imported when an exporter is configured, to keep the workers quick to start
+_provider = None
+
+
+def _create_exporter():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACING_EXPORTER == "file":
+        return ConsoleSpanExporter(
+            out=open(TRACING_FILE, "a"), formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    if TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logging.error("TRACING_EXPORTER is otlp but opentelemetry-exporter-otlp-proto-http is not installed")
+            return None
+        return OTLPSpanExporter()
+    if TRACING_EXPORTER != "none":
+        logging.error(f"Unknown TRACING_EXPORTER {TRACING_EXPORTER}, tracing is disabled")
+    return None
+
+
+def setup():
+    """Install the tracer provider of TRACING_EXPORTER, and add the trace ids to the log lines."""
+    global _provider
+    if _provider is not None:
+        return
+    if TRACING_EXPORTER == "none":
+        return
+    exporter = _create_exporter()
+    if exporter is None:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": "quagga"}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATE)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _install_log_record_factory()
+    logging.info(f"Tracing {TRACING_SAMPLE_RATE:.0%} of the requests with the {TRACING_EXPORTER} exporter")
+
+
+def shutdown():
+    """Export the spans still buffered."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def _install_log_record_factory():
+    base_factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = base_factory(*args, **kwargs)
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            record.trace_id = format(span_context.trace_id, "032x")
+            record.span_id = format(span_context.span_id, "016x")
+            # The handlers of uvicorn and of the root logger have their own formats, so the
+            # ids are appended to the message for every one of them to show them
+            if isinstance(record.msg, str):
+                record.msg = f"{record.msg} [trace_id={record.trace_id} span_id={record.span_id}]"
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+
+
+def traced(name: Optional[str] = None, kind: SpanKind = SpanKind.INTERNAL, attributes: Optional[dict] = None) -> Callable:
+    """
+    Run a function in a span named after it; exceptions are recorded on the span.
+
+    Args:
+        name (Optional[str]): The span name, "<module>.<function>" by default
+        kind (SpanKind): CLIENT for functions calling other services
+        attributes (Optional[dict]): Attributes set on every span of the function
+    """
+
+    def decorator(function: Callable) -> Callable:
+        span_name = name or f"{function.__module__}.{function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name, kind=kind, attributes=attributes):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_module(namespace: dict, attributes: Optional[dict] = None, exclude: tuple = ()):
+    """Wrap the public functions defined in a module with traced, as metrics.instrument_module does."""
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (
+            inspect.isfunction(value)
+            and value.__module__ == module
+            and not name.startswith("_")
+            and name not in exclude
+            and not inspect.isgeneratorfunction(value)
+        ):
+            namespace[name] = traced(f"{module}.{name}", attributes=attributes)(value)
+
+
+class TracingMiddleware:
+    """Run every HTTP request in a server span named after its route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with tracer.start_as_current_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = metrics.route_label(scope)
+                span.update_name(f"{method} {route}")
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
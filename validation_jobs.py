@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+import database
+import helper_methods
+import metrics
+
+logging.getLogger().setLevel(logging.INFO)
+
+# Number of worker threads started by each uvicorn worker process, per queue
+WORKER_COUNT = int(os.getenv("VALIDATION_WORKERS", "2"))
+HEAVY_WORKER_COUNT = int(os.getenv("HEAVY_VALIDATION_WORKERS", "1"))
+# How often idle workers look for jobs queued by other processes or pods
+POLL_INTERVAL = float(os.getenv("VALIDATION_POLL_INTERVAL", "2"))
+EXECUTION_TIMEOUT = int(os.getenv("VALIDATION_EXECUTION_TIMEOUT", "120"))
+# Running jobs not updated for this long are considered orphaned and re-queued
+STALE_AFTER_SECONDS = int(os.getenv("VALIDATION_STALE_AFTER", "300"))
+# How often each process refreshes the queue depth gauge scraped for autoscaling
+QUEUE_DEPTH_INTERVAL = 15
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+
+# Queries estimated to be expensive go to their own queue with fewer workers
+DEFAULT_QUEUE = "default"
+HEAVY_QUEUE = "heavy"
+
+_wakeup = {DEFAULT_QUEUE: threading.Event(), HEAVY_QUEUE: threading.Event()}
+_stop = threading.Event()
+_threads = []
+_maintenance_lock = threading.Lock()
+_last_maintenance = 0.0
+_last_queue_depth = 0.0
+
+
+def enqueue(endpoint: str, sparql_query: str, username: str, queue: str = DEFAULT_QUEUE, is_dump: bool = False) -> int:
+    """
+    Persist a validation job so that any worker, in any pod, can pick it up.
+
+    Args:
+        endpoint (str): The SPARQL endpoint to run the query against
+        sparql_query (str): The syntactically valid SPARQL query
+        username (str): The email of the user who requested the validation
+        queue (str): The queue to put the job in, DEFAULT_QUEUE or HEAVY_QUEUE
+        is_dump (bool): Whether the endpoint is a data dump to query locally
+
+    Returns:
+        int: The ID of the queued job
+    """
+    job_id = database.insert_validation_job(endpoint, sparql_query, username, queue, is_dump)
+    _wakeup[queue].set()
+    return job_id
+
+
+def serialize_job(job: Dict) -> Dict:
+    """Convert a validation job row into the payload returned to clients."""
+    return {
+        "job_id": job["id"],
+        "state": job["status"],
+        "progress": job["progress"],
+        "result": json.loads(job["result"]) if job.get("result") else None,
+    }
+
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """Retrieve a validation job, or None if it does not exist."""
+    return database.get_validation_job(job_id)
+
+
+def run_validation(job: Dict) -> Dict:
+    """
+    Execute the query of a job against its endpoint and record the validation result.
+
+    Args:
+        job (Dict): The claimed job with its endpoint, sparql_query and username
+
+    Returns:
+        Dict: The outcome with a status and message, plus the results on success
+    """
+    endpoint = job["endpoint"]
+    sparql_query = job["sparql_query"]
+    username = job["username"]
+
+    def report_progress(message: str):
+        # also keeps the job from being considered orphaned while a dump loads
+        database.update_validation_job(job["id"], RUNNING, progress=message)
+
+    logging.info(f"Executing SPARQL query for validation job {job['id']}")
+    try:
+        # Only a preview is fetched: these runs are not linked to a submission, so answer drift
+        # is tracked by revalidate.py, which fingerprints the whole answers
+        results = helper_methods.execute_sparql_query(
+            sparql_query,
+            endpoint,
+            limit=helper_methods.RESULT_PREVIEW_ROWS,
+            timeout=EXECUTION_TIMEOUT,
+            is_dump=bool(job.get("is_dump")),
+            progress=report_progress,
+        )
+        database.insert_validation_result(
+            endpoint=endpoint,
+            validation_status="success",
+            validation_message="Query executed successfully",
+            username=username,
+            sparql_query=sparql_query,
+            query_result=str(results),
+        )
+        logging.info("SPARQL validation result has been run")
+        return {
+            "status": "success",
+            "message": "Query executed successfully",
+            "results": results,
+        }
+    except TimeoutError as e:
+        database.insert_validation_result(
+            endpoint=endpoint,
+            validation_status="timeout",
+            validation_message=f"Query execution timed out: {e}",
+            username=username,
+            sparql_query=sparql_query,
+            query_result="timeout",
+        )
+        logging.warning(f"SPARQL query timed out: {e}")
+        return {
+            "status": "success",
+            "message": "Query saved successfully in the database but timed out.",
+        }
+    except Exception as e:
+        database.insert_validation_result(
+            endpoint=endpoint,
+            validation_status="error",
+            validation_message=f"Failed to run query: {e}",
+            username=username,
+            sparql_query=sparql_query,
+            query_result="error",
+        )
+        return {"status": "error", "message": f"Failed to run query: {e}"}
+
+
+def _process(job: Dict):
+    """Run a claimed job and store its outcome."""
+    try:
+        outcome = run_validation(job)
+    except Exception as e:
+        logging.error(f"Validation job {job['id']} failed: {e}")
+        outcome = {
+            "status": "error",
+            "message": "An error occurred while processing the query",
+        }
+    database.update_validation_job(
+        job["id"], FINISHED, progress=outcome["message"], result=json.dumps(outcome)
+    )
+
+
+def _maybe_requeue_stale_jobs():
+    """Re-queue orphaned jobs, at most once a minute per process."""
+    global _last_maintenance
+    with _maintenance_lock:
+        if time.monotonic() - _last_maintenance < max(POLL_INTERVAL, 60):
+            return
+        _last_maintenance = time.monotonic()
+    requeued = database.requeue_stale_validation_jobs(STALE_AFTER_SECONDS)
+    if requeued:
+        logging.warning(f"Re-queued {requeued} stale validation jobs")
+
+
+def _maybe_update_queue_depth():
+    """Refresh the gauge of queued jobs, at most every QUEUE_DEPTH_INTERVAL seconds per process."""
+    global _last_queue_depth
+    with _maintenance_lock:
+        if time.monotonic() - _last_queue_depth < QUEUE_DEPTH_INTERVAL:
+            return
+        _last_queue_depth = time.monotonic()
+    counts = database.count_queued_validation_jobs()
+    for queue in (DEFAULT_QUEUE, HEAVY_QUEUE):
+        metrics.VALIDATION_JOBS_QUEUED.labels(queue).set(counts.get(queue, 0))
+
+
+def _worker_loop(queue: str):
+    """Claim and run jobs of the queue until the pool is stopped."""
+    while not _stop.is_set():
+        try:
+            _maybe_requeue_stale_jobs()
+            _maybe_update_queue_depth()
+            job = database.claim_next_validation_job(queue)
+        except Exception as e:
+            logging.error(f"Error claiming validation job: {e}")
+            job = None
+
+        if job is None:
+            _wakeup[queue].wait(POLL_INTERVAL)
+            _wakeup[queue].clear()
+            continue
+        _process(job)
+
+
+def start_workers():
+    """Start the worker pool of this process."""
+    _stop.clear()
+    for queue, count in ((DEFAULT_QUEUE, WORKER_COUNT), (HEAVY_QUEUE, HEAVY_WORKER_COUNT)):
+        for index in range(count):
+            thread = threading.Thread(
+                target=_worker_loop, args=(queue,), name=f"validation-worker-{queue}-{index}"
+            )
+            thread.daemon = True
+            thread.start()
+            _threads.append(thread)
+    logging.info(
+        f"Started {WORKER_COUNT} validation workers and {HEAVY_WORKER_COUNT} heavy validation workers"
+    )
+
+
+def stop_workers():
+    """Signal the worker pool to stop once the running jobs complete."""
+    _stop.set()
+    for event in _wakeup.values():
+        event.set()
+    _threads.clear()